@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Agregadores de passo único para os relatórios
+
+Cada agregador recebe os registros um a um (adicionar) e mantém todos os
+contadores e as listas "primeiros N" do relatório; imprimir() só formata o
+que já foi contado. Assim o relatório pode ser alimentado durante a
+consolidação, ou a partir de um fluxo de registros, sem guardar a lista.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from moeda import formatar_reais
+
+def _por_contagem(contadores: Dict) -> List:
+    """Itens ordenados por contagem decrescente (empates na ordem de chegada)"""
+    return sorted(contadores.items(), key=lambda x: x[1], reverse=True)
+
+class AgregadorRelatorio:
+    """Estatísticas do relatório de reorganização (reorganizar_banco) em um passo"""
+
+    def __init__(self, limite_lista: int = 20):
+        self.limite_lista = limite_lista
+        self.total = 0
+        self.com_pagamento = 0
+        self.com_indicador = 0
+        self.com_alertas = 0
+        self.por_fonte = defaultdict(int)
+        self.planos = defaultdict(int)
+        self.indicadores = defaultdict(int)
+        self.tipos_alertas = defaultdict(int)
+        self.tags = defaultdict(int)
+        self.total_criticos = 0
+        self.criticos = []
+        self.total_divergencias = 0
+        self.divergencias = []
+
+    def adicionar(self, u):
+        """Contabiliza um usuário consolidado (UsuarioConsolidado; lê os atributos direto)"""
+        alertas = u.alertas
+        tags = u.tags
+        fontes = u.fontes
+        tem_pagamentos = u.tem_pagamentos == 'SIM'
+        self.total += 1
+        if tem_pagamentos:
+            self.com_pagamento += 1
+        indicador = u.indicador
+        if indicador:
+            self.com_indicador += 1
+            self.indicadores[indicador] += 1
+        if alertas:
+            self.com_alertas += 1
+        if u.plano:
+            self.planos[u.plano] += 1
+        for fonte in fontes:
+            self.por_fonte[fonte] += 1
+        for alerta in alertas:
+            self.tipos_alertas[alerta] += 1
+        for tag in tags:
+            self.tags[tag] += 1
+
+        # Usuários críticos (sem pagamento no sistema)
+        if not tem_pagamentos and 'SISTEMA' in fontes:
+            self.total_criticos += 1
+            if len(self.criticos) < self.limite_lista:
+                self.criticos.append((u.email, u.nome, u.plano))
+
+        if 'DIVERGENCIA_STATUS' in tags:
+            self.total_divergencias += 1
+            if len(self.divergencias) < self.limite_lista:
+                self.divergencias.append((u.email, u.status_sistema, u.status_pagamento))
+
+    def adicionar_todos(self, usuarios: Iterable):
+        for u in usuarios:
+            self.adicionar(u)
+        return self
+
+    def imprimir(self):
+        """Imprime o relatório de análise com os totais acumulados"""
+        total = self.total
+        limite = self.limite_lista
+
+        print("\n" + "="*100)
+        print("📊 RELATÓRIO DE ANÁLISE - REORGANIZAÇÃO DO BANCO DE DADOS")
+        print("="*100)
+
+        sem_pagamento = total - self.com_pagamento
+        sem_indicador = total - self.com_indicador
+
+        print(f"\n📈 ESTATÍSTICAS GERAIS")
+        print(f"  Total de usuários únicos: {total}")
+        print(f"  Com pagamentos: {self.com_pagamento} ({self.com_pagamento/total*100:.1f}%)")
+        print(f"  Sem pagamentos: {sem_pagamento} ({sem_pagamento/total*100:.1f}%)")
+        print(f"  Com indicador: {self.com_indicador} ({self.com_indicador/total*100:.1f}%)")
+        print(f"  Sem indicador: {sem_indicador} ({sem_indicador/total*100:.1f}%)")
+        print(f"  Com alertas: {self.com_alertas} ({self.com_alertas/total*100:.1f}%)")
+
+        print(f"\n📁 USUÁRIOS POR FONTE")
+        for fonte, count in _por_contagem(self.por_fonte):
+            print(f"  {fonte}: {count} usuários")
+
+        if self.planos:
+            print(f"\n📋 DISTRIBUIÇÃO POR PLANO")
+            for plano, count in _por_contagem(self.planos):
+                print(f"  {plano}: {count} usuários ({count/total*100:.1f}%)")
+
+        if self.indicadores:
+            print(f"\n👥 TOP 10 INDICADORES")
+            for indicador, count in _por_contagem(self.indicadores)[:10]:
+                print(f"  {indicador}: {count} usuários")
+
+        if self.tipos_alertas:
+            print(f"\n⚠️  ALERTAS GERADOS")
+            for alerta, count in _por_contagem(self.tipos_alertas):
+                print(f"  {alerta}: {count} usuários")
+
+        if self.tags:
+            print(f"\n🏷️  TAGS ATRIBUÍDAS")
+            for tag, count in _por_contagem(self.tags):
+                print(f"  {tag}: {count} usuários")
+
+        if self.total_criticos:
+            print(f"\n🔴 USUÁRIOS CRÍTICOS (NO SISTEMA SEM PAGAMENTOS) - {self.total_criticos} usuários")
+            print(f"  Primeiros {limite}:")
+            for i, (email, nome, plano) in enumerate(self.criticos, 1):
+                print(f"  {i}. {email} - {nome} - Plano: {plano}")
+            if self.total_criticos > limite:
+                print(f"  ... e mais {self.total_criticos - limite} usuários")
+
+        if self.total_divergencias:
+            print(f"\n⚠️  DIVERGÊNCIAS DE STATUS - {self.total_divergencias} usuários")
+            print(f"  Primeiros {limite}:")
+            for i, (email, status_sistema, status_pagamento) in enumerate(self.divergencias, 1):
+                print(f"  {i}. {email} - Sistema: {status_sistema} | Pagamento: {status_pagamento}")
+            if self.total_divergencias > limite:
+                print(f"  ... e mais {self.total_divergencias - limite} usuários")
+
+        print("\n" + "="*100)
+
+class AgregadorArquivo:
+    """Estatísticas de um arquivo lido por analisar_usuarios.ler_csv em um passo"""
+
+    def __init__(self, limite_duplicados: int = 5):
+        self.limite_duplicados = limite_duplicados
+        self.total = 0
+        self.com_nome = 0
+        self.com_telefone = 0
+        self.com_indicador = 0
+        self.com_obs = 0
+        self.com_plano = 0
+        self.com_status = 0
+        self.planos = defaultdict(int)
+        self.indicadores = defaultdict(int)
+        # email -> linhas em que aparece; só emails repetidos viram listas
+        self._primeira_linha = {}
+        self.duplicados = {}
+
+    def adicionar(self, u: Dict):
+        """Contabiliza um registro do arquivo"""
+        self.total += 1
+        if u['nome']:
+            self.com_nome += 1
+        if u['telefone']:
+            self.com_telefone += 1
+        if u['indicador']:
+            self.com_indicador += 1
+            self.indicadores[u['indicador']] += 1
+        if u['obs']:
+            self.com_obs += 1
+        if u.get('plano'):
+            self.com_plano += 1
+            self.planos[u['plano']] += 1
+        if u.get('status'):
+            self.com_status += 1
+
+        email = u['email']
+        if email in self.duplicados:
+            self.duplicados[email].append(u['linha'])
+        elif email in self._primeira_linha:
+            self.duplicados[email] = [self._primeira_linha[email], u['linha']]
+        else:
+            self._primeira_linha[email] = u['linha']
+
+    def adicionar_todos(self, usuarios: Iterable[Dict]):
+        for u in usuarios:
+            self.adicionar(u)
+        return self
+
+    def imprimir(self, nome_arquivo: str):
+        """Imprime a análise do arquivo com os totais acumulados"""
+        total = self.total
+        print(f"\n{'='*80}")
+        print(f"📄 ANÁLISE DO ARQUIVO: {nome_arquivo}")
+        print(f"{'='*80}")
+        print(f"Total de usuários: {total}")
+
+        print(f"  - Com nome completo: {self.com_nome} ({self.com_nome/total*100:.1f}%)")
+        print(f"  - Com telefone: {self.com_telefone} ({self.com_telefone/total*100:.1f}%)")
+        print(f"  - Com indicador: {self.com_indicador} ({self.com_indicador/total*100:.1f}%)")
+        print(f"  - Com observações: {self.com_obs} ({self.com_obs/total*100:.1f}%)")
+        if self.com_plano > 0:
+            print(f"  - Com plano: {self.com_plano} ({self.com_plano/total*100:.1f}%)")
+        if self.com_status > 0:
+            print(f"  - Com status: {self.com_status} ({self.com_status/total*100:.1f}%)")
+
+        if self.planos:
+            print(f"\n  Distribuição por Plano:")
+            for plano, count in _por_contagem(self.planos):
+                print(f"    - {plano}: {count} usuários ({count/total*100:.1f}%)")
+
+        if self.indicadores:
+            print(f"\n  Top 10 Indicadores:")
+            for indicador, count in _por_contagem(self.indicadores)[:10]:
+                print(f"    - {indicador}: {count} usuários")
+
+        if self.duplicados:
+            # Mesma ordem da primeira aparição de cada email no arquivo
+            ordem = {email: i for i, email in enumerate(self._primeira_linha)}
+            duplicados = sorted(self.duplicados.items(), key=lambda x: ordem[x[0]])
+            print(f"\n  ⚠️  Emails duplicados encontrados: {len(duplicados)}")
+            for email, linhas in duplicados[:self.limite_duplicados]:
+                print(f"    - {email}: linhas {linhas}")
+            if len(duplicados) > self.limite_duplicados:
+                print(f"    ... e mais {len(duplicados) - self.limite_duplicados} duplicados")
+
+def _novo_total() -> List[int]:
+    """[pagamentos, receita, comissões] de um grupo (centavos)"""
+    return [0, 0, 0]
+
+class AgregadorReceita:
+    """Receita dos pagamentos (centavos) por mês, método/conta e indicador em um passo"""
+
+    def __init__(self, limite_indicadores: int = 10):
+        self.limite_indicadores = limite_indicadores
+        self.pagamentos = 0
+        self.sem_valor = 0
+        self.receita = 0
+        self.comissoes = 0
+        self.por_mes = defaultdict(_novo_total)
+        self.por_metodo_conta = defaultdict(_novo_total)
+        self.por_indicador = defaultdict(_novo_total)
+
+    def adicionar(self, mes: str, metodo: str, conta: str, indicador: str,
+                  valor: Optional[int], comissao: Optional[int]):
+        """Contabiliza um pagamento (valor e comissão em centavos; None = sem valor)"""
+        if valor is None:
+            self.sem_valor += 1
+            return
+        comissao = comissao or 0
+        self.pagamentos += 1
+        self.receita += valor
+        self.comissoes += comissao
+        for grupo in (self.por_mes[mes or 'SEM MÊS'],
+                      self.por_metodo_conta[(metodo or '-', conta or '-')],
+                      self.por_indicador[indicador or 'SEM INDICADOR']):
+            grupo[0] += 1
+            grupo[1] += valor
+            grupo[2] += comissao
+
+    def imprimir(self):
+        """Imprime as seções de receita com os totais acumulados"""
+        print(f"\n💰 RECEITA DOS PAGAMENTOS")
+        print(f"  Total: {formatar_reais(self.receita)} em {self.pagamentos} pagamentos "
+              f"({self.sem_valor} sem valor)")
+        print(f"  Comissões: {formatar_reais(self.comissoes)}")
+
+        if self.por_mes:
+            print(f"\n📅 RECEITA POR MÊS")
+            for mes, (quantidade, receita, comissoes) in sorted(self.por_mes.items()):
+                print(f"  {mes}: {formatar_reais(receita)} ({quantidade} pagamentos, "
+                      f"comissões {formatar_reais(comissoes)})")
+
+        if self.por_metodo_conta:
+            print(f"\n💳 RECEITA POR MÉTODO / CONTA")
+            for (metodo, conta), (quantidade, receita, _) in sorted(
+                    self.por_metodo_conta.items(), key=lambda x: x[1][1], reverse=True):
+                print(f"  {metodo} / {conta}: {formatar_reais(receita)} ({quantidade} pagamentos)")
+
+        if self.por_indicador:
+            print(f"\n👥 RECEITA POR INDICADOR (TOP {self.limite_indicadores})")
+            for indicador, (quantidade, receita, comissoes) in sorted(
+                    self.por_indicador.items(), key=lambda x: x[1][1], reverse=True)[:self.limite_indicadores]:
+                print(f"  {indicador}: {formatar_reais(receita)} ({quantidade} pagamentos, "
+                      f"comissões {formatar_reais(comissoes)})")
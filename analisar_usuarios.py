@@ -2,13 +2,112 @@
 """
 Script para analisar e cruzar dados de usuários
 """
+import argparse
 import csv
 import os
-from collections import defaultdict
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+
+import cache_fontes
+import metricas
+from agregadores import AgregadorArquivo
+from reconciliacao import Reconciliacao
+from saidas import DestinoCsv, multiplexar
+from telefones import IndiceTelefones, normalizar_em_lote
+
+# Aliases aceitos para cada campo, em ordem de prioridade
+CANDIDATOS_NOME = ('NOME_COMPLETO', 'Nome', 'NOME', 'NAME')
+CANDIDATOS_TELEFONE = ('TELEFONE', 'Telefone', 'PHONE', 'Celular')
+CANDIDATOS_INDICADOR = ('INDICADOR', 'Indicador', 'INDICATOR')
+CANDIDATOS_PLANO = ('Plano de Assinatura', 'PLANO')
+CANDIDATOS_STATUS = ('Status', 'STATUS')
+CANDIDATOS_OBS = ('OBS', 'OBSERVACAO')
+
+def _vazio(linha: List[str], indices: Tuple[int, ...]) -> str:
+    """Campo sem coluna correspondente no arquivo"""
+    return ''
+
+def _coluna(linha: List[str], indices: Tuple[int, ...]) -> str:
+    """Valor da única coluna resolvida para o campo"""
+    return linha[indices[0]].strip()
+
+def _primeiro_preenchido(linha: List[str], indices: Tuple[int, ...]) -> str:
+    """Retorna o primeiro valor não vazio entre as colunas candidatas"""
+    for i in indices:
+        if linha[i]:
+            return linha[i].strip()
+    return ''
+
+def _telefone(linha: List[str], indices: Tuple[int, ...]) -> str:
+    """Retorna o primeiro telefone preenchido que não seja 'n/a'"""
+    for i in indices:
+        if linha[i]:
+            telefone = linha[i].strip()
+            if telefone.lower() != 'n/a':
+                return telefone
+    return ''
+
+def compilar_projetor(cabecalho: List[str]) -> Optional[Tuple]:
+    """Resolve o cabeçalho uma vez e retorna o projetor do arquivo
+
+    O projetor é (índice do email, campos), onde campos é uma tupla de
+    (nome, conversor, índices das colunas). Retorna None se não houver
+    coluna de email.
+    """
+    # Mesma semântica do DictReader: ordem da primeira ocorrência, valor da última
+    posicoes = {}
+    for i, nome in enumerate(cabecalho):
+        posicoes[nome] = i
+
+    indice_email = None
+    for nome, i in posicoes.items():
+        if 'EMAIL' in nome.upper():
+            indice_email = i
+            break
 
-def ler_csv(arquivo_csv: str, delimitador: str = ';') -> List[Dict]:
-    """Lê o arquivo CSV e retorna lista de usuários"""
+    if indice_email is None:
+        return None
+
+    def alternativas(campo, nomes, conversor):
+        indices = tuple(posicoes[n] for n in nomes if n in posicoes)
+        if not indices:
+            return campo, _vazio, indices
+        if len(indices) == 1 and conversor is _primeiro_preenchido:
+            return campo, _coluna, indices
+        return campo, conversor, indices
+
+    def primeira_existente(campo, nomes):
+        indices = tuple(posicoes[n] for n in nomes if n in posicoes)[:1]
+        return campo, (_coluna if indices else _vazio), indices
+
+    campos = (
+        alternativas('nome', CANDIDATOS_NOME, _primeiro_preenchido),
+        alternativas('telefone', CANDIDATOS_TELEFONE, _telefone),
+        alternativas('indicador', CANDIDATOS_INDICADOR, _primeiro_preenchido),
+        primeira_existente('plano', CANDIDATOS_PLANO),
+        primeira_existente('status', CANDIDATOS_STATUS),
+        primeira_existente('obs', CANDIDATOS_OBS),
+    )
+    return indice_email, campos
+
+def _linha_como_dict(cabecalho: List[str], linha: List[str]) -> Dict:
+    """Reconstrói a linha como o DictReader a entregaria"""
+    row = dict(zip(cabecalho, linha))
+    if len(linha) > len(cabecalho):
+        row[None] = linha[len(cabecalho):]
+    elif len(linha) < len(cabecalho):
+        for nome in cabecalho[len(linha):]:
+            row.setdefault(nome, None)
+    return row
+
+@cache_fontes.em_cache
+def ler_csv(arquivo_csv: str, delimitador: str = ';', incluir_linha_completa: bool = False) -> List[Dict]:
+    """Lê o arquivo CSV e retorna lista de usuários
+
+    O cabeçalho é resolvido uma única vez (compilar_projetor) e as linhas
+    são lidas com csv.reader. A linha original como dict ('dados_completos')
+    só é montada com incluir_linha_completa=True. 'telefone_e164' traz o
+    telefone normalizado (telefones.normalizar_telefone).
+    """
     usuarios = []
 
     if not os.path.exists(arquivo_csv):
@@ -16,124 +115,47 @@ def ler_csv(arquivo_csv: str, delimitador: str = ';') -> List[Dict]:
         return []
 
     with open(arquivo_csv, 'r', encoding='utf-8', errors='ignore') as f:
-        reader = csv.DictReader(f, delimiter=delimitador)
-        for i, row in enumerate(reader, 1):
-            # Detectar campo de email
-            email_field = None
-            for key in row.keys():
-                if 'EMAIL' in key.upper() or key.upper() == 'EMAIL':
-                    email_field = key
-                    break
-
-            if not email_field or not row.get(email_field) or not row[email_field].strip():
+        reader = csv.reader(f, delimiter=delimitador)
+        cabecalho = next((linha for linha in reader if linha), None)
+        projetor = compilar_projetor(cabecalho) if cabecalho else None
+        if projetor is None:
+            return []
+
+        indice_email, campos = projetor
+        num_colunas = len(cabecalho)
+        i = 0
+        for linha in reader:
+            # Linhas em branco são ignoradas (e não contadas), como no DictReader
+            if not linha:
                 continue
+            i += 1
+
+            completos = None
+            if incluir_linha_completa:
+                completos = _linha_como_dict(cabecalho, linha)
+            if len(linha) < num_colunas:
+                linha = linha + [''] * (num_colunas - len(linha))
 
-            email = row[email_field].strip().lower()
+            email = linha[indice_email].strip().lower()
             if not email or email == 'n/a':
                 continue
 
-            # Detectar campos de nome
-            nome = ''
-            for key in ['NOME_COMPLETO', 'Nome', 'NOME', 'NAME']:
-                if key in row and row[key]:
-                    nome = row[key].strip()
-                    break
-
-            # Detectar campos de telefone
-            telefone = ''
-            for key in ['TELEFONE', 'Telefone', 'PHONE', 'Celular']:
-                if key in row and row[key]:
-                    telefone = row[key].strip()
-                    if telefone.lower() != 'n/a':
-                        break
-                    telefone = ''
-
-            # Detectar campos de indicador
-            indicador = ''
-            for key in ['INDICADOR', 'Indicador', 'INDICATOR']:
-                if key in row and row[key]:
-                    indicador = row[key].strip()
-                    break
-
-            # Detectar plano (se for do arquivo Numbers)
-            plano = row.get('Plano de Assinatura', row.get('PLANO', '')).strip()
-
-            # Detectar status
-            status = row.get('Status', row.get('STATUS', '')).strip()
-
-            usuarios.append({
-                'linha': i,
-                'email': email,
-                'nome': nome,
-                'telefone': telefone,
-                'indicador': indicador,
-                'plano': plano,
-                'status': status,
-                'obs': row.get('OBS', row.get('OBSERVACAO', '')).strip(),
-                'dados_completos': row
-            })
+            usuario = {'linha': i, 'email': email}
+            for campo, conversor, indices in campos:
+                usuario[campo] = conversor(linha, indices)
+            if incluir_linha_completa:
+                usuario['dados_completos'] = completos
+            usuarios.append(usuario)
+
+    # Telefones em E.164 convertidos uma vez, para comparar números e não textos
+    for usuario, e164 in zip(usuarios, normalizar_em_lote(u['telefone'] for u in usuarios)):
+        usuario['telefone_e164'] = e164
 
     return usuarios
 
 def analisar_arquivo(nome_arquivo: str, usuarios: List[Dict]):
     """Exibe análise de um arquivo"""
-    print(f"\n{'='*80}")
-    print(f"📄 ANÁLISE DO ARQUIVO: {nome_arquivo}")
-    print(f"{'='*80}")
-    print(f"Total de usuários: {len(usuarios)}")
-
-    # Estatísticas
-    com_nome = sum(1 for u in usuarios if u['nome'])
-    com_telefone = sum(1 for u in usuarios if u['telefone'])
-    com_indicador = sum(1 for u in usuarios if u['indicador'])
-    com_obs = sum(1 for u in usuarios if u['obs'])
-    com_plano = sum(1 for u in usuarios if u.get('plano'))
-    com_status = sum(1 for u in usuarios if u.get('status'))
-
-    print(f"  - Com nome completo: {com_nome} ({com_nome/len(usuarios)*100:.1f}%)")
-    print(f"  - Com telefone: {com_telefone} ({com_telefone/len(usuarios)*100:.1f}%)")
-    print(f"  - Com indicador: {com_indicador} ({com_indicador/len(usuarios)*100:.1f}%)")
-    print(f"  - Com observações: {com_obs} ({com_obs/len(usuarios)*100:.1f}%)")
-    if com_plano > 0:
-        print(f"  - Com plano: {com_plano} ({com_plano/len(usuarios)*100:.1f}%)")
-    if com_status > 0:
-        print(f"  - Com status: {com_status} ({com_status/len(usuarios)*100:.1f}%)")
-
-    # Planos (se disponível)
-    if com_plano > 0:
-        planos = defaultdict(int)
-        for u in usuarios:
-            if u.get('plano'):
-                planos[u['plano']] += 1
-
-        if planos:
-            print(f"\n  Distribuição por Plano:")
-            for plano, count in sorted(planos.items(), key=lambda x: x[1], reverse=True):
-                print(f"    - {plano}: {count} usuários ({count/len(usuarios)*100:.1f}%)")
-
-    # Top indicadores
-    indicadores = defaultdict(int)
-    for u in usuarios:
-        if u['indicador']:
-            indicadores[u['indicador']] += 1
-
-    if indicadores:
-        print(f"\n  Top 10 Indicadores:")
-        for indicador, count in sorted(indicadores.items(), key=lambda x: x[1], reverse=True)[:10]:
-            print(f"    - {indicador}: {count} usuários")
-
-    # Emails duplicados
-    emails_count = defaultdict(list)
-    for u in usuarios:
-        emails_count[u['email']].append(u['linha'])
-
-    duplicados = {email: linhas for email, linhas in emails_count.items() if len(linhas) > 1}
-    if duplicados:
-        print(f"\n  ⚠️  Emails duplicados encontrados: {len(duplicados)}")
-        for email, linhas in list(duplicados.items())[:5]:
-            print(f"    - {email}: linhas {linhas}")
-        if len(duplicados) > 5:
-            print(f"    ... e mais {len(duplicados) - 5} duplicados")
+    AgregadorArquivo().adicionar_todos(usuarios).imprimir(nome_arquivo)
 
 def cruzar_arquivos(usuarios1: List[Dict], usuarios2: List[Dict], nome1: str, nome2: str):
     """Cruza dados entre dois arquivos"""
@@ -145,16 +167,17 @@ def cruzar_arquivos(usuarios1: List[Dict], usuarios2: List[Dict], nome1: str, no
     emails1 = {u['email']: u for u in usuarios1}
     emails2 = {u['email']: u for u in usuarios2}
 
-    # Encontrar interseções e diferenças
-    emails_ambos = set(emails1.keys()) & set(emails2.keys())
-    apenas_1 = set(emails1.keys()) - set(emails2.keys())
-    apenas_2 = set(emails2.keys()) - set(emails1.keys())
+    # Interseções e diferenças pelas máscaras de pertinência (uma varredura por arquivo)
+    fontes = Reconciliacao((nome1, nome2), (emails1, emails2))
+    emails_ambos = set(fontes.emails(em=(nome1, nome2)))
+    apenas_1 = set(fontes.emails(em=(nome1,), fora=(nome2,)))
+    apenas_2 = set(fontes.emails(em=(nome2,), fora=(nome1,)))
 
     print(f"\n📊 Resumo:")
-    print(f"  - Usuários em ambos os arquivos: {len(emails_ambos)}")
-    print(f"  - Somente em {nome1}: {len(apenas_1)}")
-    print(f"  - Somente em {nome2}: {len(apenas_2)}")
-    print(f"  - Total único: {len(emails1.keys() | emails2.keys())}")
+    print(f"  - Usuários em ambos os arquivos: {fontes.em_todas()}")
+    print(f"  - Somente em {nome1}: {fontes.somente(nome1)}")
+    print(f"  - Somente em {nome2}: {fontes.somente(nome2)}")
+    print(f"  - Total único: {len(fontes)}")
 
     # Usuários somente no primeiro arquivo
     if apenas_1:
@@ -200,6 +223,23 @@ def cruzar_arquivos(usuarios1: List[Dict], usuarios2: List[Dict], nome1: str, no
         if len(apenas_2) > 20:
             print(f"\n... e mais {len(apenas_2) - 20} usuários")
 
+    # Emails diferentes com o mesmo telefone: provavelmente o mesmo usuário
+    indice_telefones = IndiceTelefones().adicionar_registros(emails2[email] for email in sorted(apenas_2))
+    correspondencias = []
+    for email in sorted(apenas_1):
+        outros = indice_telefones.emails(emails1[email]['telefone_e164'])
+        if outros:
+            correspondencias.append((email, emails1[email]['telefone_e164'], outros))
+
+    if correspondencias:
+        print(f"\n{'='*80}")
+        print(f"📞 MESMO TELEFONE, EMAILS DIFERENTES ({len(correspondencias)}):")
+        print(f"{'='*80}")
+        for i, (email, telefone, outros) in enumerate(correspondencias[:20], 1):
+            print(f"{i}. {email} ({nome1}) ↔ {', '.join(outros)} ({nome2}) - {telefone}")
+        if len(correspondencias) > 20:
+            print(f"\n... e mais {len(correspondencias) - 20} correspondências")
+
     # Diferenças nos dados para usuários em ambos
     diferencas = []
     for email in emails_ambos:
@@ -209,7 +249,9 @@ def cruzar_arquivos(usuarios1: List[Dict], usuarios2: List[Dict], nome1: str, no
         diffs = []
         if u1['nome'].upper() != u2['nome'].upper() and u1['nome'] and u2['nome']:
             diffs.append(f"Nome: '{u1['nome']}' vs '{u2['nome']}'")
-        if u1['telefone'] != u2['telefone'] and u1['telefone'] and u2['telefone']:
+        # Compara os números normalizados; o texto original só quando não normaliza
+        if ((u1['telefone_e164'] or u1['telefone']) != (u2['telefone_e164'] or u2['telefone'])
+                and u1['telefone'] and u2['telefone']):
             diffs.append(f"Telefone: '{u1['telefone']}' vs '{u2['telefone']}'")
         if u1['indicador'] != u2['indicador'] and u1['indicador'] and u2['indicador']:
             diffs.append(f"Indicador: '{u1['indicador']}' vs '{u2['indicador']}'")
@@ -230,73 +272,70 @@ def cruzar_arquivos(usuarios1: List[Dict], usuarios2: List[Dict], nome1: str, no
             print(f"\n... e mais {len(diferencas) - 20} com diferenças")
 
     # Salvar resultados
-    salvar_resultados(emails1, emails2, emails_ambos, apenas_1, apenas_2, diferencas)
+    with metricas.etapa('salvar_resultados') as etapa:
+        salvar_resultados(emails1, emails2, emails_ambos, apenas_1, apenas_2, diferencas)
+        etapa.linhas(entrada=len(apenas_1) + len(apenas_2) + len(emails_ambos))
 
 def salvar_resultados(emails1, emails2, emails_ambos, apenas_1, apenas_2, diferencas):
-    """Salva resultados em arquivos CSV"""
+    """Salva resultados em arquivos CSV
+
+    Os emails são ordenados uma única vez e cada um segue, na mesma passada,
+    para todos os arquivos a que pertence; cada arquivo só substitui o
+    anterior quando está completo.
+    """
+    cabecalho = ['EMAIL', 'NOME', 'TELEFONE', 'INDICADOR', 'PLANO', 'STATUS', 'OBS']
+    diffs = {item['email']: item['diffs'] for item in diferencas}
+
+    def usuario(email):
+        u = emails2[email] if email in apenas_2 else emails1[email]
+        return [
+            u['email'], u['nome'], u['telefone'], u['indicador'],
+            u.get('plano', ''), u.get('status', ''), u['obs']
+        ]
+
+    somente1, somente2, ambos, com_diferencas = multiplexar(sorted(apenas_1 | apenas_2 | emails_ambos), [
+        DestinoCsv('usuarios_somente_arquivo1.csv', cabecalho, usuario, apenas_1.__contains__, sempre=False),
+        DestinoCsv('usuarios_somente_arquivo2.csv', cabecalho, usuario, apenas_2.__contains__, sempre=False),
+        DestinoCsv('usuarios_em_ambos.csv', cabecalho, usuario, emails_ambos.__contains__, sempre=False),
+        DestinoCsv('usuarios_com_diferencas.csv', ['EMAIL', 'DIFERENCAS'],
+                   lambda email: [email, ' | '.join(diffs[email])], diffs.__contains__, sempre=False),
+    ])
+
+    if somente1.total:
+        print(f"\n💾 Salvos usuários somente no arquivo 1: {somente1.caminho}")
+    if somente2.total:
+        print(f"💾 Salvos usuários somente no arquivo 2: {somente2.caminho}")
+    if ambos.total:
+        print(f"💾 Salvos usuários em ambos os arquivos: {ambos.caminho}")
+    if com_diferencas.total:
+        print(f"💾 Salvos usuários com diferenças: {com_diferencas.caminho}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analisa e cruza dados de usuários')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='ignora o cache de arquivos já lidos (.cache_fontes)')
+    metricas.adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    cache_fontes.configurar(habilitado=not args.no_cache)
+    metricas.configurar_por_args(args, 'analisar_usuarios')
 
-    # Usuários somente no arquivo 1
-    if apenas_1:
-        with open('usuarios_somente_arquivo1.csv', 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['EMAIL', 'NOME', 'TELEFONE', 'INDICADOR', 'PLANO', 'STATUS', 'OBS'])
-            for email in sorted(apenas_1):
-                u = emails1[email]
-                writer.writerow([
-                    u['email'], u['nome'], u['telefone'], u['indicador'],
-                    u.get('plano', ''), u.get('status', ''), u['obs']
-                ])
-        print(f"\n💾 Salvos usuários somente no arquivo 1: usuarios_somente_arquivo1.csv")
-
-    # Usuários somente no arquivo 2
-    if apenas_2:
-        with open('usuarios_somente_arquivo2.csv', 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['EMAIL', 'NOME', 'TELEFONE', 'INDICADOR', 'PLANO', 'STATUS', 'OBS'])
-            for email in sorted(apenas_2):
-                u = emails2[email]
-                writer.writerow([
-                    u['email'], u['nome'], u['telefone'], u['indicador'],
-                    u.get('plano', ''), u.get('status', ''), u['obs']
-                ])
-        print(f"💾 Salvos usuários somente no arquivo 2: usuarios_somente_arquivo2.csv")
-
-    # Usuários em ambos
-    if emails_ambos:
-        with open('usuarios_em_ambos.csv', 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['EMAIL', 'NOME', 'TELEFONE', 'INDICADOR', 'PLANO', 'STATUS', 'OBS'])
-            for email in sorted(emails_ambos):
-                u = emails1[email]
-                writer.writerow([
-                    u['email'], u['nome'], u['telefone'], u['indicador'],
-                    u.get('plano', ''), u.get('status', ''), u['obs']
-                ])
-        print(f"💾 Salvos usuários em ambos os arquivos: usuarios_em_ambos.csv")
-
-    # Diferenças
-    if diferencas:
-        with open('usuarios_com_diferencas.csv', 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['EMAIL', 'DIFERENCAS'])
-            for item in diferencas:
-                writer.writerow([item['email'], ' | '.join(item['diffs'])])
-        print(f"💾 Salvos usuários com diferenças: usuarios_com_diferencas.csv")
-
-def main():
     print("="*80)
     print("📊 ANÁLISE E CRUZAMENTO DE DADOS DE USUÁRIOS")
     print("="*80)
 
     # Arquivo 1 (CSV existente)
     arquivo1 = "controle usuarios(USUÁRIOS) (2).csv"
-    usuarios1 = ler_csv(arquivo1, delimitador=';')
+    with metricas.etapa('leitura_arquivo1') as etapa:
+        usuarios1 = ler_csv(arquivo1, delimitador=';')
+        etapa.linhas(saida=len(usuarios1))
 
     if not usuarios1:
         print(f"\n❌ Não foi possível ler o arquivo: {arquivo1}")
         return
 
-    analisar_arquivo(arquivo1, usuarios1)
+    with metricas.etapa('analise_arquivo1') as etapa:
+        analisar_arquivo(arquivo1, usuarios1)
+        etapa.linhas(entrada=len(usuarios1))
 
     # Arquivo 2 (.numbers convertido para CSV)
     arquivo2_opcoes = [
@@ -312,10 +351,16 @@ def main():
 
     if arquivo2:
         # Usar delimitador correto para arquivo Numbers exportado
-        usuarios2 = ler_csv(arquivo2, delimitador=';')
+        with metricas.etapa('leitura_arquivo2') as etapa:
+            usuarios2 = ler_csv(arquivo2, delimitador=';')
+            etapa.linhas(saida=len(usuarios2))
         if usuarios2:
-            analisar_arquivo(arquivo2, usuarios2)
-            cruzar_arquivos(usuarios1, usuarios2, arquivo1, arquivo2)
+            with metricas.etapa('analise_arquivo2') as etapa:
+                analisar_arquivo(arquivo2, usuarios2)
+                etapa.linhas(entrada=len(usuarios2))
+            with metricas.etapa('cruzamento') as etapa:
+                cruzar_arquivos(usuarios1, usuarios2, arquivo1, arquivo2)
+                etapa.linhas(entrada=len(usuarios1) + len(usuarios2))
         else:
             print(f"\n⚠️  Não foi possível ler usuários do arquivo: {arquivo2}")
     else:
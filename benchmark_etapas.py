@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Benchmark das etapas do reorganizar_banco.py com dados sintéticos
+
+Para cada tamanho (número de usuários) gera as três fontes com
+gerar_dados_sinteticos (reaproveitando a geração anterior com os mesmos
+parâmetros) e mede, sem o cache de leitura, cada etapa: leituras,
+consolidação, relatório, telefones compartilhados, gravação das saídas e
+emails suspeitos. Cada tamanho roda num processo novo, para o pico de
+memória de um não contaminar o outro.
+
+Os resultados são acrescentados a benchmark_historico.jsonl (uma linha por
+tamanho e execução, com o commit) e comparados com a mediana das últimas
+execuções com os mesmos parâmetros; etapas mais lentas que a tolerância são
+apontadas como regressão.
+
+    python3 benchmark_etapas.py                          (10k e 100k)
+    python3 benchmark_etapas.py --tamanhos 1M 10M --etapas consolidar_dados salvar_saidas
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import cache_fontes
+import gerar_dados_sinteticos
+import metricas
+import regras_alerta
+import reorganizar_banco
+from agregadores import AgregadorRelatorio
+from emails_suspeitos import gerar_emails_suspeitos
+from gerar_dados_sinteticos import ARQUIVO_PAGAMENTOS, ARQUIVO_PLANILHA, ARQUIVO_SISTEMA, quantidade
+
+ARQUIVO_HISTORICO = 'benchmark_historico.jsonl'
+DIRETORIO_DADOS = '.dados_sinteticos'
+TAMANHOS_PADRAO = ('10k', '100k')
+TOLERANCIA = 0.25
+# Diferenças abaixo disso são ruído de medição, não regressão
+PISO_SEGUNDOS = 0.05
+EXECUCOES_COMPARADAS = 5
+
+# Etapas na ordem de execução e o que cada uma precisa antes
+ETAPAS = ('ler_usuarios_sistema', 'ler_usuarios_planilha', 'ler_pagamentos', 'consolidar_dados',
+          'relatorio', 'telefones_compartilhados', 'salvar_saidas', 'emails_suspeitos')
+_LEITURAS = ('ler_usuarios_sistema', 'ler_usuarios_planilha', 'ler_pagamentos')
+DEPENDENCIAS = {
+    'consolidar_dados': _LEITURAS,
+    'relatorio': ('consolidar_dados',),
+    'telefones_compartilhados': _LEITURAS,
+    'salvar_saidas': ('consolidar_dados',),
+    'emails_suspeitos': ('consolidar_dados',),
+}
+
+def com_dependencias(etapas) -> List[str]:
+    """Etapas pedidas mais as de que dependem, na ordem de ETAPAS"""
+    pedidas = set()
+    pendentes = list(etapas)
+    while pendentes:
+        etapa = pendentes.pop()
+        if etapa not in pedidas:
+            pedidas.add(etapa)
+            pendentes.extend(DEPENDENCIAS.get(etapa, ()))
+    return [etapa for etapa in ETAPAS if etapa in pedidas]
+
+def _executar(etapa: str, c: Dict) -> int:
+    """Executa uma etapa sobre o contexto c e retorna quantas linhas/registros ela processou"""
+    if etapa == 'ler_usuarios_sistema':
+        c['sistema'] = reorganizar_banco.ler_usuarios_sistema.sem_cache(ARQUIVO_SISTEMA)
+        return len(c['sistema'])
+    if etapa == 'ler_usuarios_planilha':
+        c['planilha'] = reorganizar_banco.ler_usuarios_planilha.sem_cache(ARQUIVO_PLANILHA)
+        return len(c['planilha'])
+    if etapa == 'ler_pagamentos':
+        # Como no reorganizar_banco.py: o COPY de pagamentos é gravado na mesma leitura
+        c['historico'], c['ultimo_status'], c['receita'], c['total_carga'] = \
+            reorganizar_banco.ler_pagamentos_carregando(ARQUIVO_PAGAMENTOS)
+        return sum(u['total_pagamentos'] for u in c['ultimo_status'].values())
+    if etapa == 'consolidar_dados':
+        c['usuarios'] = reorganizar_banco.consolidar_dados(c['sistema'], c['planilha'], c['historico'],
+                                                           c['ultimo_status'], motor=regras_alerta.compilar())
+        return len(c['usuarios'])
+    if etapa == 'relatorio':
+        relatorio = AgregadorRelatorio()
+        relatorio.adicionar_todos(c['usuarios'])
+        relatorio.imprimir()
+        c['receita'].imprimir()
+        return len(c['usuarios'])
+    if etapa == 'telefones_compartilhados':
+        return len(reorganizar_banco.telefones_compartilhados(c['sistema'], c['planilha'], c['ultimo_status']))
+    if etapa == 'salvar_saidas':
+        reorganizar_banco.salvar_saidas(c['usuarios'], ARQUIVO_PAGAMENTOS, total_carga=c['total_carga'])
+        return len(c['usuarios'])
+    if etapa == 'emails_suspeitos':
+        return len(gerar_emails_suspeitos(c['usuarios']))
+    raise ValueError(f"etapa desconhecida: {etapa}")
+
+def medir(diretorio: str, etapas: List[str], perfis: Optional[str] = None) -> Dict[str, Dict]:
+    """Mede as etapas dentro de diretorio (as saídas são gravadas lá); roda no processo filho
+
+    As medidas vêm de metricas.etapa, as mesmas do --metrics dos scripts.
+    """
+    os.chdir(diretorio)
+    cache_fontes.configurar(habilitado=False)
+    metricas.configurar('benchmark_etapas', perfis=perfis)
+    contexto = {}
+    for etapa in etapas:
+        with redirect_stdout(io.StringIO()), metricas.etapa(etapa) as medida:
+            medida.linhas(entrada=_executar(etapa, contexto))
+    return {
+        registro['nome']: {
+            'segundos': registro['segundos'],
+            'cpu_segundos': registro['cpu_segundos'],
+            'linhas': registro['linhas_entrada'],
+            'linhas_por_segundo': registro.get('linhas_por_segundo'),
+            'pico_memoria_mb': registro['pico_memoria_mb'],
+        }
+        for registro in metricas.registros()
+    }
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def ler_historico(arquivo: str = ARQUIVO_HISTORICO) -> List[Dict]:
+    try:
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            return [json.loads(linha) for linha in f if linha.strip()]
+    except FileNotFoundError:
+        return []
+
+def regressoes(registro: Dict, historico: List[Dict], tolerancia: float = TOLERANCIA) -> List[Dict]:
+    """Etapas mais lentas que a mediana das últimas execuções com os mesmos parâmetros"""
+    anteriores = [r for r in historico if r['parametros'] == registro['parametros']][-EXECUCOES_COMPARADAS:]
+    encontradas = []
+    for etapa, medida in registro['etapas'].items():
+        tempos = [r['etapas'][etapa]['segundos'] for r in anteriores if etapa in r['etapas']]
+        if not tempos:
+            continue
+        mediana = statistics.median(tempos)
+        if medida['segundos'] > mediana * (1 + tolerancia) and medida['segundos'] - mediana > PISO_SEGUNDOS:
+            encontradas.append({'etapa': etapa, 'segundos': medida['segundos'], 'mediana': mediana,
+                                'execucoes': len(tempos)})
+    return encontradas
+
+def preparar_dados(usuarios: int, args) -> Dict:
+    """Gera (ou reaproveita) as fontes sintéticas de um tamanho; retorna os parâmetros da geração"""
+    diretorio = os.path.join(args.dados, f"{usuarios}-s{args.semente}")
+    pedidos = {'usuarios': usuarios, 'pagamentos_por_usuario': args.pagamentos_por_usuario,
+               'duplicados': args.duplicados, 'quase_duplicados': args.quase_duplicados,
+               'sujos': args.sujos, 'semente': args.semente}
+    existentes = gerar_dados_sinteticos.ler_parametros(diretorio)
+    if {chave: existentes.get(chave) for chave in pedidos} != pedidos:
+        print(f"  🧪 Gerando {usuarios:,} usuários em {diretorio}/ ...")
+        existentes = gerar_dados_sinteticos.gerar(diretorio, **pedidos)
+    existentes['diretorio'] = diretorio
+    return existentes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mede as etapas do reorganizar_banco.py com dados sintéticos')
+    parser.add_argument('--tamanhos', nargs='+', type=quantidade, default=[quantidade(t) for t in TAMANHOS_PADRAO],
+                        help='números de usuários (ex.: 10k 100k 1M 10M; padrão: 10k 100k)')
+    parser.add_argument('--etapas', nargs='+', choices=ETAPAS, default=list(ETAPAS),
+                        help='etapas medidas (as de que dependem rodam e são medidas também)')
+    parser.add_argument('--dados', default=DIRETORIO_DADOS, help=f'onde guardar os dados gerados ({DIRETORIO_DADOS})')
+    parser.add_argument('--historico', default=ARQUIVO_HISTORICO, help=f'histórico JSONL ({ARQUIVO_HISTORICO})')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA,
+                        help='lentidão aceita em relação à mediana das últimas execuções (padrão: 0.25)')
+    parser.add_argument('--falhar-em-regressao', action='store_true', help='sai com código 1 se houver regressão')
+    parser.add_argument('--sem-historico', action='store_true', help='não grava no histórico')
+    parser.add_argument('--profile', metavar='DIRETORIO',
+                        help='grava um perfil do cProfile por etapa e tamanho neste diretório')
+    parser.add_argument('--pagamentos-por-usuario', type=float, default=2.0)
+    parser.add_argument('--duplicados', type=gerar_dados_sinteticos.fracao, default=0.01)
+    parser.add_argument('--quase-duplicados', type=gerar_dados_sinteticos.fracao, default=0.02)
+    parser.add_argument('--sujos', type=gerar_dados_sinteticos.fracao, default=0.02)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    etapas = com_dependencias(args.etapas)
+    historico = ler_historico(args.historico)
+    commit = _commit()
+    total_regressoes = 0
+
+    print("=" * 80)
+    print(f"⏱️  BENCHMARK DAS ETAPAS ({commit or 'sem commit'}, Python {platform.python_version()})")
+    print("=" * 80)
+    for usuarios in args.tamanhos:
+        print(f"\n📏 {usuarios:,} usuários")
+        dados = preparar_dados(usuarios, args)
+        totais = dados['totais']
+        print(f"  Linhas: sistema {totais['sistema']:,} | planilha {totais['planilha']:,} | "
+              f"pagamentos {totais['pagamentos']:,}")
+
+        # Processo novo por tamanho: pico de memória e caches de um não afetam o outro
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            perfis = os.path.abspath(os.path.join(args.profile, str(usuarios))) if args.profile else None
+            medidas = pool.submit(medir, os.path.abspath(dados['diretorio']), etapas, perfis).result()
+
+        registro = {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'parametros': {chave: dados[chave] for chave in ('usuarios', 'pagamentos_por_usuario', 'duplicados',
+                                                             'quase_duplicados', 'sujos', 'semente')},
+            'linhas': totais,
+            'etapas': medidas,
+        }
+        encontradas = {r['etapa']: r for r in regressoes(registro, historico, args.tolerancia)}
+        for etapa, medida in medidas.items():
+            por_segundo = f"{medida['linhas_por_segundo']:>12,}/s" if medida['linhas_por_segundo'] else ' ' * 14
+            marca = ''
+            if etapa in encontradas:
+                r = encontradas[etapa]
+                marca = f"  ⚠️  REGRESSÃO: mediana {r['mediana']:.3f}s em {r['execucoes']} execução(ões)"
+            print(f"  {etapa:<26} {medida['segundos']:>9.3f}s {por_segundo} {medida['pico_memoria_mb']:>9.1f} MB"
+                  f"{marca}")
+        total_regressoes += len(encontradas)
+
+        if not args.sem_historico:
+            with open(args.historico, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        historico.append(registro)
+
+    print(f"\n{'=' * 80}")
+    if total_regressoes:
+        print(f"⚠️  {total_regressoes} etapa(s) mais lenta(s) que a mediana + {args.tolerancia:.0%}")
+    else:
+        print("✅ Nenhuma regressão em relação às execuções anteriores")
+    if not args.sem_historico:
+        print(f"💾 Histórico: {args.historico}")
+    return 1 if total_regressoes and args.falhar_em_regressao else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
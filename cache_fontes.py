@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Cache em disco dos registros lidos e normalizados das planilhas exportadas
+
+Usado por analisar_usuarios.py, cruzar_usuarios.py e reorganizar_banco.py
+para não reprocessar os mesmos arquivos a cada execução. Cada entrada guarda
+a impressão digital do arquivo de origem (caminho, tamanho, mtime e hash do
+conteúdo) e é invalidada automaticamente quando o arquivo muda. A chave
+inclui o hash do código do leitor e de todos os módulos do projeto de que
+ele depende (telefones, datas, moeda, agregadores...), então alterar
+qualquer um deles também invalida as entradas.
+"""
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import struct
+import sys
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Formato da entrada: MAGICO | tamanho do cabeçalho (uint32) | cabeçalho | registros
+MAGICO = b'FINCACHE1\n'
+EXTENSAO = '.cache'
+
+DIRETORIO_PADRAO = os.environ.get('FINANCEIRO_CACHE_DIR', '.cache_fontes')
+LIMITE_PADRAO_MB = int(os.environ.get('FINANCEIRO_CACHE_MAX_MB', '256'))
+
+_config = {
+    'habilitado': True,
+    'diretorio': DIRETORIO_PADRAO,
+    'limite_bytes': LIMITE_PADRAO_MB * 1024 * 1024,
+}
+
+_versoes_codigo: Dict[str, str] = {}
+
+def configurar(habilitado: Optional[bool] = None, diretorio: Optional[str] = None,
+               limite_mb: Optional[int] = None):
+    """Ajusta o cache (ex.: habilitado=False para a opção --no-cache)"""
+    if habilitado is not None:
+        _config['habilitado'] = habilitado
+    if diretorio is not None:
+        _config['diretorio'] = diretorio
+    if limite_mb is not None:
+        _config['limite_bytes'] = limite_mb * 1024 * 1024
+
+def esta_habilitado() -> bool:
+    """Indica se o cache está ativo (para repassar a processos filhos)"""
+    return _config['habilitado']
+
+def hash_conteudo(arquivo: str) -> str:
+    """Calcula o hash do conteúdo do arquivo em blocos"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(arquivo, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+def impressao_digital(arquivo: str, com_hash: bool = True) -> Dict:
+    """Retorna caminho, tamanho, mtime e (opcionalmente) hash do arquivo"""
+    st = os.stat(arquivo)
+    return {
+        'caminho': os.path.abspath(arquivo),
+        'tamanho': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'hash': hash_conteudo(arquivo) if com_hash else None,
+    }
+
+def modulos_locais(modulo) -> List[str]:
+    """Arquivos .py do projeto (mesmo diretório) usados pelo módulo, direta ou indiretamente
+
+    Segue os módulos importados e os módulos de origem das funções e classes
+    importadas com 'from x import y'.
+    """
+    raiz = os.path.dirname(os.path.abspath(modulo.__file__))
+    vistos = set()
+    arquivos = []
+    pendentes = [modulo]
+    while pendentes:
+        atual = pendentes.pop()
+        arquivo = getattr(atual, '__file__', None)
+        if atual.__name__ in vistos or not arquivo or os.path.dirname(os.path.abspath(arquivo)) != raiz:
+            continue
+        vistos.add(atual.__name__)
+        arquivos.append(os.path.abspath(arquivo))
+        for valor in vars(atual).values():
+            if inspect.ismodule(valor):
+                pendentes.append(valor)
+                continue
+            nome = getattr(valor, '__module__', None)
+            if isinstance(nome, str) and nome in sys.modules:
+                pendentes.append(sys.modules[nome])
+    return sorted(set(arquivos))
+
+def versao_codigo(leitor: Callable) -> str:
+    """Hash do módulo da função e dos módulos do projeto de que ele depende
+
+    Alterar o código de qualquer um deles invalida os resultados gravados.
+    """
+    nome = leitor.__module__
+    if nome not in _versoes_codigo:
+        h = hashlib.blake2b(digest_size=16)
+        try:
+            for arquivo in modulos_locais(sys.modules[nome]):
+                h.update(os.path.basename(arquivo).encode('utf-8'))
+                h.update(hash_conteudo(arquivo).encode('ascii'))
+            _versoes_codigo[nome] = h.hexdigest()
+        except (KeyError, AttributeError, TypeError, OSError):
+            _versoes_codigo[nome] = nome
+    return _versoes_codigo[nome]
+
+def _caminho_entrada(leitor: Callable, argumentos: Tuple) -> str:
+    """Nome da entrada: leitor + argumentos normalizados (inclui o caminho absoluto)"""
+    chave = repr((leitor.__module__, leitor.__qualname__, versao_codigo(leitor), argumentos))
+    digest = hashlib.blake2b(chave.encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(_config['diretorio'], f"{leitor.__name__}-{digest}{EXTENSAO}")
+
+def _ler_cabecalho(f) -> Optional[Dict]:
+    """Lê o cabeçalho de uma entrada aberta, ou None se estiver corrompida"""
+    if f.read(len(MAGICO)) != MAGICO:
+        return None
+    tamanho = struct.unpack('<I', f.read(4))[0]
+    return pickle.loads(f.read(tamanho))
+
+def _carregar(caminho: str, arquivo: str):
+    """Retorna (True, registros) se a entrada ainda corresponde ao arquivo de origem"""
+    try:
+        with open(caminho, 'rb') as f:
+            cabecalho = _ler_cabecalho(f)
+            if cabecalho is None:
+                return False, None
+
+            atual = impressao_digital(arquivo, com_hash=False)
+            mesmo_stat = (cabecalho['tamanho'] == atual['tamanho'] and
+                          cabecalho['mtime_ns'] == atual['mtime_ns'])
+            if not mesmo_stat:
+                # mtime mudou (cópia, checkout...): o hash decide se o conteúdo é o mesmo
+                if cabecalho['tamanho'] != atual['tamanho'] or cabecalho['hash'] != hash_conteudo(arquivo):
+                    return False, None
+            registros = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, struct.error, KeyError, ValueError):
+        return False, None
+
+    if not mesmo_stat:
+        _gravar(caminho, impressao_digital(arquivo), registros)
+    else:
+        # Marca como usada recentemente para a política LRU
+        try:
+            os.utime(caminho)
+        except OSError:
+            pass
+    return True, registros
+
+def _gravar(caminho: str, cabecalho: Dict, registros):
+    """Grava a entrada de forma atômica (arquivo temporário + rename)"""
+    diretorio = os.path.dirname(caminho)
+    try:
+        os.makedirs(diretorio, exist_ok=True)
+        cabecalho_bytes = pickle.dumps(cabecalho, protocol=pickle.HIGHEST_PROTOCOL)
+        fd, temporario = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(MAGICO)
+                f.write(struct.pack('<I', len(cabecalho_bytes)))
+                f.write(cabecalho_bytes)
+                pickle.dump(registros, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporario, caminho)
+        except BaseException:
+            os.unlink(temporario)
+            raise
+    except OSError as e:
+        print(f"⚠️  Não foi possível gravar o cache ({e}); seguindo sem cache")
+        return
+    aplicar_limite()
+
+def aplicar_limite(limite_bytes: Optional[int] = None):
+    """Remove as entradas usadas há mais tempo até caber no limite (LRU)"""
+    if limite_bytes is None:
+        limite_bytes = _config['limite_bytes']
+    diretorio = _config['diretorio']
+    try:
+        nomes = [n for n in os.listdir(diretorio) if n.endswith(EXTENSAO)]
+    except OSError:
+        return
+
+    entradas = []
+    for nome in nomes:
+        caminho = os.path.join(diretorio, nome)
+        try:
+            st = os.stat(caminho)
+        except OSError:
+            continue
+        entradas.append((st.st_mtime_ns, st.st_size, caminho))
+
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= limite_bytes:
+            break
+        try:
+            os.unlink(caminho)
+            total -= tamanho
+        except OSError:
+            pass
+
+def em_cache(leitor: Callable) -> Callable:
+    """Decorador para leitores cujo primeiro argumento é o caminho do arquivo"""
+    assinatura = inspect.signature(leitor)
+
+    def ler_ou_consultar(ler: Callable, arquivo, *args, **kwargs):
+        """(registros, veio_do_cache) de leitor(arquivo, ...); na falta da entrada, ler() produz os registros
+
+        ler deve devolver o mesmo que o leitor com esses argumentos; serve
+        para leituras que fazem mais alguma coisa na mesma passada (gravar
+        um arquivo, por exemplo), o que não acontece quando o cache acerta.
+        """
+        if not _config['habilitado'] or not os.path.isfile(arquivo):
+            return ler(), False
+
+        argumentos = assinatura.bind(os.path.abspath(arquivo), *args, **kwargs)
+        argumentos.apply_defaults()
+        caminho = _caminho_entrada(leitor, tuple(argumentos.arguments.items()))
+
+        encontrado, registros = _carregar(caminho, arquivo)
+        if encontrado:
+            return registros, True
+
+        digital = impressao_digital(arquivo)
+        registros = ler()
+        _gravar(caminho, digital, registros)
+        return registros, False
+
+    @functools.wraps(leitor)
+    def leitor_com_cache(arquivo, *args, **kwargs):
+        return ler_ou_consultar(lambda: leitor(arquivo, *args, **kwargs), arquivo, *args, **kwargs)[0]
+
+    leitor_com_cache.sem_cache = leitor
+    leitor_com_cache.ler_ou_consultar = ler_ou_consultar
+    return leitor_com_cache
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Carga em massa no PostgreSQL das tabelas usuarios e pagamentos (prisma/schema.prisma)
+
+Em vez de um upsert por linha (src/scripts/importar-base-consolidada.ts),
+os usuários consolidados e os pagamentos são gravados em arquivos no
+formato do COPY do PostgreSQL (texto ou binário) e script_importacao.sql
+faz um COPY por tabela para tabelas de staging temporárias, seguido de um
+merge: INSERT ... ON CONFLICT (email_login) nos usuários e, como
+pagamentos não têm chave natural única, INSERT só dos pagamentos que ainda
+não existem (mesmo usuário, data, valor e conta). Valores em dinheiro
+viajam como centavos (bigint) e viram numeric no merge.
+
+    psql "$DATABASE_URL" -f script_importacao.sql     (no diretório dos arquivos)
+
+Os arquivos podem ser conferidos sem um PostgreSQL com ler_copy:
+
+    python3 carga_postgres.py [--formato binario]
+"""
+import argparse
+import operator
+import re
+import struct
+import sys
+from datetime import date
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from saidas import ArquivoAtomico, Destino
+
+FORMATOS = ('texto', 'binario')
+ARQUIVO_SCRIPT = 'script_importacao.sql'
+ARQUIVOS_COPY = {
+    'texto': ('carga_usuarios.copy', 'carga_pagamentos.copy'),
+    'binario': ('carga_usuarios.bin', 'carga_pagamentos.bin'),
+}
+
+# (coluna, tipo) das tabelas de staging, na ordem dos arquivos COPY
+COLUNAS_USUARIOS = (
+    ('email_login', 'text'), ('nome_completo', 'text'), ('telefone', 'text'), ('indicador', 'text'),
+    ('status_final', 'text'), ('total_ciclos_usuario', 'integer'), ('data_pagto', 'date'),
+    ('data_venc', 'date'), ('obs', 'text'),
+)
+COLUNAS_PAGAMENTOS = (
+    ('email_login', 'text'), ('data_pagto', 'date'), ('mes_pagto', 'text'), ('valor_centavos', 'bigint'),
+    ('metodo', 'text'), ('conta', 'text'), ('regra_tipo', 'text'), ('regra_valor_centavos', 'bigint'),
+    ('elegivel_comissao', 'boolean'), ('comissao_valor_centavos', 'bigint'), ('observacao', 'text'),
+)
+
+# Métodos aceitos pela enum MetodoPagamento (comparação só com os caracteres
+# ASCII: 'CRÉDITO' chega como 'CRDITO' na leitura com errors='ignore')
+_METODOS = {'PIX': 'PIX', 'CREDITO': 'CREDITO', 'CRDITO': 'CREDITO', 'DIN': 'DINHEIRO', 'DINHEIRO': 'DINHEIRO'}
+_REGRAS = ('PRIMEIRO', 'RECORRENTE')
+_VERDADEIROS = ('1', 'true', 'verdadeiro')
+
+def metodo_pagamento(texto: str) -> Optional[str]:
+    """Valor da enum MetodoPagamento, ou None se não reconhecido"""
+    return _METODOS.get(''.join(c for c in texto.strip().upper() if c.isascii()))
+
+def regra_tipo(texto: str, ciclo: str) -> Optional[str]:
+    """Valor da enum RegraTipo; sem REGRA_TIPO, o ciclo 1 é PRIMEIRO e os seguintes RECORRENTE"""
+    regra = texto.strip().upper()
+    if regra in _REGRAS:
+        return regra
+    ciclo = inteiro(ciclo)
+    if ciclo > 0:
+        return 'PRIMEIRO' if ciclo == 1 else 'RECORRENTE'
+    return None
+
+def booleano(texto: str) -> bool:
+    return texto.strip().lower() in _VERDADEIROS
+
+def inteiro(valor) -> int:
+    """Como parseInt(...) || 0 dos importadores TypeScript"""
+    try:
+        return int(str(valor).strip())
+    except ValueError:
+        return 0
+
+def status_final(u) -> str:
+    """Valor da enum StatusFinal de um usuário consolidado (mesma regra do importador TypeScript)"""
+    tem_pagamentos = u.tem_pagamentos == 'SIM'
+    status_pagamento = u.status_pagamento
+    if tem_pagamentos and status_pagamento == 'Ativo':
+        return 'ATIVO'
+    if u.status_sistema == 'Ativo':
+        return 'ATIVO'
+    if tem_pagamentos and status_pagamento == 'Inativo':
+        return 'INATIVO'
+    if status_pagamento == 'Histórico':
+        return 'HISTORICO'
+    return 'INATIVO'
+
+_CAMPOS_OBS = operator.attrgetter('obs', 'plano', 'empresa', 'funcao', 'verificado', 'tem_pagamentos',
+                                  'total_pagamentos', 'total_ciclos', 'ultimo_pagamento', 'data_vencimento',
+                                  'tags_str', 'alertas_str', 'fontes_str')
+
+def observacoes(u) -> str:
+    """Campo obs com a observação original e os blocos [SISTEMA], [PAGAMENTOS], [TAGS], [ALERTAS] e [FONTES]"""
+    (obs, plano, empresa, funcao, verificado, tem_pagamentos, total_pagamentos, total_ciclos,
+     ultimo_pagamento, data_vencimento, tags_str, alertas_str, fontes_str) = _CAMPOS_OBS(u)
+    partes = []
+    if obs:
+        partes.append(obs)
+
+    sistema = []
+    if plano:
+        sistema.append(f"Plano: {plano}")
+    if empresa and empresa != 'N/A':
+        sistema.append(f"Empresa: {empresa}")
+    if funcao and funcao != 'N/A':
+        sistema.append(f"Função: {funcao}")
+    if verificado:
+        sistema.append(f"Verificado: {verificado}")
+    if sistema:
+        partes.append(f"[SISTEMA] {' | '.join(sistema)}")
+
+    if tem_pagamentos == 'SIM':
+        pagamentos = [f"Total Pagamentos: {total_pagamentos}", f"Ciclos: {total_ciclos}"]
+        if ultimo_pagamento:
+            pagamentos.append(f"Último: {ultimo_pagamento}")
+        if data_vencimento:
+            pagamentos.append(f"Vence: {data_vencimento}")
+        partes.append(f"[PAGAMENTOS] {' | '.join(pagamentos)}")
+
+    if tags_str:
+        partes.append(f"[TAGS] {tags_str}")
+    if alertas_str:
+        partes.append(f"[ALERTAS] {alertas_str}")
+    if fontes_str:
+        partes.append(f"[FONTES] {fontes_str}")
+    return '\n'.join(partes)
+
+_CAMPOS_USUARIO = operator.attrgetter('email', 'nome', 'telefone', 'indicador', 'total_ciclos',
+                                      'ultimo_pagamento_ord', 'data_vencimento_ord')
+
+def linha_usuario(u) -> Tuple:
+    """Linha de COLUNAS_USUARIOS para um usuário consolidado (UsuarioConsolidado)"""
+    email, nome, telefone, indicador, total_ciclos, ultimo_pagamento_ord, data_vencimento_ord = _CAMPOS_USUARIO(u)
+    return (
+        email,
+        nome or 'Sem nome',
+        telefone or None,
+        indicador or None,
+        status_final(u),
+        inteiro(total_ciclos or 0),
+        ultimo_pagamento_ord,
+        data_vencimento_ord,
+        observacoes(u),
+    )
+
+# Codificação dos valores por tipo de coluna
+
+_EPOCA_PG = date(2000, 1, 1).toordinal()
+_CABECALHO_BINARIO = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+_FIM_BINARIO = struct.pack('!h', -1)
+_NULO_BINARIO = struct.pack('!i', -1)
+
+def _texto_texto(valor) -> str:
+    # Quase nenhum texto tem o que escapar: o caso comum só testa e devolve o próprio valor
+    if '\\' in valor or '\t' in valor or '\n' in valor or '\r' in valor:
+        return valor.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    return valor
+
+def _texto_data(ordinal: int) -> str:
+    return date.fromordinal(ordinal).isoformat()
+
+_PARA_TEXTO = {
+    'text': _texto_texto,
+    'integer': str,
+    'bigint': str,
+    'boolean': lambda v: 't' if v else 'f',
+    'date': _texto_data,
+}
+
+_PARA_BINARIO = {
+    'text': lambda v: v.encode('utf-8'),
+    'integer': struct.Struct('!i').pack,
+    'bigint': struct.Struct('!q').pack,
+    'boolean': lambda v: b'\x01' if v else b'\x00',
+    'date': lambda v: struct.pack('!i', v - _EPOCA_PG),
+}
+
+class ArquivoCopy:
+    """Grava linhas (tuplas na ordem das colunas) num arquivo para COPY ... FROM, em texto ou binário"""
+
+    def __init__(self, caminho: str, colunas: Sequence[Tuple[str, str]], formato: str = 'texto'):
+        if formato not in FORMATOS:
+            raise ValueError(f"formato de COPY inválido: {formato!r} (use {' ou '.join(FORMATOS)})")
+        self.caminho = caminho
+        self.colunas = colunas
+        self.formato = formato
+        self.total = 0
+        if formato == 'texto':
+            self._codificadores = [_PARA_TEXTO[tipo] for _, tipo in colunas]
+            self._arquivo = ArquivoAtomico(caminho, newline='\n')
+        else:
+            self._codificadores = [_PARA_BINARIO[tipo] for _, tipo in colunas]
+            self._arquivo = ArquivoAtomico(caminho, binario=True)
+            self._arquivo.write(_CABECALHO_BINARIO)
+            self._campos = struct.pack('!h', len(colunas))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *exc):
+        if tipo is None:
+            self.fechar()
+        else:
+            self.descartar()
+
+    def escrever(self, linha: Sequence):
+        if self.formato == 'texto':
+            self._arquivo.write('\t'.join('\\N' if v is None else codificar(v)
+                                          for codificar, v in zip(self._codificadores, linha)) + '\n')
+        else:
+            partes = [self._campos]
+            for codificar, v in zip(self._codificadores, linha):
+                if v is None:
+                    partes.append(_NULO_BINARIO)
+                else:
+                    dados = codificar(v)
+                    partes.append(struct.pack('!i', len(dados)))
+                    partes.append(dados)
+            self._arquivo.write(b''.join(partes))
+        self.total += 1
+
+    def escrever_todas(self, linhas: Iterable[Sequence]):
+        for linha in linhas:
+            self.escrever(linha)
+        return self
+
+    def fechar(self):
+        """Termina o arquivo e o publica no caminho final"""
+        if self._arquivo.arquivo.closed:
+            return
+        if self.formato == 'binario':
+            self._arquivo.write(_FIM_BINARIO)
+        self._arquivo.concluir()
+
+    def descartar(self):
+        self._arquivo.descartar()
+
+class DestinoCopy(Destino):
+    """Arquivo COPY como destino do multiplexador de saidas; linha converte o registro"""
+
+    def __init__(self, caminho: str, colunas: Sequence[Tuple[str, str]], formato: str, linha: Callable,
+                 filtro: Optional[Callable] = None):
+        super().__init__(caminho, filtro)
+        self.colunas = colunas
+        self.formato = formato
+        self.linha = linha
+
+    def _abrir(self):
+        return ArquivoCopy(self.caminho, self.colunas, self.formato)
+
+    def _gravar(self, registro):
+        self._arquivo.escrever(self.linha(registro))
+
+    def _publicar(self):
+        self._arquivo.fechar()
+
+# Leitura de volta (conferência sem PostgreSQL)
+
+_ESCAPE_LIDO = re.compile(r'\\(.)')
+_SEQUENCIAS = {'t': '\t', 'n': '\n', 'r': '\r'}
+
+def _desfazer_escape(m) -> str:
+    return _SEQUENCIAS.get(m.group(1), m.group(1))
+
+_DE_TEXTO = {
+    'text': lambda v: _ESCAPE_LIDO.sub(_desfazer_escape, v),
+    'integer': int,
+    'bigint': int,
+    'boolean': lambda v: v == 't',
+    'date': lambda v: date.fromisoformat(v).toordinal(),
+}
+
+_DE_BINARIO = {
+    'text': lambda b: b.decode('utf-8'),
+    'integer': lambda b: struct.unpack('!i', b)[0],
+    'bigint': lambda b: struct.unpack('!q', b)[0],
+    'boolean': lambda b: b == b'\x01',
+    'date': lambda b: struct.unpack('!i', b)[0] + _EPOCA_PG,
+}
+
+def ler_copy(caminho: str, colunas: Sequence[Tuple[str, str]], formato: str = 'texto') -> Iterator[Tuple]:
+    """Decodifica um arquivo gravado por ArquivoCopy (tuplas com None para NULL)"""
+    tipos = [tipo for _, tipo in colunas]
+    if formato == 'texto':
+        decodificadores = [_DE_TEXTO[tipo] for tipo in tipos]
+        with open(caminho, 'r', encoding='utf-8', newline='\n') as f:
+            for linha in f:
+                campos = linha.rstrip('\n').split('\t')
+                yield tuple(None if v == '\\N' else decodificar(v) for decodificar, v in zip(decodificadores, campos))
+        return
+
+    decodificadores = [_DE_BINARIO[tipo] for tipo in tipos]
+    with open(caminho, 'rb') as f:
+        if f.read(len(_CABECALHO_BINARIO)) != _CABECALHO_BINARIO:
+            raise ValueError(f"{caminho}: cabeçalho de COPY binário inválido")
+        while True:
+            (campos,) = struct.unpack('!h', f.read(2))
+            if campos == -1:
+                return
+            linha = []
+            for decodificar in decodificadores[:campos]:
+                (tamanho,) = struct.unpack('!i', f.read(4))
+                linha.append(None if tamanho == -1 else decodificar(f.read(tamanho)))
+            yield tuple(linha)
+
+# Script de carga
+
+def _definicao(colunas: Sequence[Tuple[str, str]]) -> str:
+    return ', '.join(f"{nome} {tipo}" for nome, tipo in colunas)
+
+def _nomes(colunas: Sequence[Tuple[str, str]]) -> str:
+    return ', '.join(nome for nome, _ in colunas)
+
+SQL_STAGING = (
+    f"CREATE TEMP TABLE staging_usuarios ({_definicao(COLUNAS_USUARIOS)}) ON COMMIT DROP;",
+    f"CREATE TEMP TABLE staging_pagamentos ({_definicao(COLUNAS_PAGAMENTOS)}) ON COMMIT DROP;",
+)
+
+SQL_MERGE = (
+    """INSERT INTO usuarios (id, email_login, nome_completo, telefone, indicador, status_final,
+                      total_ciclos_usuario, data_pagto, data_venc, obs, created_at, updated_at)
+SELECT gen_random_uuid()::text, s.email_login, s.nome_completo, s.telefone, s.indicador,
+       s.status_final::"StatusFinal", s.total_ciclos_usuario, s.data_pagto, s.data_venc, s.obs, now(), now()
+FROM staging_usuarios s
+ON CONFLICT (email_login) DO UPDATE SET
+    nome_completo = EXCLUDED.nome_completo,
+    telefone = EXCLUDED.telefone,
+    indicador = EXCLUDED.indicador,
+    status_final = EXCLUDED.status_final,
+    total_ciclos_usuario = EXCLUDED.total_ciclos_usuario,
+    data_pagto = EXCLUDED.data_pagto,
+    data_venc = EXCLUDED.data_venc,
+    obs = EXCLUDED.obs,
+    updated_at = now();""",
+    """INSERT INTO pagamentos (id, usuario_id, data_pagto, mes_pagto, valor, metodo, conta, regra_tipo,
+                        regra_valor, elegivel_comissao, comissao_valor, observacao, created_at, updated_at)
+SELECT gen_random_uuid()::text, u.id, s.data_pagto, s.mes_pagto, s.valor_centavos::numeric / 100,
+       s.metodo::"MetodoPagamento", s.conta, s.regra_tipo::"RegraTipo", s.regra_valor_centavos::numeric / 100,
+       s.elegivel_comissao, s.comissao_valor_centavos::numeric / 100, s.observacao, now(), now()
+FROM staging_pagamentos s
+JOIN usuarios u ON u.email_login = s.email_login
+WHERE NOT EXISTS (
+    SELECT 1 FROM pagamentos p
+    WHERE p.usuario_id = u.id AND p.data_pagto = s.data_pagto
+      AND p.valor = s.valor_centavos::numeric / 100 AND p.conta = s.conta
+);""",
+)
+
+def _alvo_copy(tabela: str, colunas: Sequence[Tuple[str, str]], formato: str, origem: str) -> str:
+    return f"{tabela} ({_nomes(colunas)}) FROM {origem} WITH (FORMAT {'binary' if formato == 'binario' else 'text'})"
+
+def comando_copy(tabela: str, colunas: Sequence[Tuple[str, str]], formato: str) -> str:
+    """COPY tabela (colunas) FROM STDIN no formato dos arquivos"""
+    return 'COPY ' + _alvo_copy(tabela, colunas, formato, 'STDIN')
+
+def script_carga(formato: str, total_usuarios: int, total_pagamentos: int, por_plano: Dict[str, int],
+                 gerado_em: str) -> str:
+    """Texto de script_importacao.sql: staging, um \\copy por tabela e o merge, numa transação"""
+    arquivo_usuarios, arquivo_pagamentos = ARQUIVOS_COPY[formato]
+    linhas = [
+        "-- Script de importação para banco de dados (PostgreSQL, tabelas do prisma/schema.prisma)",
+        f"-- Gerado em: {gerado_em}",
+        f"-- Total de usuários: {total_usuarios}",
+        f"-- Total de pagamentos: {total_pagamentos}",
+        "--",
+        "-- Faça um backup completo antes de executar este script!",
+        f"-- Execute no diretório de {arquivo_usuarios} e {arquivo_pagamentos}:",
+        f"--   psql \"$DATABASE_URL\" -v ON_ERROR_STOP=1 -f {ARQUIVO_SCRIPT}",
+        "",
+        "BEGIN;",
+        "",
+    ]
+    linhas.extend(SQL_STAGING)
+    linhas.append("")
+    # \\copy do psql lê os arquivos do lado do cliente
+    linhas.append('\\copy ' + _alvo_copy('staging_usuarios', COLUNAS_USUARIOS, formato, f"'{arquivo_usuarios}'"))
+    linhas.append('\\copy ' + _alvo_copy('staging_pagamentos', COLUNAS_PAGAMENTOS, formato, f"'{arquivo_pagamentos}'"))
+    linhas.append("")
+    for comando in SQL_MERGE:
+        linhas.append(comando)
+        linhas.append("")
+    linhas.append("COMMIT;")
+    linhas.append("")
+
+    linhas.append("-- ESTATÍSTICAS DA IMPORTAÇÃO:")
+    linhas.append(f"-- Total de usuários: {total_usuarios}")
+    for plano, count in sorted(por_plano.items(), key=lambda x: x[1], reverse=True):
+        linhas.append(f"--   {plano}: {count}")
+    linhas.append("")
+    return '\n'.join(linhas)
+
+def aplicar(dsn: str, formato: str = 'texto') -> Dict[str, int]:
+    """Executa a carga dos arquivos num PostgreSQL (requer psycopg 3); retorna as linhas afetadas"""
+    # Dependência opcional: só quem carrega direto do Python precisa dela
+    import psycopg
+
+    arquivo_usuarios, arquivo_pagamentos = ARQUIVOS_COPY[formato]
+    afetadas = {}
+    with psycopg.connect(dsn) as conexao, conexao.cursor() as cursor:
+        for comando in SQL_STAGING:
+            cursor.execute(comando)
+        for tabela, colunas, arquivo in (('staging_usuarios', COLUNAS_USUARIOS, arquivo_usuarios),
+                                         ('staging_pagamentos', COLUNAS_PAGAMENTOS, arquivo_pagamentos)):
+            with open(arquivo, 'rb') as f, cursor.copy(comando_copy(tabela, colunas, formato)) as copy:
+                for bloco in iter(lambda: f.read(1024 * 1024), b''):
+                    copy.write(bloco)
+        for nome, comando in zip(('usuarios', 'pagamentos'), SQL_MERGE):
+            cursor.execute(comando)
+            afetadas[nome] = cursor.rowcount
+    return afetadas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Confere (ou aplica) os arquivos de carga gerados por reorganizar_banco.py')
+    parser.add_argument('--formato', choices=FORMATOS, default='texto', help='formato dos arquivos COPY')
+    parser.add_argument('--dsn', help='aplica a carga neste PostgreSQL (requer psycopg)')
+    args = parser.parse_args(argv)
+
+    for arquivo, colunas in zip(ARQUIVOS_COPY[args.formato], (COLUNAS_USUARIOS, COLUNAS_PAGAMENTOS)):
+        try:
+            linhas = list(ler_copy(arquivo, colunas, args.formato))
+        except OSError as e:
+            print(f"❌ {e}")
+            return 1
+        print(f"📦 {arquivo}: {len(linhas)} linhas, {len(colunas)} colunas ({_nomes(colunas)})")
+
+    if args.dsn:
+        try:
+            afetadas = aplicar(args.dsn, args.formato)
+        except ImportError:
+            print("⚠️  Biblioteca 'psycopg' não encontrada")
+            print("   Instale com: python3 -m pip install 'psycopg[binary]'")
+            return 1
+        print(f"✅ Usuários inseridos/atualizados: {afetadas['usuarios']} | pagamentos novos: {afetadas['pagamentos']}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
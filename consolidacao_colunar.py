@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Motor colunar de consolidação (alternativa ao laço de reorganizar_banco.consolidar_dados)
+
+As três fontes são alinhadas em colunas por um índice único de emails
+ordenados. Pertinência às fontes, sobrevivência dos campos (planilha >
+sistema > pagamentos) e cada alerta são calculados coluna a coluna; as
+máscaras booleanas são ints do Python com um byte 0/1 por usuário, combinadas
+com &, | e ^ de uma vez para a base inteira. As regras de alerta vêm do
+registro de regras_alerta.
+
+O resultado é a mesma lista de UsuarioConsolidado do laço, gerando
+base_consolidada.csv byte a byte idêntico.
+"""
+from itertools import repeat
+from operator import itemgetter
+from typing import Dict, List, Sequence
+
+import regras_alerta
+from usuario_consolidado import CAMPOS_DATAS, CAMPOS_ESCALARES, FONTES, UsuarioConsolidado
+
+# Campos lidos de cada fonte e o registro usado quando o email não está nela
+CAMPOS_SISTEMA = ('nome', 'telefone', 'plano', 'status', 'empresa', 'funcao',
+                  'data_criacao', 'ultima_atividade', 'verificado', 'data_criacao_ord', 'ultima_atividade_ord')
+CAMPOS_PLANILHA = ('nome', 'telefone', 'indicador', 'obs')
+CAMPOS_PAGAMENTOS = ('nome', 'telefone', 'indicador', 'status_final', 'total_pagamentos',
+                     'total_ciclos', 'data_ultimo_pagto', 'data_venc', 'data_ultimo_pagto_ord', 'data_venc_ord')
+
+_VAZIO_SISTEMA = {**dict.fromkeys(CAMPOS_SISTEMA, ''), 'data_criacao_ord': None, 'ultima_atividade_ord': None}
+_VAZIO_PLANILHA = dict.fromkeys(CAMPOS_PLANILHA, '')
+_VAZIO_PAGAMENTOS = {**dict.fromkeys(CAMPOS_PAGAMENTOS, ''), 'total_pagamentos': 0, 'total_ciclos': 0,
+                     'data_ultimo_pagto_ord': None, 'data_venc_ord': None}
+
+def mascara(valores: Sequence[bool]) -> int:
+    """Converte uma coluna booleana em máscara: um byte 0/1 por usuário num int"""
+    return int.from_bytes(bytes(valores), 'big')
+
+def codigos(mascaras: Sequence[int], n: int) -> Sequence[int]:
+    """Código por usuário com o bit k ligado se o usuário está na máscara k
+
+    Como cada usuário ocupa um byte, somar até 8 máscaras deslocadas nunca
+    transborda para o vizinho: a conta inteira é feita em aritmética de int.
+    Com mais de 8 máscaras os grupos de 8 são combinados por usuário.
+    """
+    grupos = []
+    for inicio in range(0, len(mascaras), 8):
+        total = 0
+        for k, m in enumerate(mascaras[inicio:inicio + 8]):
+            total |= m << k
+        grupos.append(total.to_bytes(n, 'big'))
+    if not grupos:
+        return bytes(n)
+    if len(grupos) == 1:
+        return grupos[0]
+    return [sum(b << (8 * g) for g, b in enumerate(bytes_usuario)) for bytes_usuario in zip(*grupos)]
+
+def _colunas(registros: List[Dict], campos: Sequence[str]) -> List[List]:
+    """Extrai os campos de uma fonte alinhada, uma coluna por campo"""
+    return [list(map(itemgetter(campo), registros)) for campo in campos]
+
+def _tabela_fontes():
+    """Fontes, texto e tem_pagamentos já renderizados para cada combinação de fontes"""
+    tabela = []
+    for codigo in range(1 << len(FONTES)):
+        fontes = tuple(FONTES[k] for k in range(len(FONTES)) if codigo >> k & 1)
+        tabela.append((fontes, ', '.join(fontes), 'SIM' if 'PAGAMENTOS' in fontes else 'NÃO'))
+    return tabela
+
+TABELA_FONTES = _tabela_fontes()
+
+class TabelaConsolidada:
+    """Resultado do motor colunar: uma lista por campo, alinhadas pelo índice de emails"""
+
+    def __init__(self, colunas: Dict[str, List], codigos_alertas: Sequence[int], codigos_fontes: bytes,
+                 rotulos: regras_alerta.Rotulos):
+        self.colunas = colunas
+        self.codigos_alertas = codigos_alertas
+        self.codigos_fontes = codigos_fontes
+        self.rotulos = rotulos
+
+    def __len__(self):
+        return len(self.codigos_fontes)
+
+    def usuarios(self) -> List[UsuarioConsolidado]:
+        """Materializa os registros no formato de consolidar_dados"""
+        return list(map(UsuarioConsolidado, *[self.colunas[c] for c in CAMPOS_ESCALARES],
+                        self.codigos_fontes, self.codigos_alertas, repeat(self.rotulos),
+                        *[self.colunas[c] for c in CAMPOS_DATAS]))
+
+def consolidar_colunar(usuarios_sistema, usuarios_planilha, pagamentos_historico, ultimo_status,
+                       motor=None) -> TabelaConsolidada:
+    """Consolida as fontes em colunas, com máscaras vetorizadas para fontes e alertas"""
+    motor = motor or regras_alerta.motor_padrao()
+
+    emails = sorted(set(usuarios_sistema.keys()) | set(usuarios_planilha.keys()) | set(ultimo_status.keys()))
+    n = len(emails)
+    todos = mascara([True] * n)
+
+    # Fontes alinhadas ao índice de emails (registro vazio onde o email não aparece)
+    sistema = [usuarios_sistema.get(e, _VAZIO_SISTEMA) for e in emails]
+    planilha = [usuarios_planilha.get(e, _VAZIO_PLANILHA) for e in emails]
+    pagamentos = [ultimo_status.get(e, _VAZIO_PAGAMENTOS) for e in emails]
+
+    no_sistema = mascara([r is not _VAZIO_SISTEMA for r in sistema])
+    na_planilha = mascara([r is not _VAZIO_PLANILHA for r in planilha])
+    com_pagamentos = mascara([r is not _VAZIO_PAGAMENTOS for r in pagamentos])
+
+    (sis_nome, sis_telefone, plano, status_sistema, empresa, funcao, data_criacao, ultima_atividade,
+     verificado, data_criacao_ord, ultima_atividade_ord) = _colunas(sistema, CAMPOS_SISTEMA)
+    plan_nome, plan_telefone, plan_indicador, obs = _colunas(planilha, CAMPOS_PLANILHA)
+    (pag_nome, pag_telefone, pag_indicador, status_pagamento, total_pagamentos, total_ciclos,
+     ultimo_pagamento, data_vencimento, ultimo_pagamento_ord, data_vencimento_ord) = _colunas(pagamentos, CAMPOS_PAGAMENTOS)
+
+    # Sobrevivência dos campos: planilha > sistema > pagamentos
+    nome = [p or s or g for p, s, g in zip(plan_nome, sis_nome, pag_nome)]
+    telefone = [p or s or g for p, s, g in zip(plan_telefone, sis_telefone, pag_telefone)]
+    indicador = [p or g for p, g in zip(plan_indicador, pag_indicador)]
+
+    codigos_fontes = codigos((no_sistema, na_planilha, com_pagamentos), n)
+
+    # Todos os campos consolidados menos os de alertas, que dependem das regras
+    colunas = {
+        'email': emails,
+        'nome': nome,
+        'telefone': telefone,
+        'indicador': indicador,
+        'plano': plano,
+        'status_sistema': status_sistema,
+        'empresa': empresa,
+        'funcao': funcao,
+        'data_criacao': data_criacao,
+        'ultima_atividade': ultima_atividade,
+        'verificado': verificado,
+        'tem_pagamentos': [TABELA_FONTES[c][2] for c in codigos_fontes],
+        'total_pagamentos': total_pagamentos,
+        'total_ciclos': total_ciclos,
+        'ultimo_pagamento': ultimo_pagamento,
+        'data_vencimento': data_vencimento,
+        'status_pagamento': status_pagamento,
+        'obs': obs,
+        'fontes': [TABELA_FONTES[c][0] for c in codigos_fontes],
+        'fontes_str': [TABELA_FONTES[c][1] for c in codigos_fontes],
+        'data_criacao_ord': data_criacao_ord,
+        'ultima_atividade_ord': ultima_atividade_ord,
+        'ultimo_pagamento_ord': ultimo_pagamento_ord,
+        'data_vencimento_ord': data_vencimento_ord,
+    }
+
+    # Predicados compartilhados calculados uma vez para a base e combinados por regra
+    mascaras_alertas = motor.mascaras(
+        {'SISTEMA': no_sistema, 'PLANILHA': na_planilha, 'PAGAMENTOS': com_pagamentos},
+        colunas,
+        mascara,
+        todos
+    )
+
+    codigos_alertas = codigos(mascaras_alertas, n)
+    renderizar = motor.rotulos.renderizar
+    colunas['alertas_str'] = [renderizar(c)[2] for c in codigos_alertas]
+    colunas['tags_str'] = [renderizar(c)[3] for c in codigos_alertas]
+    return TabelaConsolidada(colunas, codigos_alertas, codigos_fontes, motor.rotulos)
+
+def consolidar_dados_colunar(usuarios_sistema, usuarios_planilha, pagamentos_historico, ultimo_status,
+                             motor=None, agregador=None) -> List[UsuarioConsolidado]:
+    """Mesma assinatura e resultado de consolidar_dados, usando o motor colunar"""
+    usuarios = consolidar_colunar(usuarios_sistema, usuarios_planilha, pagamentos_historico, ultimo_status,
+                                  motor).usuarios()
+    if agregador is not None:
+        agregador.adicionar_todos(usuarios)
+    return usuarios
@@ -2,12 +2,20 @@
 """
 Script para cruzar dados de usuários entre arquivo .numbers e CSV
 """
+import argparse
 import csv
 import json
 import zipfile
 import os
-from typing import Dict, List, Set
+import shutil
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
+import cache_fontes
+import metricas
+from saidas import TAMANHO_BUFFER, abrir_atomico
+
+@cache_fontes.em_cache
 def ler_csv(arquivo_csv: str) -> List[Dict]:
     """Lê o arquivo CSV e retorna lista de usuários"""
     usuarios = []
@@ -27,58 +35,56 @@ def ler_csv(arquivo_csv: str) -> List[Dict]:
 
     return usuarios
 
+def coluna_email(cabecalhos) -> Optional[str]:
+    """Primeiro cabeçalho que parece ser de email ('EMAIL', 'E-MAIL', 'Email'...)"""
+    for cabecalho in cabecalhos:
+        if 'EMAIL' in cabecalho.upper() or 'E-MAIL' in cabecalho.upper():
+            return cabecalho
+    return None
+
+@cache_fontes.em_cache
+def ler_numbers(arquivo_numbers: str) -> List[Dict]:
+    """Lê as tabelas do .numbers e retorna as linhas com email (cabeçalho -> texto)
+
+    Cada tabela é lida em bloco (table.rows(values_only=True)) e o cabeçalho,
+    inclusive a coluna de email, é resolvido uma vez por tabela. O resultado
+    vai para o mesmo cache em disco dos CSVs: o arquivo só é decodificado de
+    novo quando muda.
+    """
+    # Dependência opcional: ImportError é tratado em tentar_extrair_numbers
+    import numbers_parser
+    doc = numbers_parser.Document(arquivo_numbers)
+
+    dados = []
+    for sheet in doc.sheets:
+        for table in sheet.tables:
+            linhas = table.rows(values_only=True)
+            if not linhas:
+                continue
+
+            headers = [str(valor) if valor else f'Col{col}' for col, valor in enumerate(linhas[0])]
+            campo_email = coluna_email(headers)
+            if campo_email is None:
+                continue
+
+            for valores in linhas[1:]:
+                row_data = {header: '' if valor is None else str(valor).strip()
+                            for header, valor in zip(headers, valores)}
+                # Adicionar apenas se tiver email
+                if row_data[campo_email]:
+                    dados.append(row_data)
+
+    return dados
+
 def tentar_extrair_numbers(arquivo_numbers: str):
-    """Tenta extrair dados do arquivo .numbers"""
+    """Tenta extrair dados do arquivo .numbers (None se não for possível)"""
     try:
-        # Tentar usar numbers-parser se disponível
-        import numbers_parser
-        doc = numbers_parser.Document(arquivo_numbers)
-        sheets = doc.sheets
-
-        dados = []
-        for sheet in sheets:
-            tables = sheet.tables
-            for table in tables:
-                num_rows = table.num_rows
-                num_cols = table.num_cols
-
-                # Tentar ler cabeçalhos
-                headers = []
-                for col in range(num_cols):
-                    cell = table.cell(0, col)
-                    headers.append(str(cell.value) if cell.value else f'Col{col}')
-
-                # Ler dados
-                for row in range(1, num_rows):
-                    row_data = {}
-                    for col in range(num_cols):
-                        cell = table.cell(row, col)
-                        value = cell.value if cell.value is not None else ''
-                        row_data[headers[col]] = str(value).strip()
-
-                    # Adicionar apenas se tiver email
-                    if any('EMAIL' in k.upper() or 'E-MAIL' in k.upper() for k in row_data.keys()):
-                        for key in row_data.keys():
-                            if 'EMAIL' in key.upper() or 'E-MAIL' in key.upper():
-                                if row_data[key]:
-                                    dados.append(row_data)
-                                    break
-
-        return dados
+        return ler_numbers(arquivo_numbers)
 
     except ImportError:
         print("⚠️  Biblioteca 'numbers-parser' não encontrada")
-        print("   Instalando numbers-parser...")
-        import subprocess
-        try:
-            subprocess.check_call([
-                'python3', '-m', 'pip', 'install', 'numbers-parser', '--quiet'
-            ])
-            print("✅ Biblioteca instalada! Tentando novamente...")
-            return tentar_extrair_numbers(arquivo_numbers)
-        except:
-            print("❌ Não foi possível instalar numbers-parser")
-            return None
+        print("   Instale com: python3 -m pip install numbers-parser")
+        return None
 
     except Exception as e:
         print(f"❌ Erro ao extrair .numbers: {e}")
@@ -88,94 +94,116 @@ def normalizar_email(email: str) -> str:
     """Normaliza email para comparação"""
     return email.strip().lower().replace(' ', '')
 
-def cruzar_dados(dados_numbers: List[Dict], dados_csv: List[Dict]):
-    """Cruza os dados entre os dois arquivos"""
-
-    # Criar dicionários indexados por email
-    emails_csv = {normalizar_email(u['email']): u for u in dados_csv}
-
-    # Resultados
-    somente_numbers = []
-    somente_csv = []
-    em_ambos = []
-    diferencas = []
-
-    # Processar dados do .numbers
+# Baldes do cruzamento (valores de "tipo" em resultado_cruzamento.ndjson)
+SOMENTE_NUMBERS = 'somente_numbers'
+SOMENTE_CSV = 'somente_csv'
+EM_AMBOS = 'em_ambos'
+DIFERENCAS = 'diferencas'
+BALDES = (SOMENTE_NUMBERS, SOMENTE_CSV, EM_AMBOS, DIFERENCAS)
+
+def cruzar_em_fluxo(dados_numbers: Iterable[Dict], dados_csv: Iterable[Dict]) -> Iterator[Tuple[str, Dict]]:
+    """Hash join em um passo: gera (balde, item) conforme os registros são comparados
+
+    O índice email normalizado -> registro é montado uma vez a partir do CSV
+    (o nome em maiúsculas é calculado uma vez por email encontrado). As linhas
+    do .numbers são consultadas uma única vez, podem vir de um iterador e não
+    são guardadas. Ao final, os emails do CSV que não foram encontrados saem
+    como SOMENTE_CSV, na ordem do arquivo.
+    """
+    indice = {normalizar_email(u['email']): u for u in dados_csv}
+    # email -> nome do CSV em maiúsculas; também marca os emails encontrados
+    nomes_csv = {}
+
+    campo_email = None
     for usuario_numbers in dados_numbers:
-        # Encontrar campo de email
-        email_field = None
-        for key in usuario_numbers.keys():
-            if 'EMAIL' in key.upper() or 'E-MAIL' in key.upper():
-                email_field = key
-                break
-
-        if not email_field or not usuario_numbers[email_field]:
+        # A coluna de email só é procurada de novo se a linha tiver outro cabeçalho
+        if campo_email not in usuario_numbers:
+            campo_email = coluna_email(usuario_numbers)
+            if campo_email is None:
+                continue
+        if not usuario_numbers[campo_email]:
             continue
 
-        email = normalizar_email(usuario_numbers[email_field])
+        email = normalizar_email(usuario_numbers[campo_email])
+        usuario_csv = indice.get(email)
+        if usuario_csv is None:
+            yield SOMENTE_NUMBERS, usuario_numbers
+            continue
 
-        if email in emails_csv:
-            # Usuário existe em ambos
-            usuario_csv = emails_csv[email]
-            em_ambos.append({
+        nome_csv = nomes_csv.get(email)
+        if nome_csv is None:
+            nome_csv = nomes_csv[email] = usuario_csv['nome'].upper()
+        yield EM_AMBOS, {
+            'email': email,
+            'numbers': usuario_numbers,
+            'csv': usuario_csv
+        }
+
+        nome_numbers = usuario_numbers.get('NOME_COMPLETO', '')
+        if nome_numbers and nome_numbers.upper() != nome_csv:
+            yield DIFERENCAS, {
                 'email': email,
-                'numbers': usuario_numbers,
-                'csv': usuario_csv
-            })
-
-            # Verificar diferenças
-            diffs = []
-            if usuario_numbers.get('NOME_COMPLETO', '').upper() != usuario_csv['nome'].upper():
-                if usuario_numbers.get('NOME_COMPLETO'):
-                    diffs.append(f"Nome diferente: '{usuario_numbers.get('NOME_COMPLETO')}' vs '{usuario_csv['nome']}'")
-
-            if diffs:
-                diferencas.append({
-                    'email': email,
-                    'diferencas': diffs
-                })
-        else:
-            # Usuário só no .numbers
-            somente_numbers.append(usuario_numbers)
-
-    # Emails só no CSV
-    emails_numbers_set = set()
-    for u in dados_numbers:
-        for key in u.keys():
-            if 'EMAIL' in key.upper() or 'E-MAIL' in key.upper():
-                if u[key]:
-                    emails_numbers_set.add(normalizar_email(u[key]))
-                    break
-
-    for email, usuario in emails_csv.items():
-        if email not in emails_numbers_set:
-            somente_csv.append(usuario)
-
-    return {
-        'somente_numbers': somente_numbers,
-        'somente_csv': somente_csv,
-        'em_ambos': em_ambos,
-        'diferencas': diferencas
-    }
-
-def gerar_relatorio(resultado: Dict):
-    """Gera relatório do cruzamento"""
+                'diferencas': [f"Nome diferente: '{nome_numbers}' vs '{usuario_csv['nome']}'"]
+            }
+
+    for email, usuario_csv in indice.items():
+        if email not in nomes_csv:
+            yield SOMENTE_CSV, usuario_csv
+
+def cruzar_dados(dados_numbers: Iterable[Dict], dados_csv: Iterable[Dict]) -> Dict[str, List[Dict]]:
+    """Cruza os dados entre os dois arquivos (baldes de cruzar_em_fluxo em listas)"""
+    resultado = {balde: [] for balde in BALDES}
+    for balde, item in cruzar_em_fluxo(dados_numbers, dados_csv):
+        resultado[balde].append(item)
+    return resultado
+
+ARQUIVO_RESULTADO = 'resultado_cruzamento.ndjson'
+LIMITE_AMOSTRA = 20
+
+def salvar_em_fluxo(pares: Iterable[Tuple[str, Dict]], arquivo: str = ARQUIVO_RESULTADO,
+                    limite: int = LIMITE_AMOSTRA) -> Tuple[Dict[str, int], Dict[str, List[Dict]]]:
+    """Grava o cruzamento em JSON Lines conforme os pares (balde, item) são produzidos
+
+    A primeira linha é o resumo ({"tipo": "resumo", "totais": {...}}) e cada
+    linha seguinte é um item com o balde em "tipo". Os itens vão para um
+    temporário enquanto são contados; no fim o resumo e o corpo são
+    publicados juntos. Só os totais e os primeiros itens de cada balde
+    (para o relatório) ficam em memória.
+    """
+    totais = dict.fromkeys(BALDES, 0)
+    amostras = {balde: [] for balde in BALDES}
+    with tempfile.TemporaryFile('w+', encoding='utf-8', newline='\n') as corpo:
+        for balde, item in pares:
+            totais[balde] += 1
+            if len(amostras[balde]) < limite:
+                amostras[balde].append(item)
+            corpo.write(json.dumps({'tipo': balde, **item}, ensure_ascii=False) + '\n')
+
+        corpo.seek(0)
+        with abrir_atomico(arquivo, newline='\n') as f:
+            resumo = {'tipo': 'resumo', 'linhas': sum(totais.values()), 'totais': totais}
+            f.write(json.dumps(resumo, ensure_ascii=False) + '\n')
+            shutil.copyfileobj(corpo, f, TAMANHO_BUFFER)
+    return totais, amostras
+
+def gerar_relatorio(totais: Dict[str, int], amostras: Dict[str, List[Dict]], arquivo: str = ARQUIVO_RESULTADO):
+    """Gera relatório do cruzamento (totais e primeiros itens de cada balde)"""
 
     print("\n" + "="*80)
     print("📊 RELATÓRIO DE CRUZAMENTO DE DADOS DE USUÁRIOS")
     print("="*80)
 
-    print(f"\n✅ Em ambos os arquivos: {len(resultado['em_ambos'])} usuários")
-    print(f"📱 Somente no arquivo .numbers: {len(resultado['somente_numbers'])} usuários")
-    print(f"📄 Somente no arquivo CSV: {len(resultado['somente_csv'])} usuários")
-    print(f"⚠️  Com diferenças: {len(resultado['diferencas'])} usuários")
+    print(f"\n✅ Em ambos os arquivos: {totais[EM_AMBOS]} usuários")
+    print(f"📱 Somente no arquivo .numbers: {totais[SOMENTE_NUMBERS]} usuários")
+    print(f"📄 Somente no arquivo CSV: {totais[SOMENTE_CSV]} usuários")
+    print(f"⚠️  Com diferenças: {totais[DIFERENCAS]} usuários")
 
     # Usuários somente no .numbers
-    if resultado['somente_numbers']:
+    if totais[SOMENTE_NUMBERS]:
         print("\n" + "-"*80)
         print("📱 USUÁRIOS SOMENTE NO ARQUIVO .NUMBERS:")
         print("-"*80)
-        for i, usuario in enumerate(resultado['somente_numbers'][:20], 1):
+        for i, usuario in enumerate(amostras[SOMENTE_NUMBERS][:20], 1):
             email = ''
             nome = ''
             for key, value in usuario.items():
@@ -185,43 +213,46 @@ def gerar_relatorio(resultado: Dict):
                     nome = value
             print(f"{i}. {email} - {nome}")
 
-        if len(resultado['somente_numbers']) > 20:
-            print(f"... e mais {len(resultado['somente_numbers']) - 20} usuários")
+        if totais[SOMENTE_NUMBERS] > 20:
+            print(f"... e mais {totais[SOMENTE_NUMBERS] - 20} usuários")
 
     # Usuários somente no CSV
-    if resultado['somente_csv']:
+    if totais[SOMENTE_CSV]:
         print("\n" + "-"*80)
         print("📄 USUÁRIOS SOMENTE NO ARQUIVO CSV:")
         print("-"*80)
-        for i, usuario in enumerate(resultado['somente_csv'][:20], 1):
+        for i, usuario in enumerate(amostras[SOMENTE_CSV][:20], 1):
             print(f"{i}. {usuario['email']} - {usuario['nome']}")
 
-        if len(resultado['somente_csv']) > 20:
-            print(f"... e mais {len(resultado['somente_csv']) - 20} usuários")
+        if totais[SOMENTE_CSV] > 20:
+            print(f"... e mais {totais[SOMENTE_CSV] - 20} usuários")
 
     # Diferenças
-    if resultado['diferencas']:
+    if totais[DIFERENCAS]:
         print("\n" + "-"*80)
         print("⚠️  USUÁRIOS COM DIFERENÇAS ENTRE OS ARQUIVOS:")
         print("-"*80)
-        for i, item in enumerate(resultado['diferencas'][:20], 1):
+        for i, item in enumerate(amostras[DIFERENCAS][:20], 1):
             print(f"{i}. {item['email']}")
             for diff in item['diferencas']:
                 print(f"   - {diff}")
 
-        if len(resultado['diferencas']) > 20:
-            print(f"... e mais {len(resultado['diferencas']) - 20} usuários com diferenças")
+        if totais[DIFERENCAS] > 20:
+            print(f"... e mais {totais[DIFERENCAS] - 20} usuários com diferenças")
 
     print("\n" + "="*80)
-
-    # Salvar resultados detalhados em JSON
-    with open('resultado_cruzamento.json', 'w', encoding='utf-8') as f:
-        json.dump(resultado, f, ensure_ascii=False, indent=2)
-
-    print("💾 Resultados detalhados salvos em: resultado_cruzamento.json")
+    print(f"💾 Resultados detalhados salvos em: {arquivo} (JSON Lines, resumo na primeira linha)")
     print("="*80 + "\n")
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cruza usuários do arquivo .numbers com o CSV')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='ignora o cache de arquivos já lidos (.cache_fontes)')
+    metricas.adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    cache_fontes.configurar(habilitado=not args.no_cache)
+    metricas.configurar_por_args(args, 'cruzar_usuarios')
+
     arquivo_numbers = "usuarios_2025-10-29_17h45.numbers"
     arquivo_csv = "controle usuarios(USUÁRIOS) (2).csv"
 
@@ -235,11 +266,16 @@ def main():
         return
 
     print("📖 Lendo arquivo CSV...")
-    dados_csv = ler_csv(arquivo_csv)
+    with metricas.etapa('leitura_csv') as etapa:
+        dados_csv = ler_csv(arquivo_csv)
+        etapa.linhas(saida=len(dados_csv))
     print(f"   ✅ {len(dados_csv)} usuários encontrados no CSV")
 
     print("\n📖 Tentando extrair dados do arquivo .numbers...")
-    dados_numbers = tentar_extrair_numbers(arquivo_numbers)
+    with metricas.etapa('leitura_numbers') as etapa:
+        dados_numbers = tentar_extrair_numbers(arquivo_numbers)
+        if dados_numbers is not None:
+            etapa.linhas(saida=len(dados_numbers))
 
     if dados_numbers is None:
         print("\n⚠️  Não foi possível extrair dados do arquivo .numbers automaticamente.")
@@ -250,9 +286,13 @@ def main():
     print(f"   ✅ {len(dados_numbers)} usuários encontrados no .numbers")
 
     print("\n🔄 Cruzando dados...")
-    resultado = cruzar_dados(dados_numbers, dados_csv)
+    # O cruzamento é consumido enquanto é gravado: as duas coisas são uma etapa só
+    with metricas.etapa('cruzamento') as etapa:
+        totais, amostras = salvar_em_fluxo(cruzar_em_fluxo(dados_numbers, dados_csv))
+        etapa.linhas(entrada=len(dados_numbers) + len(dados_csv), saida=sum(totais.values()))
 
-    gerar_relatorio(resultado)
+    with metricas.etapa('relatorio'):
+        gerar_relatorio(totais, amostras)
 
 if __name__ == '__main__':
     main()
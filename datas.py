@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Datas tipadas das planilhas exportadas
+
+As datas chegam como texto 'dd/mm/aaaa' (às vezes seguido da hora, como em
+'30/09/2025, 08:37:28'). data_ordinal converte uma vez, na leitura, para o
+ordinal do calendário (date.toordinal), memorizando cada texto distinto;
+comparações e consultas por intervalo passam a ser entre ints.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date
+from functools import lru_cache
+from operator import itemgetter
+from typing import Iterable, List, Optional, Tuple, Union
+
+Data = Union[int, str, date]
+
+@lru_cache(maxsize=65536)
+def data_ordinal(texto: str) -> Optional[int]:
+    """'dd/mm/aaaa' (com ou sem hora depois) -> ordinal do calendário, ou None se não for data"""
+    try:
+        dia, mes, ano = texto.strip().split(',', 1)[0].split(' ', 1)[0].split('/')
+        ano = int(ano)
+        if ano < 100:
+            ano += 2000
+        return date(ano, int(mes), int(dia)).toordinal()
+    except ValueError:
+        return None
+
+def mes_de(ordinal: Optional[int]) -> str:
+    """Ordinal -> 'aaaa-mm' ('' para None), chave que ordena cronologicamente"""
+    if ordinal is None:
+        return ''
+    dia = date.fromordinal(ordinal)
+    return f"{dia.year:04d}-{dia.month:02d}"
+
+def como_ordinal(valor: Data) -> Optional[int]:
+    """Aceita ordinal, date ou texto 'dd/mm/aaaa'"""
+    if isinstance(valor, date):
+        return valor.toordinal()
+    if isinstance(valor, str):
+        return data_ordinal(valor)
+    return valor
+
+class IndiceDatas:
+    """Índice ordenado de (data, chave) para consultas por intervalo sem reconverter texto"""
+
+    def __init__(self, pares: Iterable[Tuple[Optional[int], object]]):
+        ordenados = sorted((p for p in pares if p[0] is not None), key=itemgetter(0))
+        self.ordinais = [ordinal for ordinal, _ in ordenados]
+        self.chaves = [chave for _, chave in ordenados]
+
+    @classmethod
+    def de_registros(cls, registros: Iterable, campo: str, chave: str = 'email') -> 'IndiceDatas':
+        """Indexa registros (dicts ou UsuarioConsolidado) pelo campo ordinal informado"""
+        return cls((r[campo], r[chave]) if isinstance(r, dict) else (getattr(r, campo), getattr(r, chave))
+                   for r in registros)
+
+    def __len__(self):
+        return len(self.ordinais)
+
+    def entre(self, inicio: Optional[Data] = None, fim: Optional[Data] = None) -> List:
+        """Chaves com data em [inicio, fim] (limites inclusivos; None = sem limite), em ordem de data"""
+        esquerda = 0 if inicio is None else bisect_left(self.ordinais, como_ordinal(inicio))
+        direita = len(self.ordinais) if fim is None else bisect_right(self.ordinais, como_ordinal(fim))
+        return self.chaves[esquerda:max(esquerda, direita)]
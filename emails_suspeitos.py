@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Detecção de emails quase duplicados (ex.: adelnassee08@icloud.com x adelnasser08@icloud.com)
+
+Comparar todos os pares é O(n²). Em vez disso os emails são agrupados por
+domínio e, dentro de cada domínio, ordenados pela parte local (e pela parte
+local invertida, para pegar diferenças no começo); só vizinhos dentro de uma
+janela viram candidatos. Cada candidato passa por filtros baratos (tamanho e
+conjunto de caracteres) e só então é medido por distância de edição
+limitada, que desiste assim que passa do máximo permitido.
+
+Uso avulso: python3 emails_suspeitos.py [base_consolidada.csv]
+"""
+import csv
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from saidas import abrir_atomico
+
+ARQUIVO_SAIDA = 'emails_suspeitos.csv'
+
+def distancia_limitada(a: str, b: str, limite: int) -> int:
+    """Distância de Levenshtein entre a e b, ou limite + 1 se passar do limite"""
+    if abs(len(a) - len(b)) > limite:
+        return limite + 1
+
+    # Prefixo e sufixo comuns não mudam a distância
+    inicio = 0
+    while inicio < len(a) and inicio < len(b) and a[inicio] == b[inicio]:
+        inicio += 1
+    fim_a, fim_b = len(a), len(b)
+    while fim_a > inicio and fim_b > inicio and a[fim_a - 1] == b[fim_b - 1]:
+        fim_a -= 1
+        fim_b -= 1
+    a, b = a[inicio:fim_a], b[inicio:fim_b]
+    if not a or not b:
+        return len(a) + len(b) if len(a) + len(b) <= limite else limite + 1
+
+    # Programação dinâmica só na faixa |i - j| <= limite
+    acima = limite + 1
+    anterior = [j if j <= limite else acima for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        atual = [acima] * (len(b) + 1)
+        if i <= limite:
+            atual[0] = i
+        menor = atual[0]
+        for j in range(max(1, i - limite), min(len(b), i + limite) + 1):
+            custo = 0 if a[i - 1] == b[j - 1] else 1
+            valor = min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + custo)
+            atual[j] = valor if valor <= limite else acima
+            if valor < menor:
+                menor = valor
+        if menor > limite:
+            return acima
+        anterior = atual
+    return anterior[len(b)]
+
+def _blocos(emails: Iterable[str]) -> Dict[str, List[str]]:
+    """Partes locais distintas agrupadas por domínio"""
+    por_dominio = defaultdict(set)
+    for email in emails:
+        local, arroba, dominio = email.rpartition('@')
+        if arroba and local:
+            por_dominio[dominio].add(local)
+    return {dominio: list(locais) for dominio, locais in por_dominio.items() if len(locais) > 1}
+
+def _invertido(local: str) -> str:
+    return local[::-1]
+
+def encontrar_suspeitos(emails: Iterable[str], max_distancia: int = 2, similaridade_minima: float = 0.8,
+                        janela: int = 4) -> List[Tuple[int, float, str, str]]:
+    """Pares suspeitos como (distância, similaridade, email1, email2), mais prováveis primeiro
+
+    A similaridade é 1 - distância / tamanho da maior parte local; o limite
+    de distância de cada par é o menor entre max_distancia e o que a
+    similaridade mínima permite.
+    """
+    suspeitos = set()
+    for dominio, locais in _blocos(emails).items():
+        maior_tamanho = max(map(len, locais))
+        limites = [min(max_distancia, int(t * (1 - similaridade_minima) + 1e-9))
+                   for t in range(maior_tamanho + 1)]
+        conjuntos = {local: frozenset(local) for local in locais}
+
+        for chave in (None, _invertido):
+            ordenados = sorted(locais, key=chave)
+            tamanhos = list(map(len, ordenados))
+            caracteres = [conjuntos[local] for local in ordenados]
+            n = len(ordenados)
+            for i in range(n - 1):
+                tamanho_a = tamanhos[i]
+                caracteres_a = caracteres[i]
+                for j in range(i + 1, min(n, i + 1 + janela)):
+                    tamanho_b = tamanhos[j]
+                    maior = tamanho_a if tamanho_a > tamanho_b else tamanho_b
+                    limite = limites[maior]
+                    if abs(tamanho_a - tamanho_b) > limite:
+                        continue
+                    # Cada edição muda no máximo 2 caracteres do conjunto: filtro barato (em C)
+                    if len(caracteres_a ^ caracteres[j]) > 2 * limite:
+                        continue
+                    a, b = ordenados[i], ordenados[j]
+                    distancia = distancia_limitada(a, b, limite)
+                    if distancia <= limite:
+                        if b < a:
+                            a, b = b, a
+                        suspeitos.add((distancia, round(1 - distancia / maior, 3), f"{a}@{dominio}", f"{b}@{dominio}"))
+
+    return sorted(suspeitos, key=lambda s: (s[0], -s[1], s[2], s[3]))
+
+def salvar_suspeitos(suspeitos: List[Tuple[int, float, str, str]], arquivo: str = ARQUIVO_SAIDA,
+                     usuarios: Optional[Dict[str, Dict]] = None):
+    """Grava o ranking de pares; com usuarios (email -> registro) inclui nome e fontes"""
+    usuarios = usuarios or {}
+    with abrir_atomico(arquivo) as f:
+        writer = csv.writer(f)
+        writer.writerow(['posicao', 'email_1', 'email_2', 'distancia', 'similaridade',
+                         'nome_1', 'nome_2', 'fontes_1', 'fontes_2'])
+        for posicao, (distancia, similaridade, email1, email2) in enumerate(suspeitos, 1):
+            u1 = usuarios.get(email1) or {}
+            u2 = usuarios.get(email2) or {}
+            writer.writerow([posicao, email1, email2, distancia, f"{similaridade:.3f}",
+                             u1.get('nome', ''), u2.get('nome', ''),
+                             u1.get('fontes_str', ''), u2.get('fontes_str', '')])
+
+def gerar_emails_suspeitos(usuarios_consolidados, arquivo: str = ARQUIVO_SAIDA, limite: int = 10):
+    """Procura quase duplicados entre os usuários consolidados, imprime o topo e grava o ranking"""
+    por_email = {u['email']: u for u in usuarios_consolidados}
+    suspeitos = encontrar_suspeitos(por_email)
+    salvar_suspeitos(suspeitos, arquivo, por_email)
+
+    print(f"\n🔍 Emails quase duplicados salvos em: {arquivo}")
+    print(f"   Total: {len(suspeitos)} pares suspeitos")
+    for distancia, similaridade, email1, email2 in suspeitos[:limite]:
+        print(f"   - {email1} x {email2} (distância {distancia}, similaridade {similaridade:.0%})")
+    return suspeitos
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    arquivo = argv[0] if argv else 'base_consolidada.csv'
+    with open(arquivo, 'r', encoding='utf-8', errors='ignore') as f:
+        usuarios = [row for row in csv.DictReader(f) if row.get('email')]
+    print(f"📖 {len(usuarios)} usuários lidos de {arquivo}")
+    gerar_emails_suspeitos(usuarios)
+
+if __name__ == '__main__':
+    main()
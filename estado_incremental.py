@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Estado da consolidação incremental num arquivo SQLite (opção --incremental)
+
+A tabela usuarios tem, por email (chave primária), o digest do registro lido
+de cada fonte (sistema, planilha, pagamentos; NULL se o email não está nela)
+e o usuário consolidado nas colunas de staging_sqlite.COLUNAS_USUARIOS. A
+tabela fontes guarda a impressão digital (tamanho, mtime e hash) de cada
+arquivo de origem e a tabela saidas a dos arquivos gravados a partir do
+estado.
+
+Numa nova execução só as fontes cujo arquivo mudou têm os digests
+recalculados, só os emails afetados são reconsolidados e gravados (INSERT
+OR REPLACE e DELETE numa transação) e, se nenhuma fonte mudou e as saídas
+ainda são as gravadas, nem é preciso ler as fontes (sem_mudancas).
+"""
+import operator
+import os
+import sqlite3
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import regras_alerta
+from cache_fontes import hash_conteudo
+from staging_sqlite import COLUNAS_USUARIOS
+from usuario_consolidado import CAMPOS_ESCALARES, UsuarioConsolidado
+
+FONTES = ('sistema', 'planilha', 'pagamentos')
+COLUNAS_DIGESTS = tuple(f'digest_{fonte}' for fonte in FONTES)
+TAMANHO_LOTE = 500
+
+ESQUEMA = f"""
+CREATE TABLE IF NOT EXISTS versao (versao TEXT);
+CREATE TABLE IF NOT EXISTS fontes (fonte TEXT PRIMARY KEY, caminho TEXT, tamanho INTEGER, mtime_ns INTEGER,
+                                   hash TEXT);
+CREATE TABLE IF NOT EXISTS saidas (caminho TEXT PRIMARY KEY, tamanho INTEGER, mtime_ns INTEGER);
+CREATE TABLE IF NOT EXISTS usuarios ({', '.join(COLUNAS_USUARIOS)}, {', '.join(COLUNAS_DIGESTS)},
+                                     PRIMARY KEY (email)) WITHOUT ROWID;
+"""
+
+_COLUNAS_LINHA = COLUNAS_USUARIOS + COLUNAS_DIGESTS
+_VALORES_USUARIO = operator.attrgetter(*COLUNAS_USUARIOS)
+
+def conectar(caminho: str) -> sqlite3.Connection:
+    """Abre (ou cria) o arquivo de estado com o esquema"""
+    conexao = sqlite3.connect(caminho)
+    conexao.execute('PRAGMA journal_mode=WAL')
+    conexao.execute('PRAGMA synchronous=NORMAL')
+    conexao.executescript(ESQUEMA)
+    return conexao
+
+def versao_gravada(conexao: sqlite3.Connection) -> Optional[str]:
+    linha = conexao.execute('SELECT versao FROM versao').fetchone()
+    return linha[0] if linha else None
+
+def _digital(arquivo: str) -> Tuple[str, int, int]:
+    st = os.stat(arquivo)
+    return os.path.abspath(arquivo), st.st_size, st.st_mtime_ns
+
+def fontes_alteradas(conexao: sqlite3.Connection, arquivos: Dict[str, str],
+                     versao: str) -> Tuple[Set[str], Dict[str, Tuple]]:
+    """(fontes cujo arquivo mudou, impressão digital atual de cada arquivo)
+
+    Tamanho e mtime iguais bastam; se diferirem, o hash do conteúdo decide.
+    Com outra versão do código (ou estado vazio) todas as fontes contam como
+    alteradas.
+    """
+    gravadas = {fonte: tuple(resto) for fonte, *resto in
+                conexao.execute('SELECT fonte, caminho, tamanho, mtime_ns, hash FROM fontes')}
+    mesma_versao = versao_gravada(conexao) == versao
+    alteradas = set()
+    digitais = {}
+    for fonte, arquivo in arquivos.items():
+        caminho, tamanho, mtime_ns = _digital(arquivo)
+        anterior = gravadas.get(fonte) if mesma_versao else None
+        if anterior is not None and anterior[:3] == (caminho, tamanho, mtime_ns):
+            digitais[fonte] = anterior
+            continue
+        h = hash_conteudo(arquivo)
+        digitais[fonte] = (caminho, tamanho, mtime_ns, h)
+        if anterior is None or anterior[0] != caminho or anterior[3] != h:
+            alteradas.add(fonte)
+    return alteradas, digitais
+
+def digests(conexao: sqlite3.Connection, fonte: str) -> Dict[str, bytes]:
+    """Digest gravado de cada email presente na fonte"""
+    coluna = f'digest_{fonte}'
+    return dict(conexao.execute(f'SELECT email, {coluna} FROM usuarios WHERE {coluna} IS NOT NULL'))
+
+def existentes(conexao: sqlite3.Connection, emails: Iterable[str]) -> Set[str]:
+    """Quais destes emails já estão no estado (consultas pela chave, em lotes)"""
+    encontrados = set()
+    emails = iter(emails)
+    while True:
+        lote = list(islice(emails, TAMANHO_LOTE))
+        if not lote:
+            return encontrados
+        consulta = f"SELECT email FROM usuarios WHERE email IN ({', '.join('?' * len(lote))})"
+        encontrados.update(email for (email,) in conexao.execute(consulta, lote))
+
+def linha(usuario: UsuarioConsolidado, digests_fontes: Sequence[Optional[bytes]]) -> Tuple:
+    """Linha da tabela usuarios: colunas do usuário consolidado seguidas dos digests (ordem de FONTES)"""
+    return _VALORES_USUARIO(usuario) + tuple(digests_fontes)
+
+def aplicar(conexao: sqlite3.Connection, linhas: Iterable[Tuple], removidos: Iterable[str],
+            digitais: Dict[str, Tuple], versao: str, reconstruir: bool = False):
+    """Grava as linhas alteradas, apaga as removidas e atualiza fontes e versão numa transação
+
+    As saídas registradas deixam de valer (o estado mudou). Com reconstruir,
+    a tabela usuarios é esvaziada antes.
+    """
+    comando = (f"INSERT OR REPLACE INTO usuarios ({', '.join(_COLUNAS_LINHA)}) "
+               f"VALUES ({', '.join('?' * len(_COLUNAS_LINHA))})")
+    with conexao:
+        if reconstruir:
+            conexao.execute('DELETE FROM usuarios')
+        conexao.executemany('DELETE FROM usuarios WHERE email = ?', ((email,) for email in removidos))
+        conexao.executemany(comando, linhas)
+        conexao.execute('DELETE FROM fontes')
+        conexao.executemany('INSERT INTO fontes (fonte, caminho, tamanho, mtime_ns, hash) VALUES (?, ?, ?, ?, ?)',
+                            ((fonte, *digital) for fonte, digital in sorted(digitais.items())))
+        conexao.execute('DELETE FROM versao')
+        conexao.execute('INSERT INTO versao (versao) VALUES (?)', (versao,))
+        conexao.execute('DELETE FROM saidas')
+
+def usuarios(conexao: sqlite3.Connection, motor: Optional[regras_alerta.MotorRegras] = None) -> List[UsuarioConsolidado]:
+    """Todos os usuários do estado, em ordem de email"""
+    motor = motor or regras_alerta.motor_padrao()
+    rotulos = motor.rotulos
+    n = len(CAMPOS_ESCALARES)
+    return [UsuarioConsolidado(*linha[:n + 2], rotulos, *linha[n + 2:])
+            for linha in conexao.execute(f"SELECT {', '.join(COLUNAS_USUARIOS)} FROM usuarios ORDER BY email")]
+
+def _digitais_saidas(caminhos: Iterable[str]) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+    digitais = {}
+    for caminho in caminhos:
+        try:
+            _, tamanho, mtime_ns = _digital(caminho)
+        except FileNotFoundError:
+            tamanho = mtime_ns = None
+        digitais[os.path.abspath(caminho)] = (tamanho, mtime_ns)
+    return digitais
+
+def registrar_saidas(caminho: str, saidas: Iterable[str]):
+    """Guarda tamanho e mtime das saídas gravadas a partir do estado (ausentes ficam como NULL)"""
+    conexao = conectar(caminho)
+    try:
+        with conexao:
+            conexao.execute('DELETE FROM saidas')
+            conexao.executemany('INSERT INTO saidas (caminho, tamanho, mtime_ns) VALUES (?, ?, ?)',
+                                ((c, *digital) for c, digital in _digitais_saidas(saidas).items()))
+    finally:
+        conexao.close()
+
+def sem_mudancas(caminho: str, arquivos: Dict[str, str], versao: str, saidas: Iterable[str]) -> bool:
+    """Indica se nenhuma fonte mudou e as saídas pedidas são exatamente as gravadas na última execução"""
+    if not os.path.exists(caminho):
+        return False
+    conexao = conectar(caminho)
+    try:
+        alteradas, _ = fontes_alteradas(conexao, arquivos, versao)
+        if alteradas:
+            return False
+        gravadas = {c: (tamanho, mtime_ns) for c, tamanho, mtime_ns in
+                    conexao.execute('SELECT caminho, tamanho, mtime_ns FROM saidas')}
+        return bool(gravadas) and gravadas == _digitais_saidas(saidas)
+    finally:
+        conexao.close()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Exportação de registros em partes de tamanho fixo (NDJSON ou COPY do PostgreSQL)
+
+Os registros chegam um a um, durante a leitura, e vão para
+'<prefixo>-00001.ndjson', '<prefixo>-00002.ndjson'... com no máximo
+linhas_por_parte linhas cada. Cada parte é gravada num arquivo temporário
+oculto e renomeada só quando está completa, então um carregador pode
+consumir a parte 1 enquanto a parte N ainda está sendo produzida: toda
+parte visível está inteira. O manifesto ('<prefixo>-manifesto.json', com
+colunas, partes e total) é gravado por último e marca o fim da exportação.
+"""
+import json
+import os
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from carga_postgres import ArquivoCopy
+from saidas import ArquivoAtomico, abrir_atomico
+
+FORMATOS = ('ndjson', 'copy')
+EXTENSOES = {'ndjson': '.ndjson', 'copy': '.copy'}
+LINHAS_POR_PARTE = 50000
+
+def _data_iso(ordinal: Optional[int]) -> Optional[str]:
+    return None if ordinal is None else date.fromordinal(ordinal).isoformat()
+
+class ArquivoNdjson:
+    """Uma linha JSON por registro, com as datas (ordinais) em ISO 8601"""
+
+    def __init__(self, caminho: str, colunas: Sequence[Tuple[str, str]]):
+        self.colunas = colunas
+        self.nomes = [nome for nome, _ in colunas]
+        self.datas = [i for i, (_, tipo) in enumerate(colunas) if tipo == 'date']
+        self.total = 0
+        self._arquivo = ArquivoAtomico(caminho, newline='\n')
+
+    def escrever(self, linha: Sequence):
+        if self.datas:
+            linha = list(linha)
+            for i in self.datas:
+                linha[i] = _data_iso(linha[i])
+        self._arquivo.write(json.dumps(dict(zip(self.nomes, linha)), ensure_ascii=False) + '\n')
+        self.total += 1
+
+    def fechar(self):
+        self._arquivo.concluir()
+
+    def descartar(self):
+        self._arquivo.descartar()
+
+class ExportacaoEmPartes:
+    """Grava linhas (tuplas na ordem das colunas) em partes publicadas atomicamente"""
+
+    def __init__(self, diretorio: str, colunas: Sequence[Tuple[str, str]], prefixo: str = 'pagamentos',
+                 formato: str = 'ndjson', linhas_por_parte: int = LINHAS_POR_PARTE):
+        if formato not in FORMATOS:
+            raise ValueError(f"formato de exportação inválido: {formato!r} (use {' ou '.join(FORMATOS)})")
+        if linhas_por_parte < 1:
+            raise ValueError(f"linhas por parte deve ser positivo: {linhas_por_parte}")
+        self.diretorio = diretorio
+        self.colunas = tuple(colunas)
+        self.prefixo = prefixo
+        self.formato = formato
+        self.linhas_por_parte = linhas_por_parte
+        self.partes: List[Dict] = []
+        self.total = 0
+        self._atual = None
+        os.makedirs(diretorio, exist_ok=True)
+        self._limpar_anteriores()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *exc):
+        if tipo is None:
+            self.fechar()
+        else:
+            self.descartar()
+
+    @property
+    def manifesto(self) -> str:
+        return os.path.join(self.diretorio, f"{self.prefixo}-manifesto.json")
+
+    def _nome_parte(self, numero: int) -> str:
+        return f"{self.prefixo}-{numero:05d}{EXTENSOES[self.formato]}"
+
+    def _limpar_anteriores(self):
+        # Partes de uma exportação anterior maior confundiriam o carregador
+        extensoes = tuple(EXTENSOES.values())
+        for nome in os.listdir(self.diretorio):
+            if nome == os.path.basename(self.manifesto) or (
+                    nome.lstrip('.').startswith(f"{self.prefixo}-") and nome.endswith(extensoes + ('.tmp',))):
+                os.unlink(os.path.join(self.diretorio, nome))
+
+    def _abrir_parte(self):
+        # Os dois formatos gravam num temporário oculto e só renomeiam em fechar()
+        caminho = os.path.join(self.diretorio, self._nome_parte(len(self.partes) + 1))
+        if self.formato == 'copy':
+            self._atual = ArquivoCopy(caminho, self.colunas, 'texto')
+        else:
+            self._atual = ArquivoNdjson(caminho, self.colunas)
+
+    def _publicar_parte(self):
+        self._atual.fechar()
+        self.partes.append({'arquivo': self._nome_parte(len(self.partes) + 1), 'linhas': self._atual.total})
+        self._atual = None
+
+    def escrever(self, linha: Sequence):
+        if self._atual is None:
+            self._abrir_parte()
+        self._atual.escrever(linha)
+        self.total += 1
+        if self._atual.total >= self.linhas_por_parte:
+            self._publicar_parte()
+
+    def fechar(self) -> Dict:
+        """Publica a última parte e grava o manifesto; retorna o manifesto"""
+        if self._atual is not None:
+            self._publicar_parte()
+        manifesto = {
+            'formato': self.formato,
+            'colunas': [list(coluna) for coluna in self.colunas],
+            'linhas_por_parte': self.linhas_por_parte,
+            'total': self.total,
+            'partes': self.partes,
+        }
+        with abrir_atomico(self.manifesto) as f:
+            json.dump(manifesto, f, ensure_ascii=False, indent=2)
+        return manifesto
+
+    def descartar(self):
+        """Interrompe a exportação sem manifesto (partes já publicadas ficam, a incompleta é apagada)"""
+        if self._atual is not None:
+            self._atual.descartar()
+            self._atual = None
+
+def ler_manifesto(diretorio: str, prefixo: str = 'pagamentos') -> Optional[Dict]:
+    """Manifesto de uma exportação concluída, ou None se ainda não terminou"""
+    try:
+        with open(os.path.join(diretorio, f"{prefixo}-manifesto.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Formato colunar binário da base consolidada (.bcol)
+
+Alternativa ao base_consolidada.csv para consumidores que não são o
+importador web: colunas tipadas (inteiros, datas em ordinais, booleanos),
+categorias (plano, status, indicador...) codificadas por dicionário e as
+linhas divididas em blocos com mínimo/máximo por coluna. O leitor carrega
+só o rodapé e as colunas pedidas, e pula os blocos cujo intervalo não
+cruza o filtro (por exemplo, um intervalo de data_vencimento).
+
+Layout do arquivo (inteiros little-endian):
+
+    'BCOL' + versão (1 byte)
+    blocos: para cada bloco, as colunas uma após a outra
+    rodapé JSON (esquema, dicionários, e por bloco/coluna: posição,
+    tamanho, nulos, mínimo e máximo)
+    tamanho do rodapé (uint32) + 'BCOL'
+
+Codificação de cada coluna num bloco: mapa de nulos (1 bit por linha, só
+se houver nulos), seguido de int64 ('inteiro'), int32 com o ordinal do
+calendário ('data'), 1 bit por linha ('booleano'), índices no dicionário
+de 1, 2 ou 4 bytes ('categoria') ou deslocamentos uint32 + UTF-8 ('texto').
+
+    python3 formato_colunar.py [base_consolidada.bcol] [--colunas email,plano]
+                               [--entre data_vencimento 01/10/2025 31/10/2025]
+"""
+import argparse
+import json
+import operator
+import struct
+import sys
+from array import array
+from datetime import date
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from datas import como_ordinal
+from saidas import ArquivoAtomico, Destino
+
+MAGICO = b'BCOL'
+VERSAO = 1
+ARQUIVO_PADRAO = 'base_consolidada.bcol'
+LINHAS_POR_BLOCO = 8192
+TIPOS = ('texto', 'categoria', 'inteiro', 'data', 'booleano')
+
+# Colunas da base consolidada: (nome, tipo, campo do usuário consolidado)
+COLUNAS_BASE = (
+    ('email', 'texto', 'email'),
+    ('nome', 'texto', 'nome'),
+    ('telefone', 'texto', 'telefone'),
+    ('indicador', 'categoria', 'indicador'),
+    ('plano', 'categoria', 'plano'),
+    ('status_sistema', 'categoria', 'status_sistema'),
+    ('empresa', 'texto', 'empresa'),
+    ('funcao', 'categoria', 'funcao'),
+    ('verificado', 'categoria', 'verificado'),
+    ('tem_pagamentos', 'booleano', 'tem_pagamentos'),
+    ('total_pagamentos', 'inteiro', 'total_pagamentos'),
+    ('total_ciclos', 'inteiro', 'total_ciclos'),
+    ('ultimo_pagamento', 'data', 'ultimo_pagamento_ord'),
+    ('data_vencimento', 'data', 'data_vencimento_ord'),
+    ('status_pagamento', 'categoria', 'status_pagamento'),
+    ('data_criacao', 'data', 'data_criacao_ord'),
+    ('ultima_atividade', 'data', 'ultima_atividade_ord'),
+    ('obs', 'texto', 'obs'),
+    ('alertas_str', 'categoria', 'alertas_str'),
+    ('tags_str', 'categoria', 'tags_str'),
+    ('fontes_str', 'categoria', 'fontes_str'),
+)
+ESQUEMA_BASE = tuple((nome, tipo) for nome, tipo, _ in COLUNAS_BASE)
+
+def _inteiro_ou_nulo(valor) -> Optional[int]:
+    # total_ciclos chega como texto da planilha de pagamentos ('' quando não informado)
+    if isinstance(valor, int):
+        return valor
+    try:
+        return int(valor.strip())
+    except ValueError:
+        return None
+
+_CONVERSORES = {'booleano': lambda v: v == 'SIM', 'inteiro': _inteiro_ou_nulo}
+
+_CAMPOS_BASE = operator.attrgetter(*(campo for _, _, campo in COLUNAS_BASE))
+_CONVERTIDOS = tuple((k, _CONVERSORES[tipo]) for k, (_, tipo, _) in enumerate(COLUNAS_BASE) if tipo in _CONVERSORES)
+
+def linha_base(u) -> Tuple:
+    """Valores de um usuário consolidado (UsuarioConsolidado) na ordem de COLUNAS_BASE"""
+    valores = list(_CAMPOS_BASE(u))
+    for k, converter in _CONVERTIDOS:
+        valores[k] = converter(valores[k])
+    return tuple(valores)
+
+def _para_bytes(valores: array) -> bytes:
+    if sys.byteorder == 'big':
+        valores = array(valores.typecode, valores)
+        valores.byteswap()
+    return valores.tobytes()
+
+def _de_bytes(codigo: str, dados: bytes) -> array:
+    valores = array(codigo)
+    valores.frombytes(dados)
+    if sys.byteorder == 'big':
+        valores.byteswap()
+    return valores
+
+def _mapa_bits(bits: Sequence[bool]) -> bytes:
+    mapa = bytearray((len(bits) + 7) // 8)
+    for i, ligado in enumerate(bits):
+        if ligado:
+            mapa[i >> 3] |= 1 << (i & 7)
+    return bytes(mapa)
+
+def _ler_bits(mapa: bytes, n: int) -> List[bool]:
+    return [bool(mapa[i >> 3] >> (i & 7) & 1) for i in range(n)]
+
+def _largura(maior: int) -> str:
+    return 'B' if maior < 1 << 8 else 'H' if maior < 1 << 16 else 'I'
+
+class EscritorColunar:
+    """Grava linhas (tuplas na ordem das colunas) em blocos colunares, publicando o arquivo em fechar()"""
+
+    def __init__(self, caminho: str, colunas: Sequence[Tuple[str, str]], linhas_por_bloco: int = LINHAS_POR_BLOCO):
+        for nome, tipo in colunas:
+            if tipo not in TIPOS:
+                raise ValueError(f"coluna {nome}: tipo inválido {tipo!r} (use {', '.join(TIPOS)})")
+        if linhas_por_bloco < 1:
+            raise ValueError(f"linhas por bloco deve ser positivo: {linhas_por_bloco}")
+        self.caminho = caminho
+        self.colunas = tuple(colunas)
+        self.linhas_por_bloco = linhas_por_bloco
+        self.total = 0
+        self.blocos: List[Dict] = []
+        self._dicionarios: Dict[str, Dict[str, int]] = {nome: {} for nome, tipo in colunas if tipo == 'categoria'}
+        self._pendentes: List[List] = [[] for _ in colunas]
+        self._arquivo = ArquivoAtomico(caminho, binario=True)
+        self._arquivo.write(MAGICO + bytes([VERSAO]))
+        self._posicao = len(MAGICO) + 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *exc):
+        if tipo is None:
+            self.fechar()
+        else:
+            self.descartar()
+
+    def escrever(self, linha: Sequence):
+        for pendentes, valor in zip(self._pendentes, linha):
+            pendentes.append(valor)
+        self.total += 1
+        if len(self._pendentes[0]) >= self.linhas_por_bloco:
+            self._gravar_bloco()
+
+    def _codificar(self, nome: str, tipo: str, valores: List) -> Tuple[bytes, Dict]:
+        nulos = [v is None for v in valores]
+        presentes = [v for v in valores if v is not None]
+        meta = {'nulos': len(valores) - len(presentes)}
+        dados = _mapa_bits(nulos) if meta['nulos'] else b''
+        if tipo == 'booleano':
+            return dados + _mapa_bits([bool(v) for v in valores]), meta
+
+        if presentes:
+            meta['min'], meta['max'] = min(presentes), max(presentes)
+        if tipo == 'inteiro':
+            dados += _para_bytes(array('q', (v or 0 for v in valores)))
+        elif tipo == 'data':
+            dados += _para_bytes(array('i', (v or 0 for v in valores)))
+        elif tipo == 'categoria':
+            dicionario = self._dicionarios[nome]
+            codigos = [dicionario.setdefault(v or '', len(dicionario)) for v in valores]
+            meta['largura'] = _largura(max(codigos, default=0))
+            dados += _para_bytes(array(meta['largura'], codigos))
+        else:
+            textos = [(v or '').encode('utf-8') for v in valores]
+            deslocamentos = array('I', [0])
+            for texto in textos:
+                deslocamentos.append(deslocamentos[-1] + len(texto))
+            dados += _para_bytes(deslocamentos) + b''.join(textos)
+        return dados, meta
+
+    def _gravar_bloco(self):
+        n = len(self._pendentes[0])
+        if not n:
+            return
+        bloco = {'linhas': n, 'colunas': {}}
+        for (nome, tipo), valores in zip(self.colunas, self._pendentes):
+            dados, meta = self._codificar(nome, tipo, valores)
+            meta['posicao'], meta['tamanho'] = self._posicao, len(dados)
+            self._arquivo.write(dados)
+            self._posicao += len(dados)
+            bloco['colunas'][nome] = meta
+        self.blocos.append(bloco)
+        self._pendentes = [[] for _ in self.colunas]
+
+    def fechar(self):
+        """Grava o último bloco e o rodapé e publica o arquivo"""
+        if self._arquivo.arquivo.closed:
+            return
+        self._gravar_bloco()
+        rodape = json.dumps({
+            'versao': VERSAO,
+            'colunas': [list(coluna) for coluna in self.colunas],
+            'linhas': self.total,
+            'dicionarios': {nome: list(dicionario) for nome, dicionario in self._dicionarios.items()},
+            'blocos': self.blocos,
+        }, ensure_ascii=False).encode('utf-8')
+        self._arquivo.write(rodape + struct.pack('<I', len(rodape)) + MAGICO)
+        self._arquivo.concluir()
+
+    def descartar(self):
+        self._arquivo.descartar()
+
+class DestinoColunar(Destino):
+    """Arquivo .bcol como destino do multiplexador de saidas; linha converte o registro"""
+
+    def __init__(self, caminho: str, colunas: Sequence[Tuple[str, str]] = ESQUEMA_BASE,
+                 linha: Callable = linha_base, linhas_por_bloco: int = LINHAS_POR_BLOCO):
+        super().__init__(caminho)
+        self.colunas = colunas
+        self.linha = linha
+        self.linhas_por_bloco = linhas_por_bloco
+
+    def _abrir(self):
+        return EscritorColunar(self.caminho, self.colunas, self.linhas_por_bloco)
+
+    def _gravar(self, registro):
+        self._arquivo.escrever(self.linha(registro))
+
+    def _publicar(self):
+        self._arquivo.fechar()
+
+# Leitura
+
+class LeitorColunar:
+    """Lê o rodapé de um .bcol; colunas e blocos são carregados só quando pedidos"""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        with open(caminho, 'rb') as f:
+            if f.read(len(MAGICO) + 1) != MAGICO + bytes([VERSAO]):
+                raise ValueError(f"{caminho}: não é um arquivo colunar (versão {VERSAO})")
+            f.seek(-(4 + len(MAGICO)), 2)
+            tamanho, magico = struct.unpack('<I4s', f.read(4 + len(MAGICO)))
+            if magico != MAGICO:
+                raise ValueError(f"{caminho}: arquivo colunar incompleto")
+            f.seek(-(tamanho + 4 + len(MAGICO)), 2)
+            rodape = json.loads(f.read(tamanho).decode('utf-8'))
+        self.colunas: Tuple[Tuple[str, str], ...] = tuple(tuple(c) for c in rodape['colunas'])
+        self.tipos = dict(self.colunas)
+        self.linhas: int = rodape['linhas']
+        self.dicionarios: Dict[str, List[str]] = rodape['dicionarios']
+        self.blocos: List[Dict] = rodape['blocos']
+
+    def blocos_no_intervalo(self, coluna: str, inicio=None, fim=None) -> List[int]:
+        """Blocos cujo [mínimo, máximo] da coluna cruza [inicio, fim] (datas aceitam texto ou date)"""
+        if self.tipos[coluna] == 'data':
+            inicio, fim = (None if v is None else como_ordinal(v) for v in (inicio, fim))
+        selecionados = []
+        for i, bloco in enumerate(self.blocos):
+            meta = bloco['colunas'][coluna]
+            if 'min' not in meta:
+                continue
+            if (inicio is None or meta['max'] >= inicio) and (fim is None or meta['min'] <= fim):
+                selecionados.append(i)
+        return selecionados
+
+    def _decodificar(self, nome: str, bloco: Dict, dados: bytes) -> List:
+        tipo = self.tipos[nome]
+        meta = bloco['colunas'][nome]
+        n = bloco['linhas']
+        nulos = None
+        if meta['nulos']:
+            nulos = _ler_bits(dados, n)
+            dados = dados[(n + 7) // 8:]
+        if tipo == 'booleano':
+            valores = _ler_bits(dados, n)
+        elif tipo == 'inteiro':
+            valores = _de_bytes('q', dados).tolist()
+        elif tipo == 'data':
+            valores = [date.fromordinal(v) if v else None for v in _de_bytes('i', dados)]
+        elif tipo == 'categoria':
+            dicionario = self.dicionarios[nome]
+            valores = [dicionario[c] for c in _de_bytes(meta['largura'], dados)]
+        else:
+            deslocamentos = _de_bytes('I', dados[:4 * (n + 1)])
+            textos = dados[4 * (n + 1):]
+            valores = [textos[deslocamentos[i]:deslocamentos[i + 1]].decode('utf-8') for i in range(n)]
+        if nulos:
+            valores = [None if nulo else v for nulo, v in zip(nulos, valores)]
+        return valores
+
+    def ler_colunas(self, nomes: Optional[Sequence[str]] = None,
+                    blocos: Optional[Sequence[int]] = None) -> Dict[str, List]:
+        """{coluna: valores} só das colunas e blocos pedidos (padrão: todos)"""
+        nomes = [nome for nome, _ in self.colunas] if nomes is None else list(nomes)
+        for nome in nomes:
+            if nome not in self.tipos:
+                raise KeyError(f"coluna desconhecida: {nome}")
+        blocos = range(len(self.blocos)) if blocos is None else blocos
+        resultado = {nome: [] for nome in nomes}
+        with open(self.caminho, 'rb') as f:
+            for i in blocos:
+                bloco = self.blocos[i]
+                for nome in nomes:
+                    meta = bloco['colunas'][nome]
+                    f.seek(meta['posicao'])
+                    resultado[nome].extend(self._decodificar(nome, bloco, f.read(meta['tamanho'])))
+        return resultado
+
+    def ler(self, nomes: Optional[Sequence[str]] = None, entre: Optional[Tuple[str, object, object]] = None
+            ) -> Iterator[Dict]:
+        """Linhas como dicts; entre=(coluna, inicio, fim) pula blocos pelas estatísticas e filtra as linhas"""
+        nomes = [nome for nome, _ in self.colunas] if nomes is None else list(nomes)
+        if entre is None:
+            colunas = self.ler_colunas(nomes)
+        else:
+            coluna, inicio, fim = entre
+            colunas = self.ler_colunas(list(dict.fromkeys(nomes + [coluna])), self.blocos_no_intervalo(*entre))
+            if self.tipos[coluna] == 'data':
+                inicio, fim = (None if v is None else date.fromordinal(como_ordinal(v)) for v in (inicio, fim))
+        for i in range(len(colunas[nomes[0]]) if nomes else 0):
+            if entre is not None:
+                valor = colunas[coluna][i]
+                if valor is None or (inicio is not None and valor < inicio) or (fim is not None and valor > fim):
+                    continue
+            yield {nome: colunas[nome][i] for nome in nomes}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Lê a base consolidada no formato colunar (.bcol)')
+    parser.add_argument('arquivo', nargs='?', default=ARQUIVO_PADRAO)
+    parser.add_argument('--colunas', help='colunas separadas por vírgula (padrão: todas)')
+    parser.add_argument('--entre', nargs=3, metavar=('COLUNA', 'INICIO', 'FIM'),
+                        help='só linhas com COLUNA entre INICIO e FIM (datas em dd/mm/aaaa)')
+    parser.add_argument('--limite', type=int, default=20, help='linhas exibidas (padrão: 20)')
+    args = parser.parse_args(argv)
+
+    try:
+        leitor = LeitorColunar(args.arquivo)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    nomes = args.colunas.split(',') if args.colunas else None
+    entre = None
+    if args.entre:
+        coluna, inicio, fim = args.entre
+        if leitor.tipos.get(coluna) == 'inteiro':
+            inicio, fim = int(inicio), int(fim)
+        entre = (coluna, inicio, fim)
+        lidos = len(leitor.blocos_no_intervalo(*entre))
+    else:
+        lidos = len(leitor.blocos)
+
+    try:
+        linhas = list(leitor.ler(nomes, entre))
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        return 1
+    print(f"📦 {args.arquivo}: {leitor.linhas} linhas, {len(leitor.colunas)} colunas, "
+          f"{len(leitor.blocos)} blocos ({lidos} lidos)")
+    for linha in linhas[:args.limite]:
+        print('  ' + ' | '.join('' if v is None else str(v) for v in linha.values()))
+    if len(linhas) > args.limite:
+        print(f"  ... e mais {len(linhas) - args.limite} linhas")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Gera as três fontes do reorganizar_banco.py com dados sintéticos
+
+Os arquivos têm os mesmos nomes, cabeçalhos, delimitador (';'), fim de
+linha (CRLF) e codificação das exportações reais: o export do sistema em
+UTF-8, a planilha EMAIL_LOGIN e os 42 campos de PAGAMENTOS em latin-1.
+Nenhum dado de produção é usado; nomes, telefones, datas e valores seguem
+as distribuições das planilhas de exemplo e a mesma semente gera sempre os
+mesmos arquivos.
+
+Cada usuário aparece em uma ou mais fontes (proporções parecidas com as do
+exemplo). Além disso há:
+  - duplicados: a mesma linha repetida no sistema ou na planilha;
+  - quase duplicados: um usuário novo com o email de um anterior com um
+    erro de digitação (letra trocada, faltando ou domínio errado);
+  - valores sujos: email com maiúsculas e espaços, telefone 'N/A' ou fora
+    do padrão, datas inválidas, valor ' R$ -   ', método/conta vazios,
+    'aguardando' no lugar do email.
+
+    python3 gerar_dados_sinteticos.py --usuarios 100000 --diretorio dados_100k
+    cd dados_100k && python3 ../reorganizar_banco.py --no-cache
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import unicodedata
+from collections import deque
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+from saidas import ArquivoAtomico, abrir_atomico
+
+ARQUIVO_SISTEMA = 'usuarios_2025-10-29_17h45.csv'
+ARQUIVO_PLANILHA = 'controle usuarios(USUÁRIOS) (2).csv'
+ARQUIVO_PAGAMENTOS = 'controle usuarios(PAGAMENTOS) (3).csv'
+ARQUIVO_PARAMETROS = 'parametros.json'
+REFERENCIA = date(2025, 10, 29)
+
+CABECALHO_SISTEMA = ['ID', 'Nome', 'Email', 'Empresa', 'Função', 'Status', 'Aprovado', 'Data de Criação',
+                     'Última Atividade', 'Telefone', 'Plano de Assinatura', 'Verificado']
+CABECALHO_PLANILHA = ['EMAIL_LOGIN', 'NOME_COMPLETO', 'TELEFONE', 'INDICADOR', 'OBS', 'Coluna1', '', '', '', '']
+CABECALHO_PAGAMENTOS = [
+    'EMAIL_LOGIN', 'NOME_COMPLETO', 'TELEFONE', 'INDICADOR', 'DATA_PAGTO', 'MÊS_PAGTO', 'DIAS_ACESSO',
+    'DATA_VENC', 'STATUS', 'STATUS_FINAL', 'DIAS_PARA_VENCER', 'VENCE_HOJE', 'PROX_7_DIAS', 'EM_ATRASO',
+    'MÉTODO', 'CONTA', 'VALOR', 'OBS', 'CICLO', 'TOTAL_CICLOS_USUARIO', 'E_ULTIMO', 'FLAG_AGENDA',
+    'K_AGENDA', 'FLAG_SEMANA', 'ROW_ID', 'MES_REF', 'ENTROU', 'RENOVOU', 'ATIVO_ATUAL', 'CHURN', 'K_CHURN',
+    'REGRA_TIPO', 'REGRA_VALOR', 'ELEGIVEL_COMISSÃO', 'COMISSÃO_VALOR', 'ENTROU_ELIG', 'RENOVOU_ELEGIVEL',
+    'ATIVO_MES_FLAG', 'CHURN_MES_FLAG', 'K_COMISSAO', 'teste a', 'teste b',
+]
+
+# Probabilidade de um usuário estar em cada fonte (exemplo: 243, 214 e 214 de 274)
+FRACAO_SISTEMA = 0.88
+FRACAO_PLANILHA = 0.78
+FRACAO_PAGAMENTOS = 0.78
+
+PRIMEIROS_NOMES = (
+    'João', 'José', 'Maria', 'Ana', 'Lucas', 'Gabriel', 'Rafael', 'Felipe', 'Bruno', 'Marcelo', 'Paulo',
+    'Pedro', 'Júlia', 'Beatriz', 'Antônio', 'Carlos', 'Daniel', 'Diego', 'Eduardo', 'Fernanda', 'Gustavo',
+    'Henrique', 'Igor', 'Juliana', 'Leonardo', 'Matheus', 'Natália', 'Otávio', 'Rodrigo', 'Thiago',
+    'Vinícius', 'Walter', 'Yuri', 'Érica', 'Luís', 'Márcio', 'Sérgio', 'Cássio', 'Adel', 'Mohamad',
+)
+SOBRENOMES = (
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+    'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Gonçalves', 'Conceição', 'Araújo',
+    'Barros', 'Batista', 'Borges', 'Cardoso', 'Domingues', 'Fontes', 'Garcia', 'Jota', 'Teplizki',
+)
+NEGOCIOS = ('Imports', 'iPhones', 'Store', 'Shop', 'Eletrônicos', 'Cell', 'Tech', 'Importados', 'Celulares')
+INDICADORES = (
+    'MARCELO IR', 'BRYAN FONTES', 'CASIMIRO', 'RAYZA', 'FELIPE TORRES', 'LEO ARMOND', 'PAULO CONNECT',
+    'WALTER NETO', 'SHOW STORE', 'REI DO IPHONE', 'AZ SHOP', 'XFB', 'BROCK TECH', 'IAN', 'DANIEL',
+)
+DOMINIOS = (('gmail.com', 70), ('hotmail.com', 12), ('icloud.com', 9), ('outlook.com', 5), ('yahoo.com.br', 4))
+ERROS_DOMINIO = {'gmail.com': 'gmial.com', 'hotmail.com': 'hotmal.com', 'icloud.com': 'iclod.com',
+                 'outlook.com': 'outlok.com', 'yahoo.com.br': 'yaho.com.br'}
+DDDS = ('11', '12', '14', '21', '27', '31', '41', '51', '54', '61', '62', '71', '73', '81', '85', '88')
+PLANOS = (('pro', 'PRO', 84), ('free', 'Free', 11), ('apoiador', 'Apoiador', 4), ('admin', 'Admin', 1))
+VALORES = ((28990, 66), (29000, 15), (28900, 11), (38990, 2), (39000, 1), (0, 2), (9990, 1), (57980, 2))
+CONTAS_PIX = (('EAGLE', 64), ('IMPTEC', 22), ('PXT', 14))
+METODOS = (('PIX', 95), ('DIN', 3), ('CRÉDITO', 2))
+MESES = ('JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN', 'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ')
+OBSERVACOES = ('INDICOU CLIENTES GANHOU 1 MES GRAÇA', 'CREDITO CHURRASCO', 'PAGOU POR 5 MESES E GANHOU + 1',
+               'COMPROVANTE NÃO FOI ENVIADO NO GRUPO')
+
+class Sorteio:
+    """Escolhas ponderadas com pesos acumulados pré-calculados"""
+
+    def __init__(self, rnd: random.Random, opcoes):
+        self.rnd = rnd
+        self.valores = [opcao[:-1] if len(opcao) > 2 else opcao[0] for opcao in opcoes]
+        pesos = [opcao[-1] for opcao in opcoes]
+        self.acumulados = [sum(pesos[:i + 1]) for i in range(len(pesos))]
+
+    def __call__(self):
+        return self.rnd.choices(self.valores, cum_weights=self.acumulados)[0]
+
+def _ascii(texto: str) -> str:
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+
+def _data(dia: date) -> str:
+    return dia.strftime('%d/%m/%Y')
+
+def _reais(centavos: int) -> str:
+    """Como a planilha exporta dinheiro: ' R$ 1.289,90 ' (' R$ -   ' para zero)"""
+    if not centavos:
+        return ' R$ -   '
+    texto = f"{centavos / 100:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+    return f" R$ {texto} "
+
+def _erro_digitacao(rnd: random.Random, email: str) -> str:
+    """Variação de um email com um erro de digitação (para os quase duplicados)"""
+    local, dominio = email.split('@', 1)
+    tipo = rnd.randrange(4)
+    if tipo == 3 or len(local) < 3:
+        return f"{local}@{ERROS_DOMINIO.get(dominio, 'gmai.com')}"
+    i = rnd.randrange(len(local) - 1)
+    if tipo == 0:
+        local = local[:i] + local[i + 1] + local[i] + local[i + 2:]
+    elif tipo == 1:
+        local = local[:i] + local[i + 1:]
+    else:
+        local = local[:i] + local[i] + local[i:]
+    return f"{local}@{dominio}"
+
+class Gerador:
+    """Produz as linhas das três fontes usuário a usuário (memória constante)"""
+
+    def __init__(self, semente: int, pagamentos_por_usuario: float, duplicados: float, quase_duplicados: float,
+                 sujos: float, referencia: date = REFERENCIA):
+        self.rnd = random.Random(semente)
+        self.pagamentos_por_usuario = pagamentos_por_usuario
+        self.duplicados = duplicados
+        self.quase_duplicados = quase_duplicados
+        self.sujos = sujos
+        self.referencia = referencia
+        self.dominio = Sorteio(self.rnd, DOMINIOS)
+        self.plano = Sorteio(self.rnd, PLANOS)
+        self.valor = Sorteio(self.rnd, VALORES)
+        self.conta_pix = Sorteio(self.rnd, CONTAS_PIX)
+        self.metodo = Sorteio(self.rnd, METODOS)
+        self.recentes = deque(maxlen=1000)
+        self.proximo_id = 1
+        self.proxima_linha = 2
+        self.contadores = {'agenda': 0, 'churn': 0, 'comissao': 0}
+        self.totais = {'usuarios': 0, 'sistema': 0, 'planilha': 0, 'pagamentos': 0,
+                       'duplicados': 0, 'quase_duplicados': 0}
+
+    def _sujo(self) -> bool:
+        return self.rnd.random() < self.sujos
+
+    def _pessoa(self, numero: int) -> Dict:
+        rnd = self.rnd
+        primeiro, sobrenome = rnd.choice(PRIMEIROS_NOMES), rnd.choice(SOBRENOMES)
+        if self.recentes and rnd.random() < self.quase_duplicados:
+            base = rnd.choice(self.recentes)
+            email = _erro_digitacao(rnd, base['email'])
+            primeiro, sobrenome = base['primeiro'], base['sobrenome']
+            self.totais['quase_duplicados'] += 1
+        else:
+            local = rnd.choice((f"{primeiro}.{sobrenome}", f"{primeiro}{sobrenome}", f"{primeiro}_{sobrenome[0]}",
+                                f"{sobrenome}{primeiro[0]}"))
+            email = f"{_ascii(local).lower()}{numero}@{self.dominio()}"
+        criacao = self.referencia - timedelta(days=rnd.randrange(240))
+        ddd = rnd.choice(DDDS)
+        numero_telefone = f"9{rnd.randrange(10**7, 10**8)}" if rnd.random() < 0.85 else str(rnd.randrange(2 * 10**7, 10**8))
+        pessoa = {
+            'email': email, 'primeiro': primeiro, 'sobrenome': sobrenome,
+            'nome': f"{primeiro} {sobrenome}",
+            'empresa': f"{sobrenome} {rnd.choice(NEGOCIOS)}" if rnd.random() < 0.85 else 'N/A',
+            'ddd': ddd, 'telefone': numero_telefone, 'criacao': criacao,
+            'indicador': rnd.choice(INDICADORES) if rnd.random() < 0.36 else '',
+        }
+        self.recentes.append(pessoa)
+        return pessoa
+
+    def _email(self, pessoa: Dict) -> str:
+        if self._sujo():
+            return f" {pessoa['email'].capitalize()} "
+        return pessoa['email']
+
+    def _telefone_planilha(self, pessoa: Dict) -> str:
+        if self._sujo():
+            return self.rnd.choice(('', 'N/A', f"({pessoa['ddd']}) {pessoa['telefone']}", '000'))
+        numero = pessoa['telefone']
+        return f"{pessoa['ddd']} {numero[:-4]}-{numero[-4:]}"
+
+    def linhas_sistema(self, pessoa: Dict) -> List[List[str]]:
+        rnd = self.rnd
+        plano, funcao = self.plano()
+        if rnd.random() < 0.01:
+            atividade = 'Nunca'
+        else:
+            dia = pessoa['criacao'] + timedelta(days=rnd.randrange((self.referencia - pessoa['criacao']).days + 1))
+            atividade = f"{_data(dia)}, {rnd.randrange(24):02d}:{rnd.randrange(60):02d}:{rnd.randrange(60):02d}"
+        telefone = rnd.choice((f"+55{pessoa['ddd']}{pessoa['telefone']}", f"{pessoa['ddd']}{pessoa['telefone']}"))
+        if pessoa['empresa'] == 'N/A' or self._sujo():
+            telefone = rnd.choice(('N/A', ''))
+        criacao = _data(pessoa['criacao']) if not self._sujo() else rnd.choice(('', '31/02/2025'))
+        linha = [str(self.proximo_id), pessoa['nome'], self._email(pessoa), pessoa['empresa'], funcao, 'Ativo',
+                 'Sim', criacao, atividade, telefone, plano, 'Sim' if rnd.random() < 0.01 else 'Não']
+        self.proximo_id += 1
+        linhas = [linha]
+        if rnd.random() < self.duplicados:
+            linhas.append([str(self.proximo_id)] + linha[1:])
+            self.proximo_id += 1
+            self.totais['duplicados'] += 1
+        return linhas
+
+    def linhas_planilha(self, pessoa: Dict) -> List[List[str]]:
+        email = 'aguardando' if self._sujo() and self.rnd.random() < 0.2 else self._email(pessoa)
+        linha = [email, pessoa['nome'].upper(), self._telefone_planilha(pessoa), pessoa['indicador'],
+                 '', '', '', '', '', '']
+        if self.rnd.random() < self.duplicados:
+            self.totais['duplicados'] += 1
+            return [linha, list(linha)]
+        return [linha]
+
+    def linhas_pagamentos(self, pessoa: Dict) -> List[List[str]]:
+        rnd = self.rnd
+        referencia = self.referencia
+        inicio = pessoa['criacao'] + timedelta(days=rnd.randrange(10))
+        # Ciclos de 30 dias: geométrica com a média pedida, sem passar da data de referência
+        maximo = max(1, (referencia - inicio).days // 30 + 1)
+        ciclos = 1
+        while ciclos < maximo and rnd.random() > 1 / max(self.pagamentos_por_usuario, 1):
+            ciclos += 1
+        valor = self.valor()
+        metodo = self.metodo()
+        conta = self.conta_pix() if metodo == 'PIX' else metodo
+        nome = pessoa['nome'].upper()
+        telefone = self._telefone_planilha(pessoa)
+
+        linhas = []
+        for ciclo in range(1, ciclos + 1):
+            pagto = inicio + timedelta(days=30 * (ciclo - 1))
+            venc = pagto + timedelta(days=30)
+            dias = (venc - referencia).days
+            ultimo = ciclo == ciclos
+            ativo = ultimo and dias >= 0
+            churn = ultimo and not ativo
+            regra, regra_valor = '', 0
+            if pessoa['indicador'] and ciclo == 1 and rnd.random() < 0.8:
+                regra, regra_valor = 'PRIMEIRO', 10000
+            elif pessoa['indicador'] and ciclo == 2 and rnd.random() < 0.3:
+                regra, regra_valor = 'RECORRENTE', 7000
+            agenda = 0 <= dias <= 7
+            for chave, ligado in (('agenda', agenda), ('churn', churn), ('comissao', bool(regra))):
+                if ligado:
+                    self.contadores[chave] += 1
+
+            valor_linha, metodo_linha, conta_linha, data_pagto = valor, metodo, conta, _data(pagto)
+            if self._sujo():
+                sujeira = rnd.randrange(4)
+                if sujeira == 0:
+                    valor_linha = 0
+                elif sujeira == 1:
+                    metodo_linha = conta_linha = ''
+                elif sujeira == 2:
+                    data_pagto = rnd.choice(('', '31/02/2025', '2025-10-01'))
+                else:
+                    conta_linha = ''
+            linhas.append([
+                self._email(pessoa), nome, telefone,
+                pessoa['indicador'] or ('0' if rnd.random() < 0.05 else ''),
+                data_pagto, MESES[pagto.month - 1], '30', _data(venc),
+                'Ativo' if ativo else 'Inativo',
+                ('Ativo' if ativo else 'Inativo') if ultimo else 'Histórico',
+                str(dias), str(int(dias == 0)), str(int(agenda)), str(int(not ativo)),
+                metodo_linha, conta_linha, _reais(valor_linha),
+                rnd.choice(OBSERVACOES) if rnd.random() < 0.04 else '',
+                str(ciclo), str(ciclos), str(int(ultimo)), str(int(agenda)),
+                str(self.contadores['agenda']) if agenda else '',
+                str(int(rnd.random() < 0.7)), str(self.proxima_linha),
+                f"01/{pagto.month:02d}/{pagto.year}",
+                str(int(ciclo == 1)), str(int(ciclo > 1)), str(int(ativo)), str(int(churn)),
+                str(self.contadores['churn']) if churn else '',
+                regra, str(regra_valor // 100), str(int(bool(regra))), _reais(regra_valor),
+                str(int(bool(regra) and ciclo == 1)), str(int(bool(regra) and ciclo > 1)),
+                str(int(ativo)), str(int(churn)),
+                str(self.contadores['comissao']) if regra else '',
+                'VERDADEIRO' if regra == 'RECORRENTE' else 'FALSO', '',
+            ])
+            self.proxima_linha += 1
+        return linhas
+
+    def usuario(self, numero: int) -> Tuple[List, List, List]:
+        """Linhas (sistema, planilha, pagamentos) de um usuário; ao menos uma fonte não vazia"""
+        rnd = self.rnd
+        pessoa = self._pessoa(numero)
+        fontes = [rnd.random() < FRACAO_SISTEMA, rnd.random() < FRACAO_PLANILHA, rnd.random() < FRACAO_PAGAMENTOS]
+        if not any(fontes):
+            fontes[rnd.randrange(3)] = True
+        self.totais['usuarios'] += 1
+        return (self.linhas_sistema(pessoa) if fontes[0] else [],
+                self.linhas_planilha(pessoa) if fontes[1] else [],
+                self.linhas_pagamentos(pessoa) if fontes[2] else [])
+
+def _escrever(arquivo, campos: List[str]):
+    # Sem aspas desnecessárias, como o export: ';' dentro de um campo vira ','
+    arquivo.write(';'.join(campo.replace(';', ',') for campo in campos) + '\r\n')
+
+def gerar(diretorio: str, usuarios: int, pagamentos_por_usuario: float = 2.0, duplicados: float = 0.01,
+          quase_duplicados: float = 0.02, sujos: float = 0.02, semente: int = 42) -> Dict:
+    """Grava as três fontes em diretorio e retorna os parâmetros com os totais gerados
+
+    Os parâmetros (com os totais) vão também para parametros.json, gravado
+    por último: um diretório com esse arquivo tem os três arquivos completos.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    parametros = {
+        'usuarios': usuarios, 'pagamentos_por_usuario': pagamentos_por_usuario, 'duplicados': duplicados,
+        'quase_duplicados': quase_duplicados, 'sujos': sujos, 'semente': semente,
+    }
+    gerador = Gerador(semente, pagamentos_por_usuario, duplicados, quase_duplicados, sujos)
+    inicio = time.perf_counter()
+    with ArquivoAtomico(os.path.join(diretorio, ARQUIVO_SISTEMA), encoding='utf-8') as sistema, \
+            ArquivoAtomico(os.path.join(diretorio, ARQUIVO_PLANILHA), encoding='latin-1') as planilha, \
+            ArquivoAtomico(os.path.join(diretorio, ARQUIVO_PAGAMENTOS), encoding='latin-1') as pagamentos:
+        saidas = ((sistema, 'sistema'), (planilha, 'planilha'), (pagamentos, 'pagamentos'))
+        for arquivo, cabecalho in zip((sistema, planilha, pagamentos),
+                                      (CABECALHO_SISTEMA, CABECALHO_PLANILHA, CABECALHO_PAGAMENTOS)):
+            _escrever(arquivo, cabecalho)
+        for numero in range(1, usuarios + 1):
+            for (arquivo, fonte), linhas in zip(saidas, gerador.usuario(numero)):
+                for linha in linhas:
+                    _escrever(arquivo, linha)
+                gerador.totais[fonte] += len(linhas)
+
+    parametros['totais'] = gerador.totais
+    parametros['segundos'] = round(time.perf_counter() - inicio, 3)
+    with abrir_atomico(os.path.join(diretorio, ARQUIVO_PARAMETROS)) as f:
+        json.dump(parametros, f, ensure_ascii=False, indent=2)
+    return parametros
+
+def ler_parametros(diretorio: str) -> Dict:
+    """Parâmetros de uma geração concluída em diretorio ({} se não houver)"""
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_PARAMETROS), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def quantidade(texto: str) -> int:
+    """'10000', '10k', '1M' ou '1_000_000' -> int (argumentos de linha de comando)"""
+    texto = texto.strip().replace('_', '')
+    multiplicador = {'k': 10**3, 'm': 10**6}.get(texto[-1:].lower(), 1)
+    if multiplicador > 1:
+        texto = texto[:-1]
+    try:
+        valor = int(float(texto) * multiplicador)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"quantidade inválida: {texto!r} (use 10000, 10k ou 1M)")
+    if valor < 1:
+        raise argparse.ArgumentTypeError(f"quantidade deve ser positiva: {valor}")
+    return valor
+
+def fracao(texto: str) -> float:
+    valor = float(texto)
+    if not 0 <= valor <= 1:
+        raise argparse.ArgumentTypeError(f"fração fora de [0, 1]: {valor}")
+    return valor
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Gera as três fontes do reorganizar_banco.py com dados sintéticos')
+    parser.add_argument('--usuarios', type=quantidade, default=10000, help='usuários distintos (10000, 10k, 1M)')
+    parser.add_argument('--diretorio', default='dados_sinteticos', help='diretório de saída (padrão: dados_sinteticos)')
+    parser.add_argument('--pagamentos-por-usuario', type=float, default=2.0,
+                        help='média de pagamentos (ciclos de 30 dias) por usuário com pagamentos')
+    parser.add_argument('--duplicados', type=fracao, default=0.01, help='fração de linhas repetidas')
+    parser.add_argument('--quase-duplicados', type=fracao, default=0.02,
+                        help='fração de usuários com o email de outro com erro de digitação')
+    parser.add_argument('--sujos', type=fracao, default=0.02, help='fração de valores sujos por campo sorteado')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    print(f"🧪 Gerando {args.usuarios:,} usuários em {args.diretorio}/ ...")
+    parametros = gerar(args.diretorio, args.usuarios, args.pagamentos_por_usuario, args.duplicados,
+                       args.quase_duplicados, args.sujos, args.semente)
+    totais = parametros['totais']
+    print(f"  ✅ Sistema: {totais['sistema']:,} linhas | Planilha: {totais['planilha']:,} linhas | "
+          f"Pagamentos: {totais['pagamentos']:,} linhas")
+    print(f"  ✅ {totais['duplicados']:,} duplicados, {totais['quase_duplicados']:,} quase duplicados")
+    print(f"  ⏱️  {parametros['segundos']:.2f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
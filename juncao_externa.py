@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Ordenação externa e merge join por email, para fontes maiores que a memória
+
+Cada fonte é despejada em disco como "runs" ordenadas por chave (email
+normalizado) sempre que os registros em memória passam do limite; as runs
+são intercaladas com heapq.merge (estável: empates ficam na ordem de
+chegada) e as fontes ordenadas são percorridas juntas num merge join, uma
+chave por vez. A memória fica limitada pelo limite de despejo mais um lote
+por run durante a intercalação.
+"""
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+from itertools import groupby
+from operator import itemgetter
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Registros gravados por chamada de pickle e runs intercaladas de uma vez
+TAMANHO_LOTE = 512
+MAX_RUNS_POR_INTERCALACAO = 64
+
+_UNIDADES = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+def interpretar_memoria(texto: str) -> int:
+    """'256M', '1G', '512k' ou bytes -> bytes"""
+    valor = texto.strip().upper().rstrip('B')
+    unidade = valor[-1:] if valor[-1:] in _UNIDADES else ''
+    numero = valor[:len(valor) - len(unidade)]
+    try:
+        total = int(float(numero) * _UNIDADES[unidade])
+    except ValueError:
+        raise ValueError(f"tamanho de memória inválido: {texto!r} (use, por exemplo, 256M ou 1G)")
+    if total <= 0:
+        raise ValueError(f"tamanho de memória inválido: {texto!r}")
+    return total
+
+def tamanho_estimado(registro) -> int:
+    """Estimativa barata dos bytes de um registro (dict de textos) em memória"""
+    if isinstance(registro, dict):
+        return 240 + sum(80 + (len(v) if isinstance(v, str) else 8) for v in registro.values())
+    return 200
+
+class OrdenacaoExterna:
+    """Acumula (chave, registro) e devolve tudo ordenado por chave, despejando runs em disco
+
+    Use como gerenciador de contexto para apagar o diretório temporário.
+    """
+
+    def __init__(self, limite_bytes: int, diretorio: Optional[str] = None,
+                 tamanho: Callable[[object], int] = tamanho_estimado):
+        self.limite_bytes = limite_bytes
+        self.tamanho = tamanho
+        self._diretorio_base = diretorio
+        self._diretorio = None
+        self._buffer: List[Tuple[str, object]] = []
+        self._bytes = 0
+        self.runs: List[str] = []
+        self.total = 0
+        self._gravadas = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        if self._diretorio is not None:
+            shutil.rmtree(self._diretorio, ignore_errors=True)
+            self._diretorio = None
+        self._buffer = []
+        self.runs = []
+
+    def adicionar(self, chave: str, registro):
+        self._buffer.append((chave, registro))
+        self._bytes += self.tamanho(registro)
+        self.total += 1
+        if self._bytes >= self.limite_bytes:
+            self._despejar()
+
+    def adicionar_todos(self, pares: Iterable[Tuple[str, object]]):
+        for chave, registro in pares:
+            self.adicionar(chave, registro)
+        return self
+
+    def _novo_arquivo(self) -> str:
+        if self._diretorio is None:
+            self._diretorio = tempfile.mkdtemp(prefix='juncao_externa-', dir=self._diretorio_base)
+        self._gravadas += 1
+        return os.path.join(self._diretorio, f"run-{self._gravadas:06d}.pickle")
+
+    def _gravar_run(self, pares: Iterable[Tuple[str, object]]) -> str:
+        caminho = self._novo_arquivo()
+        with open(caminho, 'wb') as f:
+            lote = []
+            for par in pares:
+                lote.append(par)
+                if len(lote) >= TAMANHO_LOTE:
+                    pickle.dump(lote, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    lote = []
+            if lote:
+                pickle.dump(lote, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return caminho
+
+    def _despejar(self):
+        # sort é estável: registros da mesma chave ficam na ordem de chegada
+        self._buffer.sort(key=itemgetter(0))
+        self.runs.append(self._gravar_run(self._buffer))
+        self._buffer = []
+        self._bytes = 0
+
+    @staticmethod
+    def _ler_run(caminho: str) -> Iterator[Tuple[str, object]]:
+        with open(caminho, 'rb') as f:
+            while True:
+                try:
+                    lote = pickle.load(f)
+                except EOFError:
+                    return
+                yield from lote
+
+    def ordenados(self) -> Iterator[Tuple[str, object]]:
+        """Todos os pares em ordem de chave (empates na ordem de chegada)"""
+        if not self.runs:
+            # Coube na memória: nada foi para o disco
+            self._buffer.sort(key=itemgetter(0))
+            yield from self._buffer
+            return
+
+        if self._buffer:
+            self._despejar()
+        # Intercala em passos para não abrir runs demais ao mesmo tempo
+        # (as primeiras runs viram uma só, no começo, para manter a estabilidade)
+        while len(self.runs) > MAX_RUNS_POR_INTERCALACAO:
+            grupo = self.runs[:MAX_RUNS_POR_INTERCALACAO]
+            intercalado = self._gravar_run(heapq.merge(*map(self._ler_run, grupo), key=itemgetter(0)))
+            self.runs = [intercalado] + self.runs[MAX_RUNS_POR_INTERCALACAO:]
+            for caminho in grupo:
+                os.unlink(caminho)
+        yield from heapq.merge(*map(self._ler_run, self.runs), key=itemgetter(0))
+
+def ultimo_por_chave(pares: Iterable[Tuple[str, object]]) -> Iterator[Tuple[str, object]]:
+    """Em pares ordenados, mantém o último registro de cada chave (como dict[chave] = registro)"""
+    for chave, grupo in groupby(pares, key=itemgetter(0)):
+        for _, registro in grupo:
+            pass
+        yield chave, registro
+
+def acumular_por_chave(pares: Iterable[Tuple[str, object]],
+                       acumular: Callable[[Optional[object], object], object]) -> Iterator[Tuple[str, object]]:
+    """Em pares ordenados, dobra os registros de cada chave com acumular(acumulado, registro)"""
+    for chave, grupo in groupby(pares, key=itemgetter(0)):
+        acumulado = None
+        for _, registro in grupo:
+            acumulado = acumular(acumulado, registro)
+        yield chave, acumulado
+
+def _marcar(fonte: Iterable[Tuple[str, object]], k: int) -> Iterator[Tuple[str, int, object]]:
+    for chave, registro in fonte:
+        yield chave, k, registro
+
+def juntar(fontes: Sequence[Iterable[Tuple[str, object]]]) -> Iterator[Tuple[str, List[Optional[object]]]]:
+    """Merge join de fontes ordenadas e sem chaves repetidas: (chave, [registro ou None por fonte])"""
+    n = len(fontes)
+    marcadas = [_marcar(fonte, k) for k, fonte in enumerate(fontes)]
+    for chave, grupo in groupby(heapq.merge(*marcadas, key=itemgetter(0)), key=itemgetter(0)):
+        registros: List[Optional[object]] = [None] * n
+        for _, k, registro in grupo:
+            registros[k] = registro
+        yield chave, registros
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Métricas por etapa dos scripts (opções --metrics e --profile)
+
+Cada etapa de um main() roda dentro de metricas.etapa('nome'); com as
+métricas ligadas, ela registra tempo de parede, tempo de CPU (do processo
+e dos processos filhos já encerrados, como o pool de leitura), linhas de
+entrada e de saída, linhas por segundo e o pico de memória residente. As
+etapas podem ser aninhadas ('cruzamento/salvar_resultados'). No fim da
+execução tudo vai para um arquivo JSON; com --profile, cada etapa de
+primeiro nível também grava um perfil do cProfile (abrir com pstats ou
+snakeviz).
+
+Desligadas (o padrão), etapa() devolve sempre o mesmo contexto vazio: não
+há medição, perfil nem alocação por etapa.
+
+    with metricas.etapa('consolidacao') as e:
+        usuarios = consolidar(...)
+        e.linhas(entrada=len(registros), saida=len(usuarios))
+"""
+import atexit
+import cProfile
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from saidas import abrir_atomico
+
+class _EtapaNula:
+    """Contexto usado com as métricas desligadas: não mede nada"""
+    ativa = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def linhas(self, entrada: Optional[int] = None, saida: Optional[int] = None):
+        pass
+
+    def anotar(self, **dados):
+        pass
+
+_NULA = _EtapaNula()
+
+def _cpu(quem) -> float:
+    uso = resource.getrusage(quem)
+    return uso.ru_utime + uso.ru_stime
+
+def _pico_mb(quem=resource.RUSAGE_SELF) -> float:
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    pico = resource.getrusage(quem).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+class Etapa:
+    """Uma etapa medida; linhas() e anotar() completam o registro"""
+    ativa = True
+
+    def __init__(self, coletor: 'Coletor', nome: str):
+        self.coletor = coletor
+        self.nome = nome
+        self.registro: Dict = {'nome': nome}
+        self._perfil = None
+
+    def linhas(self, entrada: Optional[int] = None, saida: Optional[int] = None):
+        if entrada is not None:
+            self.registro['linhas_entrada'] = entrada
+        if saida is not None:
+            self.registro['linhas_saida'] = saida
+
+    def anotar(self, **dados):
+        """Campos extras do registro (ex.: tempo de cada fonte lida)"""
+        self.registro.update(dados)
+
+    def __enter__(self):
+        coletor = self.coletor
+        coletor.pilha.append(self)
+        self.registro['nome'] = '/'.join(etapa.nome for etapa in coletor.pilha)
+        if coletor.perfis and len(coletor.pilha) == 1:
+            self._perfil = cProfile.Profile()
+        self._inicio = time.perf_counter()
+        self._cpu = _cpu(resource.RUSAGE_SELF)
+        self._cpu_filhos = _cpu(resource.RUSAGE_CHILDREN)
+        if self._perfil is not None:
+            self._perfil.enable()
+        return self
+
+    def __exit__(self, tipo, *exc):
+        if self._perfil is not None:
+            self._perfil.disable()
+        segundos = time.perf_counter() - self._inicio
+        coletor = self.coletor
+        coletor.pilha.pop()
+
+        registro = self.registro
+        registro['inicio_segundos'] = round(self._inicio - coletor.inicio, 4)
+        registro['segundos'] = round(segundos, 4)
+        registro['cpu_segundos'] = round(_cpu(resource.RUSAGE_SELF) - self._cpu, 4)
+        cpu_filhos = _cpu(resource.RUSAGE_CHILDREN) - self._cpu_filhos
+        if cpu_filhos:
+            registro['cpu_filhos_segundos'] = round(cpu_filhos, 4)
+            registro['pico_memoria_filhos_mb'] = _pico_mb(resource.RUSAGE_CHILDREN)
+        linhas = registro.get('linhas_entrada', registro.get('linhas_saida'))
+        if linhas is not None and segundos > 0:
+            registro['linhas_por_segundo'] = round(linhas / segundos)
+        registro['pico_memoria_mb'] = _pico_mb()
+        if tipo is not None:
+            registro['erro'] = tipo.__name__
+        if self._perfil is not None:
+            os.makedirs(coletor.perfis, exist_ok=True)
+            numero = sum('perfil' in r for r in coletor.registros) + 1
+            caminho = os.path.join(coletor.perfis, f"{coletor.script}-{numero:02d}-{self.nome}.prof")
+            self._perfil.dump_stats(caminho)
+            registro['perfil'] = caminho
+        coletor.registros.append(registro)
+        return False
+
+class Coletor:
+    """Registros das etapas de uma execução"""
+
+    def __init__(self, script: str, arquivo: Optional[str] = None, perfis: Optional[str] = None):
+        self.script = script
+        self.arquivo = arquivo
+        self.perfis = perfis
+        self.inicio = time.perf_counter()
+        self.inicio_data = datetime.now().isoformat(timespec='seconds')
+        self.pilha: List[Etapa] = []
+        self.registros: List[Dict] = []
+
+    def resumo(self) -> Dict:
+        return {
+            'script': self.script,
+            'argv': sys.argv[1:],
+            'inicio': self.inicio_data,
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'total_segundos': round(time.perf_counter() - self.inicio, 4),
+            'cpu_segundos': round(_cpu(resource.RUSAGE_SELF), 4),
+            'pico_memoria_mb': _pico_mb(),
+            'etapas': self.registros,
+        }
+
+_coletor: Optional[Coletor] = None
+
+def configurar(script: str, arquivo: Optional[str] = None, perfis: Optional[str] = None):
+    """Liga as métricas; com arquivo, o JSON é gravado ao fim da execução"""
+    global _coletor
+    _coletor = Coletor(script, arquivo, perfis)
+    if arquivo:
+        atexit.register(salvar, _coletor)
+
+def desligar():
+    global _coletor
+    _coletor = None
+
+def esta_habilitado() -> bool:
+    return _coletor is not None
+
+def etapa(nome: str):
+    """Contexto que mede a etapa (ou não faz nada, com as métricas desligadas)"""
+    if _coletor is None:
+        return _NULA
+    return Etapa(_coletor, nome)
+
+def registros() -> List[Dict]:
+    """Etapas já medidas nesta execução (vazio se desligadas)"""
+    return [] if _coletor is None else list(_coletor.registros)
+
+def salvar(coletor: Optional[Coletor] = None) -> Optional[str]:
+    """Grava o JSON de métricas (chamado na saída do programa); retorna o caminho"""
+    coletor = coletor or _coletor
+    if coletor is None or not coletor.arquivo:
+        return None
+    with abrir_atomico(coletor.arquivo) as f:
+        json.dump(coletor.resumo(), f, ensure_ascii=False, indent=2)
+    print(f"📏 Métricas salvas em: {coletor.arquivo}" +
+          (f" (perfis em {coletor.perfis}/)" if coletor.perfis else ''))
+    return coletor.arquivo
+
+def adicionar_argumentos(parser):
+    """Opções --metrics e --profile comuns aos scripts"""
+    parser.add_argument('--metrics', metavar='ARQUIVO',
+                        help='grava tempo, CPU, linhas e memória de cada etapa neste arquivo JSON')
+    parser.add_argument('--profile', metavar='DIRETORIO',
+                        help='grava um perfil do cProfile por etapa neste diretório (implica métricas)')
+
+def configurar_por_args(args, script: str):
+    """Liga as métricas se --metrics ou --profile foram usados"""
+    if args.metrics or args.profile:
+        configurar(script, args.metrics or os.path.join(args.profile, f"{script}-metricas.json"), args.profile)
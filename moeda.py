@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Valores em reais das planilhas exportadas
+
+A exportação traz valores como ' R$ 289,90 ', ' R$ 1.234,56 ' e ' R$ -   '
+(zero); alguns vêm digitados com ponto decimal ('289.90'). Os valores são
+convertidos para centavos inteiros, sem float, e cada texto distinto é
+convertido uma única vez.
+"""
+from functools import lru_cache
+from typing import Optional
+
+@lru_cache(maxsize=65536)
+def centavos(texto: str) -> Optional[int]:
+    """' R$ 1.234,56 ' -> 123456; ' R$ -   ' -> 0; vazio ou inválido -> None
+
+    O ponto é separador de milhar, exceto quando não há vírgula e há um só
+    ponto seguido de exatamente dois dígitos ('289.90' -> 28990).
+    """
+    valor = texto.strip()
+    negativo = False
+    if valor[:1] == '-':
+        negativo, valor = True, valor[1:].strip()
+    if valor.startswith('R$'):
+        valor = valor[2:].strip()
+    if valor == '-':
+        # Formato contábil: traço é zero
+        return 0
+    if valor[:1] == '(' and valor[-1:] == ')':
+        negativo, valor = True, valor[1:-1].strip()
+    elif valor[:1] == '-':
+        negativo, valor = True, valor[1:].strip()
+    if not valor:
+        return None
+
+    if ',' not in valor and valor.count('.') == 1 and len(valor.partition('.')[2]) == 2:
+        valor = valor.replace('.', ',')
+    inteiro, _, fracao = valor.replace('.', '').partition(',')
+    if not inteiro.isdigit() or len(fracao) > 2 or (fracao and not fracao.isdigit()):
+        return None
+    total = int(inteiro) * 100 + int((fracao + '00')[:2])
+    return -total if negativo else total
+
+def formatar_reais(valor: int) -> str:
+    """123456 -> 'R$ 1.234,56'"""
+    sinal = '-' if valor < 0 else ''
+    inteiro, fracao = divmod(abs(valor), 100)
+    return f"{sinal}R$ {inteiro:,}".replace(',', '.') + f",{fracao:02d}"
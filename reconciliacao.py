@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Reconciliação de N fontes por máscaras de pertinência
+
+Cada fonte é um conjunto de chaves (emails). Uma varredura por fonte liga o
+bit da fonte na máscara de cada email; todas as contagens "somente em",
+"em todas" ou "em um subconjunto" saem do histograma das máscaras (no máximo
+2^N entradas), sem diferenças de conjuntos par a par. Incluir uma quarta
+exportação custa mais uma varredura.
+"""
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+def mascaras_pertinencia(fontes: Sequence[Iterable[str]]) -> Dict[str, int]:
+    """email -> máscara com o bit k ligado se o email está na fonte k"""
+    mascaras: Dict[str, int] = {}
+    for k, fonte in enumerate(fontes):
+        bit = 1 << k
+        atual = mascaras.get
+        for email in fonte:
+            mascaras[email] = atual(email, 0) | bit
+    return mascaras
+
+class Reconciliacao:
+    """Máscaras de pertinência de cada email e o histograma das máscaras"""
+
+    def __init__(self, nomes: Sequence[str], fontes: Sequence[Iterable[str]]):
+        if len(nomes) != len(fontes):
+            raise ValueError(f"{len(nomes)} nomes para {len(fontes)} fontes")
+        self.nomes = tuple(nomes)
+        self.mascaras = mascaras_pertinencia(fontes)
+        self.histograma = Counter(self.mascaras.values())
+        self.todas = (1 << len(self.nomes)) - 1
+
+    @classmethod
+    def de_histograma(cls, nomes: Sequence[str], histograma: Dict[int, int]) -> 'Reconciliacao':
+        """Só as contagens, a partir de um histograma de máscaras já contado (sem a lista de emails)"""
+        reconciliacao = cls(nomes, [()] * len(nomes))
+        reconciliacao.histograma = Counter(histograma)
+        return reconciliacao
+
+    def bits(self, nomes: Iterable[str]) -> int:
+        """Máscara com os bits das fontes informadas"""
+        total = 0
+        for nome in nomes:
+            total |= 1 << self.nomes.index(nome)
+        return total
+
+    def _filtro(self, em: Iterable[str], fora: Iterable[str]) -> Tuple[int, int]:
+        return self.bits(em), self.bits(fora)
+
+    def contar(self, em: Iterable[str] = (), fora: Iterable[str] = ()) -> int:
+        """Emails presentes em todas as fontes de em e em nenhuma de fora (pelo histograma)"""
+        presentes, ausentes = self._filtro(em, fora)
+        return sum(quantidade for mascara, quantidade in self.histograma.items()
+                   if mascara & presentes == presentes and not mascara & ausentes)
+
+    def emails(self, em: Iterable[str] = (), fora: Iterable[str] = ()) -> Iterator[str]:
+        """Emails presentes em todas as fontes de em e em nenhuma de fora"""
+        presentes, ausentes = self._filtro(em, fora)
+        return (email for email, mascara in self.mascaras.items()
+                if mascara & presentes == presentes and not mascara & ausentes)
+
+    def somente(self, nome: str) -> int:
+        return self.histograma[self.bits((nome,))]
+
+    def em_todas(self) -> int:
+        return self.histograma[self.todas]
+
+    def fontes_de(self, mascara: int) -> Tuple[str, ...]:
+        return tuple(nome for k, nome in enumerate(self.nomes) if mascara >> k & 1)
+
+    def combinacoes(self) -> List[Tuple[Tuple[str, ...], int]]:
+        """(fontes, quantidade) de cada combinação presente, da mais comum para a menos comum"""
+        return [(self.fontes_de(mascara), quantidade)
+                for mascara, quantidade in sorted(self.histograma.items(), key=lambda x: (-x[1], x[0]))]
+
+    def __len__(self):
+        return sum(self.histograma.values())
+
+    def imprimir(self):
+        """Imprime a sobreposição das fontes"""
+        print(f"\n🧩 SOBREPOSIÇÃO DAS FONTES ({len(self)} emails únicos)")
+        for nome in self.nomes:
+            print(f"  Somente em {nome}: {self.somente(nome)}")
+        print(f"  Em todas ({len(self.nomes)}): {self.em_todas()}")
+        print(f"  Por combinação:")
+        for fontes, quantidade in self.combinacoes():
+            print(f"    {' + '.join(fontes)}: {quantidade}")
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Registro declarativo das regras de alerta da consolidação
+
+Cada regra declara quais predicados precisa (verdadeiros ou falsos) e, por
+meio deles, as fontes e campos que lê. O registro é compilado num único passo
+de avaliação: os predicados usados são calculados uma vez por usuário e as
+regras viram testes de bits sobre esse resultado.
+
+Para adicionar uma regra basta registrá-la:
+
+    registrar_predicado(Predicado('sem_plano', campo='plano', teste=lambda v: not v))
+    registrar(Regra('SEM_PLANO', 'ℹ️ Sem plano definido', (('no_sistema', True), ('sem_plano', True))))
+"""
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+STATUS_PAGAMENTO_INATIVO = ('Inativo', 'Histórico')
+
+@dataclass(frozen=True)
+class Predicado:
+    """Condição compartilhada: pertinência a uma fonte ou teste sobre um campo consolidado
+
+    sql é a mesma condição como expressão SQL sobre as colunas consolidadas,
+    usada pelo staging em SQLite (staging_sqlite); predicados de fonte não
+    precisam dela.
+    """
+    nome: str
+    fonte: Optional[str] = None
+    campo: Optional[str] = None
+    teste: Optional[Callable] = None
+    sql: Optional[str] = None
+
+    def avaliar(self, usuario) -> bool:
+        if self.fonte is not None:
+            return self.fonte in usuario['fontes']
+        return bool(self.teste(usuario[self.campo]))
+
+@dataclass(frozen=True)
+class Regra:
+    """Alerta + tag gerados quando todas as condições (predicado, esperado) valem"""
+    tag: str
+    alerta: str
+    condicoes: Tuple[Tuple[str, bool], ...]
+
+    @property
+    def predicados(self) -> Tuple[str, ...]:
+        return tuple(nome for nome, _ in self.condicoes)
+
+    @property
+    def fontes(self) -> Tuple[str, ...]:
+        return tuple(PREDICADOS[n].fonte for n in self.predicados if PREDICADOS[n].fonte)
+
+    @property
+    def campos(self) -> Tuple[str, ...]:
+        return tuple(PREDICADOS[n].campo for n in self.predicados if PREDICADOS[n].campo)
+
+PREDICADOS: Dict[str, Predicado] = {}
+REGRAS: List[Regra] = []
+
+def registrar_predicado(predicado: Predicado) -> Predicado:
+    """Adiciona (ou substitui) um predicado no registro"""
+    PREDICADOS[predicado.nome] = predicado
+    return predicado
+
+def registrar(regra: Regra) -> Regra:
+    """Adiciona uma regra ao fim do registro (a ordem define a ordem em alertas_str/tags_str)"""
+    for nome, _ in regra.condicoes:
+        if nome not in PREDICADOS:
+            raise ValueError(f"Regra {regra.tag}: predicado desconhecido '{nome}'")
+    REGRAS.append(regra)
+    return regra
+
+registrar_predicado(Predicado('no_sistema', fonte='SISTEMA'))
+registrar_predicado(Predicado('na_planilha', fonte='PLANILHA'))
+registrar_predicado(Predicado('com_pagamentos', fonte='PAGAMENTOS'))
+registrar_predicado(Predicado('sem_indicador', campo='indicador', teste=lambda v: not v,
+                              sql="indicador = ''"))
+registrar_predicado(Predicado('pagamento_inativo', campo='status_pagamento',
+                              teste=lambda v: v in STATUS_PAGAMENTO_INATIVO,
+                              sql=f"status_pagamento IN ({', '.join(map(repr, STATUS_PAGAMENTO_INATIVO))})"))
+registrar_predicado(Predicado('ativo_sistema', campo='status_sistema', teste=lambda v: v == 'Ativo',
+                              sql="status_sistema = 'Ativo'"))
+
+registrar(Regra('REVISAR_MANUALMENTE', '⚠️ Não está na planilha manual',
+                (('no_sistema', True), ('na_planilha', False))))
+registrar(Regra('SEM_PAGAMENTO', '🔴 SEM PAGAMENTOS REGISTRADOS',
+                (('no_sistema', True), ('com_pagamentos', False))))
+registrar(Regra('FORA_DO_SISTEMA', '❌ Na planilha mas não no sistema',
+                (('no_sistema', False), ('na_planilha', True))))
+registrar(Regra('SEM_INDICADOR', 'ℹ️ Sem indicador definido',
+                (('no_sistema', True), ('sem_indicador', True))))
+registrar(Regra('INATIVO', '⏸️ Pagamentos inativos',
+                (('com_pagamentos', True), ('pagamento_inativo', True))))
+registrar(Regra('DIVERGENCIA_STATUS', '⚠️ DIVERGÊNCIA: Ativo no sistema mas inativo nos pagamentos',
+                (('com_pagamentos', True), ('ativo_sistema', True), ('pagamento_inativo', True))))
+
+class Rotulos:
+    """(alerta, tag) de cada regra, na ordem dos bits do código de regras
+
+    Os usuários consolidados guardam só o código (um int) e uma referência a
+    estes rótulos; as listas e textos são renderizados uma vez por código.
+    """
+    __slots__ = ('pares', '_renderizados')
+
+    def __init__(self, pares: Tuple[Tuple[str, str], ...]):
+        self.pares = pares
+        self._renderizados = {}
+
+    def __reduce__(self):
+        return (Rotulos, (self.pares,))
+
+    def __eq__(self, outro):
+        return isinstance(outro, Rotulos) and self.pares == outro.pares
+
+    def __hash__(self):
+        return hash(self.pares)
+
+    def renderizar(self, codigo: int) -> Tuple[Tuple[str, ...], Tuple[str, ...], str, str]:
+        """(alertas, tags, alertas_str, tags_str) das regras ligadas no código"""
+        resultado = self._renderizados.get(codigo)
+        if resultado is None:
+            ativas = [par for k, par in enumerate(self.pares) if codigo >> k & 1]
+            alertas = tuple(alerta for alerta, _ in ativas)
+            tags = tuple(tag for _, tag in ativas)
+            resultado = (alertas, tags, ' | '.join(alertas), ', '.join(tags))
+            self._renderizados[codigo] = resultado
+        return resultado
+
+@dataclass
+class MotorRegras:
+    """Registro compilado: predicados numerados por bit e cada regra como (exigidos, proibidos)"""
+    regras: Tuple[Regra, ...]
+    medir: bool = False
+    predicados: Tuple[Predicado, ...] = field(init=False)
+    rotulos: Rotulos = field(init=False)
+    _testes: Tuple[Tuple[int, int], ...] = field(init=False)
+    _codigos: Dict[int, int] = field(init=False)
+    _padroes: Counter = field(init=False)
+    _acertos_vetoriais: List[int] = field(init=False)
+    _tempo_predicados: List[int] = field(init=False)
+    _tempo_regras: List[int] = field(init=False)
+
+    def __post_init__(self):
+        nomes = []
+        for regra in self.regras:
+            for nome in regra.predicados:
+                if nome not in nomes:
+                    nomes.append(nome)
+        self.predicados = tuple(PREDICADOS[nome] for nome in nomes)
+        bit = {nome: 1 << i for i, nome in enumerate(nomes)}
+
+        testes = []
+        for regra in self.regras:
+            exigidos = proibidos = 0
+            for nome, esperado in regra.condicoes:
+                if esperado:
+                    exigidos |= bit[nome]
+                else:
+                    proibidos |= bit[nome]
+            testes.append((exigidos, proibidos))
+        self._testes = tuple(testes)
+        self.rotulos = Rotulos(tuple((r.alerta, r.tag) for r in self.regras))
+        self._codigos = {}
+        self._padroes = Counter()
+        self._acertos_vetoriais = [0] * len(self.regras)
+        self._tempo_predicados = [0] * len(self.predicados)
+        self._tempo_regras = [0] * len(self.regras)
+
+    def padrao(self, usuario) -> int:
+        """Avalia cada predicado uma única vez e devolve os resultados como bits"""
+        bits = 0
+        if self.medir:
+            for i, predicado in enumerate(self.predicados):
+                inicio = time.perf_counter_ns()
+                if predicado.avaliar(usuario):
+                    bits |= 1 << i
+                self._tempo_predicados[i] += time.perf_counter_ns() - inicio
+            return bits
+        for i, predicado in enumerate(self.predicados):
+            if predicado.avaliar(usuario):
+                bits |= 1 << i
+        return bits
+
+    def disparadas(self, bits: int) -> int:
+        """Código das regras satisfeitas por um padrão de predicados (bit k = regra k)"""
+        if self.medir:
+            codigo = 0
+            for i, (exigidos, proibidos) in enumerate(self._testes):
+                inicio = time.perf_counter_ns()
+                if bits & exigidos == exigidos and not bits & proibidos:
+                    codigo |= 1 << i
+                self._tempo_regras[i] += time.perf_counter_ns() - inicio
+            return codigo
+
+        codigo = self._codigos.get(bits)
+        if codigo is None:
+            codigo = 0
+            for i, (exigidos, proibidos) in enumerate(self._testes):
+                if bits & exigidos == exigidos and not bits & proibidos:
+                    codigo |= 1 << i
+            self._codigos[bits] = codigo
+        return codigo
+
+    def codigo(self, usuario) -> int:
+        """Código das regras disparadas pelo usuário consolidado"""
+        bits = self.padrao(usuario)
+        self._padroes[bits] += 1
+        return self.disparadas(bits)
+
+    def avaliar(self, usuario) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        """Retorna (alertas, tags) do usuário consolidado, na ordem do registro"""
+        return self.rotulos.renderizar(self.codigo(usuario))[:2]
+
+    def mascaras(self, fontes: Dict[str, int], colunas: Dict[str, Sequence], mascara: Callable,
+                 todos: int) -> List[int]:
+        """Avalia as regras para a base inteira (motor colunar)
+
+        fontes traz a máscara de pertinência de cada fonte e colunas os campos
+        consolidados; mascara converte uma coluna booleana em máscara e todos é
+        a máscara com todos os usuários. Um predicado sobre um campo que não
+        está em colunas (como os de alertas, calculados depois) é um ValueError.
+        """
+        for predicado in self.predicados:
+            if predicado.fonte is None and predicado.campo not in colunas:
+                raise ValueError(f"Predicado '{predicado.nome}': o campo '{predicado.campo}' não está "
+                                 f"disponível no motor colunar (campos: {', '.join(sorted(colunas))})")
+
+        valores = {}
+        for i, predicado in enumerate(self.predicados):
+            inicio = time.perf_counter_ns()
+            if predicado.fonte is not None:
+                valores[predicado.nome] = fontes[predicado.fonte]
+            else:
+                valores[predicado.nome] = mascara(list(map(bool, map(predicado.teste, colunas[predicado.campo]))))
+            self._tempo_predicados[i] += time.perf_counter_ns() - inicio
+
+        resultado = []
+        for i, regra in enumerate(self.regras):
+            inicio = time.perf_counter_ns()
+            m = todos
+            for nome, esperado in regra.condicoes:
+                m &= valores[nome] if esperado else todos ^ valores[nome]
+            resultado.append(m)
+            # Cada usuário ocupa um byte 0/1 na máscara: bit_count() = acertos da regra
+            self._acertos_vetoriais[i] += m.bit_count()
+            self._tempo_regras[i] += time.perf_counter_ns() - inicio
+        return resultado
+
+    def estatisticas(self) -> List[Dict]:
+        """Acertos (e tempo, se medir=True) por regra desde a compilação"""
+        acertos = list(self._acertos_vetoriais)
+        for bits, quantidade in self._padroes.items():
+            for i, (exigidos, proibidos) in enumerate(self._testes):
+                if bits & exigidos == exigidos and not bits & proibidos:
+                    acertos[i] += quantidade
+
+        indice = {p.nome: i for i, p in enumerate(self.predicados)}
+        linhas = []
+        for i, regra in enumerate(self.regras):
+            linha = {
+                'tag': regra.tag,
+                'fontes': regra.fontes,
+                'campos': regra.campos,
+                'acertos': acertos[i],
+            }
+            if self.medir:
+                # Custo da regra = seu teste + os predicados de que depende
+                tempo = self._tempo_regras[i] + sum(self._tempo_predicados[indice[n]] for n in regra.predicados)
+                linha['tempo_ms'] = tempo / 1e6
+            linhas.append(linha)
+        return linhas
+
+def compilar(regras: Optional[Sequence[Regra]] = None, medir: bool = False) -> MotorRegras:
+    """Compila as regras (padrão: o registro inteiro) num motor de avaliação de passo único"""
+    return MotorRegras(tuple(REGRAS if regras is None else regras), medir=medir)
+
+_padrao: Optional[MotorRegras] = None
+
+def motor_padrao() -> MotorRegras:
+    """Motor compilado do registro atual (recompilado se regras forem registradas)"""
+    global _padrao
+    if _padrao is None or _padrao.regras != tuple(REGRAS):
+        _padrao = compilar()
+    return _padrao
@@ -3,17 +3,43 @@
 Script para reorganizar banco de dados de usuários
 Cruza informações de sistema, planilha manual e pagamentos
 """
+import argparse
 import csv
+import functools
+import hashlib
 import json
+import operator
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from collections import defaultdict
 from datetime import datetime
-from typing import Dict, List, Set
-
-def ler_usuarios_sistema(arquivo: str) -> Dict[str, Dict]:
-    """Lê usuários do sistema (Numbers export)"""
-    usuarios = {}
-
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import cache_fontes
+import carga_postgres
+import estado_incremental
+import formato_colunar
+import metricas
+import regras_alerta
+import staging_sqlite
+from agregadores import AgregadorReceita, AgregadorRelatorio
+from datas import IndiceDatas, data_ordinal, mes_de
+from juncao_externa import OrdenacaoExterna, acumular_por_chave, interpretar_memoria, juntar, ultimo_por_chave
+from emails_suspeitos import ARQUIVO_SAIDA as ARQUIVO_EMAILS_SUSPEITOS, gerar_emails_suspeitos
+from exportacao_partes import ExportacaoEmPartes, ler_manifesto
+from moeda import centavos
+from telefones import IndiceTelefones, normalizar_telefone
+from reconciliacao import Reconciliacao
+from saidas import DestinoCsv, abrir_atomico, atributos, multiplexar
+from usuario_consolidado import FONTE_PAGAMENTOS, FONTE_PLANILHA, FONTE_SISTEMA, FONTES, UsuarioConsolidado
+from consolidacao_colunar import consolidar_dados_colunar
+
+# Estado da última consolidação (usado por --incremental; ver estado_incremental)
+ARQUIVO_ESTADO = '.estado_consolidacao.sqlite'
+
+def registros_sistema(arquivo: str) -> Iterator[Tuple[str, Dict]]:
+    """(email, registro) de cada usuário do sistema, na ordem do arquivo"""
     with open(arquivo, 'r', encoding='utf-8', errors='ignore') as f:
         reader = csv.DictReader(f, delimiter=';')
         for row in reader:
@@ -21,7 +47,9 @@ def ler_usuarios_sistema(arquivo: str) -> Dict[str, Dict]:
             if not email or email == 'n/a':
                 continue
 
-            usuarios[email] = {
+            data_criacao = row.get('Data de Criação', '').strip()
+            ultima_atividade = row.get('Última Atividade', '').strip()
+            yield email, {
                 'fonte': 'SISTEMA',
                 'id': row.get('ID', ''),
                 'nome': row.get('Nome', '').strip(),
@@ -29,20 +57,24 @@ def ler_usuarios_sistema(arquivo: str) -> Dict[str, Dict]:
                 'funcao': row.get('Função', '').strip(),
                 'status': row.get('Status', '').strip(),
                 'aprovado': row.get('Aprovado', '').strip(),
-                'data_criacao': row.get('Data de Criação', '').strip(),
-                'ultima_atividade': row.get('Última Atividade', '').strip(),
+                'data_criacao': data_criacao,
+                'ultima_atividade': ultima_atividade,
+                'data_criacao_ord': data_ordinal(data_criacao),
+                'ultima_atividade_ord': data_ordinal(ultima_atividade),
                 'telefone': row.get('Telefone', '').strip(),
+                'telefone_e164': normalizar_telefone(row.get('Telefone', '')),
                 'plano': row.get('Plano de Assinatura', '').strip(),
                 'verificado': row.get('Verificado', '').strip(),
                 'email': email
             }
 
-    return usuarios
-
-def ler_usuarios_planilha(arquivo: str) -> Dict[str, Dict]:
-    """Lê usuários da planilha manual"""
-    usuarios = {}
+@cache_fontes.em_cache
+def ler_usuarios_sistema(arquivo: str) -> Dict[str, Dict]:
+    """Lê usuários do sistema (Numbers export)"""
+    return dict(registros_sistema(arquivo))
 
+def registros_planilha(arquivo: str) -> Iterator[Tuple[str, Dict]]:
+    """(email, registro) de cada usuário da planilha manual, na ordem do arquivo"""
     with open(arquivo, 'r', encoding='utf-8', errors='ignore') as f:
         reader = csv.DictReader(f, delimiter=';')
         for row in reader:
@@ -50,377 +82,838 @@ def ler_usuarios_planilha(arquivo: str) -> Dict[str, Dict]:
             if not email or email == 'aguardando':
                 continue
 
-            usuarios[email] = {
+            yield email, {
                 'fonte': 'PLANILHA',
                 'nome': row.get('NOME_COMPLETO', '').strip(),
                 'telefone': row.get('TELEFONE', '').strip(),
+                'telefone_e164': normalizar_telefone(row.get('TELEFONE', '')),
                 'indicador': row.get('INDICADOR', '').strip(),
                 'obs': row.get('OBS', '').strip(),
                 'email': email
             }
 
-    return usuarios
-
-def ler_pagamentos(arquivo: str) -> tuple[Dict[str, List[Dict]], Dict[str, Dict]]:
-    """Lê histórico de pagamentos e retorna (histórico por usuário, último status)"""
-    pagamentos_por_usuario = defaultdict(list)
-    ultimo_status = {}
-
+@cache_fontes.em_cache
+def ler_usuarios_planilha(arquivo: str) -> Dict[str, Dict]:
+    """Lê usuários da planilha manual"""
+    return dict(registros_planilha(arquivo))
+
+def _montar_pagamento(row: Dict, email: str) -> Dict:
+    """Monta o registro completo de um pagamento a partir da linha do CSV"""
+    data_pagto = row.get('DATA_PAGTO', '').strip()
+    data_venc = row.get('DATA_VENC', '').strip()
+    return {
+        'email': email,
+        'nome': row.get('NOME_COMPLETO', '').strip(),
+        'telefone': row.get('TELEFONE', '').strip(),
+        'indicador': row.get('INDICADOR', '').strip(),
+        'data_pagto': data_pagto,
+        'data_pagto_ord': data_ordinal(data_pagto),
+        'mes_pagto': row.get('MÊS_PAGTO', '').strip(),
+        'data_venc': data_venc,
+        'data_venc_ord': data_ordinal(data_venc),
+        'status': row.get('STATUS', '').strip(),
+        'status_final': row.get('STATUS_FINAL', '').strip(),
+        'dias_para_vencer': row.get('DIAS_PARA_VENCER', '').strip(),
+        'metodo': row.get('MÉTODO', '').strip(),
+        'conta': row.get('CONTA', '').strip(),
+        'valor': row.get('VALOR', '').strip(),
+        'valor_centavos': centavos(row.get('VALOR', '')),
+        'obs': row.get('OBS', '').strip(),
+        'ciclo': row.get('CICLO', '').strip(),
+        'total_ciclos': row.get('TOTAL_CICLOS_USUARIO', '').strip(),
+        'entrou': row.get('ENTROU', '').strip(),
+        'renovou': row.get('RENOVOU', '').strip(),
+        'ativo_atual': row.get('ATIVO_ATUAL', '').strip(),
+        'churn': row.get('CHURN', '').strip(),
+        'regra_tipo': row.get('REGRA_TIPO', '').strip(),
+        'elegivel_comissao': row.get('ELEGÍVEL_COMISSÃO', '').strip(),
+        'comissao_valor': row.get('COMISSÃO_VALOR', '').strip(),
+    }
+
+def _coluna_tolerante(cabecalho: List[str], nome: str) -> str:
+    """Nome real da coluna no cabeçalho, ignorando acentos perdidos na decodificação
+
+    A exportação é lida como utf-8 com errors='ignore', então 'MÊS_PAGTO' chega
+    como 'MS_PAGTO'; a comparação usa só os caracteres ASCII dos dois nomes.
+    """
+    procurado = ''.join(c for c in nome if c.isascii()).upper()
+    for coluna in cabecalho or []:
+        if ''.join(c for c in coluna if c.isascii()).strip().upper() == procurado:
+            return coluna
+    return nome
+
+def linhas_pagamentos(arquivo: str) -> Iterator[Tuple[str, Dict, Tuple]]:
+    """(email, linha do CSV, lançamento) de cada pagamento, na ordem do arquivo
+
+    O lançamento são os argumentos de AgregadorReceita.adicionar: mês (MES_REF,
+    DATA_PAGTO ou MÊS_PAGTO), método, conta, indicador e VALOR e
+    COMISSÃO_VALOR em centavos.
+    """
     with open(arquivo, 'r', encoding='utf-8', errors='ignore') as f:
         reader = csv.DictReader(f, delimiter=';')
+        coluna_mes_pagto = _coluna_tolerante(reader.fieldnames, 'MÊS_PAGTO')
+        coluna_metodo = _coluna_tolerante(reader.fieldnames, 'MÉTODO')
+        coluna_comissao = _coluna_tolerante(reader.fieldnames, 'COMISSÃO_VALOR')
         for row in reader:
             email = row.get('EMAIL_LOGIN', '').strip().lower()
             if not email:
                 continue
 
-            pagamento = {
-                'email': email,
-                'nome': row.get('NOME_COMPLETO', '').strip(),
-                'telefone': row.get('TELEFONE', '').strip(),
-                'indicador': row.get('INDICADOR', '').strip(),
-                'data_pagto': row.get('DATA_PAGTO', '').strip(),
-                'mes_pagto': row.get('MÊS_PAGTO', '').strip(),
-                'data_venc': row.get('DATA_VENC', '').strip(),
-                'status': row.get('STATUS', '').strip(),
-                'status_final': row.get('STATUS_FINAL', '').strip(),
-                'dias_para_vencer': row.get('DIAS_PARA_VENCER', '').strip(),
-                'metodo': row.get('MÉTODO', '').strip(),
-                'conta': row.get('CONTA', '').strip(),
-                'valor': row.get('VALOR', '').strip(),
-                'obs': row.get('OBS', '').strip(),
-                'ciclo': row.get('CICLO', '').strip(),
-                'total_ciclos': row.get('TOTAL_CICLOS_USUARIO', '').strip(),
-                'entrou': row.get('ENTROU', '').strip(),
-                'renovou': row.get('RENOVOU', '').strip(),
-                'ativo_atual': row.get('ATIVO_ATUAL', '').strip(),
-                'churn': row.get('CHURN', '').strip(),
-                'regra_tipo': row.get('REGRA_TIPO', '').strip(),
-                'elegivel_comissao': row.get('ELEGÍVEL_COMISSÃO', '').strip(),
-                'comissao_valor': row.get('COMISSÃO_VALOR', '').strip(),
-            }
+            # Receita: mês de referência, senão o mês do pagamento
+            mes = mes_de(data_ordinal(row.get('MES_REF', '').strip()) or
+                         data_ordinal(row.get('DATA_PAGTO', '').strip()))
+            lancamento = (
+                mes or row.get(coluna_mes_pagto, '').strip(),
+                row.get(coluna_metodo, '').strip(),
+                row.get('CONTA', '').strip(),
+                row.get('INDICADOR', '').strip(),
+                centavos(row.get('VALOR', '')),
+                centavos(row.get(coluna_comissao, ''))
+            )
+            yield email, row, lancamento
+
+# Colunas de uma linha de pagamento lidas por acumular_pagamento
+CAMPOS_RESUMO_PAGAMENTO = ('NOME_COMPLETO', 'TELEFONE', 'INDICADOR', 'STATUS_FINAL', 'DATA_PAGTO',
+                           'DATA_VENC', 'TOTAL_CICLOS_USUARIO')
+
+def acumular_pagamento(resumo: Optional[Dict], row: Dict) -> Dict:
+    """Resumo de um usuário depois de mais uma linha de pagamento
+
+    O último pagamento é o de maior DATA_PAGTO (datas convertidas uma vez para
+    ordinais); empates são decididos pela maior DATA_VENC e, por fim, pelo
+    conteúdo das colunas lidas, então o resultado não depende da ordem das
+    linhas. '_chave_pagto' é de uso interno e sai ao final da leitura.
+    """
+    data_pagto = row.get('DATA_PAGTO', '').strip()
+    data_venc = row.get('DATA_VENC', '').strip()
+    data_pagto_ord = data_ordinal(data_pagto)
+    data_venc_ord = data_ordinal(data_venc)
+    # Datas ausentes ficam abaixo de qualquer data (texto inválido acima de vazio)
+    chave = (
+        data_pagto_ord if data_pagto_ord is not None else (0 if data_pagto else -1),
+        data_venc_ord if data_venc_ord is not None else (0 if data_venc else -1),
+        tuple(row.get(c) or '' for c in CAMPOS_RESUMO_PAGAMENTO)
+    )
 
-            pagamentos_por_usuario[email].append(pagamento)
-
-            # Guardar último status conhecido
-            if email not in ultimo_status or pagamento['data_pagto']:
-                ultimo_status[email] = {
-                    'nome': pagamento['nome'],
-                    'telefone': pagamento['telefone'],
-                    'indicador': pagamento['indicador'],
-                    'status_final': pagamento['status_final'],
-                    'data_ultimo_pagto': pagamento['data_pagto'],
-                    'data_venc': pagamento['data_venc'],
-                    'total_ciclos': pagamento['total_ciclos'],
-                    'total_pagamentos': 0
-                }
+    if resumo is None or chave > resumo['_chave_pagto']:
+        resumo = {
+            'nome': row.get('NOME_COMPLETO', '').strip(),
+            'telefone': row.get('TELEFONE', '').strip(),
+            'telefone_e164': normalizar_telefone(row.get('TELEFONE', '')),
+            'indicador': row.get('INDICADOR', '').strip(),
+            'status_final': row.get('STATUS_FINAL', '').strip(),
+            'data_ultimo_pagto': data_pagto,
+            'data_venc': data_venc,
+            'data_ultimo_pagto_ord': data_pagto_ord,
+            'data_venc_ord': data_venc_ord,
+            'total_ciclos': row.get('TOTAL_CICLOS_USUARIO', '').strip(),
+            'total_pagamentos': resumo['total_pagamentos'] if resumo else 0,
+            '_chave_pagto': chave
+        }
 
     # Contar total de pagamentos
-    for email, pagamentos in pagamentos_por_usuario.items():
-        if email in ultimo_status:
-            ultimo_status[email]['total_pagamentos'] = len(pagamentos)
-
-    return pagamentos_por_usuario, ultimo_status
+    resumo['total_pagamentos'] += 1
+    return resumo
+
+# Histórico normalizado de cada pagamento (exportação em partes): (coluna, tipo do COPY)
+COLUNAS_HISTORICO = (
+    ('email', 'text'), ('nome', 'text'), ('telefone', 'text'), ('indicador', 'text'),
+    ('data_pagto', 'date'), ('mes_pagto', 'text'), ('mes_ref', 'date'), ('data_venc', 'date'),
+    ('status', 'text'), ('status_final', 'text'), ('metodo', 'text'), ('conta', 'text'),
+    ('valor_centavos', 'bigint'), ('ciclo', 'integer'), ('total_ciclos', 'integer'),
+    ('regra_tipo', 'text'), ('regra_valor_centavos', 'bigint'), ('elegivel_comissao', 'boolean'),
+    ('comissao_centavos', 'bigint'), ('obs', 'text'),
+)
+
+def _inteiro_ou_nulo(texto: str) -> Optional[int]:
+    try:
+        return int(texto.strip())
+    except ValueError:
+        return None
+
+def _linha_historico(email: str, row: Dict, lancamento: Tuple, colunas: Dict[str, str]) -> Tuple:
+    """Linha de COLUNAS_HISTORICO (datas em ordinais, valores em centavos, vazios como None)"""
+    _, metodo, conta, indicador, valor, comissao = lancamento
+    return (
+        email,
+        row.get('NOME_COMPLETO', '').strip() or None,
+        row.get('TELEFONE', '').strip() or None,
+        indicador or None,
+        data_ordinal(row.get('DATA_PAGTO', '').strip()),
+        row.get(colunas['MÊS_PAGTO'], '').strip() or None,
+        data_ordinal(row.get('MES_REF', '').strip()),
+        data_ordinal(row.get('DATA_VENC', '').strip()),
+        row.get('STATUS', '').strip() or None,
+        row.get('STATUS_FINAL', '').strip() or None,
+        metodo or None,
+        conta or None,
+        valor,
+        _inteiro_ou_nulo(row.get('CICLO', '')),
+        _inteiro_ou_nulo(row.get('TOTAL_CICLOS_USUARIO', '')),
+        row.get('REGRA_TIPO', '').strip() or None,
+        centavos(row.get('REGRA_VALOR', '')),
+        carga_postgres.booleano(row.get(colunas['ELEGIVEL_COMISSÃO'], '')),
+        comissao,
+        row.get('OBS', '').strip() or None,
+    )
 
-def consolidar_dados(usuarios_sistema, usuarios_planilha, pagamentos_historico, ultimo_status):
-    """Consolida todas as fontes de dados com regras de prioridade"""
+def _linha_carga(email: str, row: Dict, lancamento: Tuple, colunas: Dict[str, str]) -> Optional[Tuple]:
+    """Linha de carga_postgres.COLUNAS_PAGAMENTOS, ou None se o pagamento não entra na carga
+
+    Como src/scripts/importarPagamentos.ts: só entram linhas com valor,
+    método, conta, data de pagamento e tipo de regra (inferido do CICLO se
+    REGRA_TIPO estiver vazio).
+    """
+    _, metodo, conta, _, valor, comissao = lancamento
+    metodo = carga_postgres.metodo_pagamento(metodo)
+    data_pagto = data_ordinal(row.get('DATA_PAGTO', '').strip())
+    regra = carga_postgres.regra_tipo(row.get('REGRA_TIPO', ''), row.get('CICLO', ''))
+    if not (valor and valor > 0 and metodo and conta and data_pagto is not None and regra):
+        return None
+    return (
+        email,
+        data_pagto,
+        row.get(colunas['MÊS_PAGTO'], '').strip(),
+        valor,
+        metodo,
+        conta,
+        regra,
+        centavos(row.get('REGRA_VALOR', '')) or 0,
+        carga_postgres.booleano(row.get(colunas['ELEGIVEL_COMISSÃO'], '')),
+        comissao or None,
+        row.get('OBS', '').strip() or None,
+    )
 
-    # Coletar todos os emails únicos
-    todos_emails = set(usuarios_sistema.keys()) | set(usuarios_planilha.keys()) | set(ultimo_status.keys())
+def _colunas_tolerantes(row: Dict) -> Dict[str, str]:
+    """Nomes reais das colunas com acento que variam entre exportações"""
+    return {nome: _coluna_tolerante(list(row), nome) for nome in ('MÊS_PAGTO', 'ELEGIVEL_COMISSÃO')}
+
+@cache_fontes.em_cache
+def ler_pagamentos(arquivo: str, manter_historico: bool = False,
+                   exportacao: Optional[ExportacaoEmPartes] = None,
+                   carga: Optional[carga_postgres.ArquivoCopy] = None) -> tuple[Dict[str, List[Dict]], Dict[str, Dict],
+                                                                               AgregadorReceita]:
+    """Lê histórico de pagamentos e retorna (histórico por usuário, último status, receita)
+
+    Cada linha é agregada no resumo do usuário durante a leitura (total de
+    pagamentos, último pagamento, ciclos e status; ver acumular_pagamento),
+    sem guardar o histórico: a memória depende do número de usuários, não do
+    número de pagamentos. A receita é contabilizada na mesma leitura.
+    O histórico completo só é montado com manter_historico=True; caso
+    contrário o primeiro item do retorno vem vazio. Com exportacao, cada
+    pagamento normalizado (COLUNAS_HISTORICO) é gravado em partes durante
+    a mesma leitura, e com carga os pagamentos da carga do PostgreSQL
+    (_linha_carga) vão para o arquivo COPY (use ler_pagamentos.sem_cache ou
+    ler_pagamentos_carregando: um acerto do cache não lê o arquivo); quem
+    abriu a exportação ou a carga é quem a fecha.
+    """
+    pagamentos_por_usuario = defaultdict(list)
+    ultimo_status = {}
+    receita = AgregadorReceita()
+    colunas = None
+
+    for email, row, lancamento in linhas_pagamentos(arquivo):
+        receita.adicionar(*lancamento)
+        if colunas is None:
+            colunas = _colunas_tolerantes(row)
+        if exportacao is not None:
+            exportacao.escrever(_linha_historico(email, row, lancamento, colunas))
+        if carga is not None:
+            linha = _linha_carga(email, row, lancamento, colunas)
+            if linha is not None:
+                carga.escrever(linha)
+        if manter_historico:
+            pagamentos_por_usuario[email].append(_montar_pagamento(row, email))
+        ultimo_status[email] = acumular_pagamento(ultimo_status.get(email), row)
+
+    for resumo in ultimo_status.values():
+        del resumo['_chave_pagto']
+
+    return pagamentos_por_usuario, ultimo_status, receita
+
+def ler_pagamentos_carregando(arquivo: str, formato_copy: str = 'texto', exportar: Optional[str] = None,
+                              formato_exportacao: str = 'ndjson', linhas_por_parte: int = 50000):
+    """ler_pagamentos gravando o arquivo COPY de pagamentos na mesma leitura
+
+    Retorna o trio de ler_pagamentos e o total de pagamentos gravados no
+    COPY, ou None quando o trio veio do cache (o arquivo não foi lido, e
+    salvar_script_importacao relê só o que a carga precisa). Com exportar,
+    o histórico também é exportado em partes nesse diretório (opção
+    --exportar-pagamentos), e aí a leitura sempre acontece.
+    """
+    total = None
+
+    def ler():
+        nonlocal total
+        copy = carga_postgres.ArquivoCopy(carga_postgres.ARQUIVOS_COPY[formato_copy][1],
+                                          carga_postgres.COLUNAS_PAGAMENTOS, formato_copy)
+        with copy:
+            if exportar:
+                with ExportacaoEmPartes(exportar, COLUNAS_HISTORICO, 'pagamentos', formato_exportacao,
+                                        linhas_por_parte) as exportacao:
+                    resultado = ler_pagamentos.sem_cache(arquivo, exportacao=exportacao, carga=copy)
+            else:
+                resultado = ler_pagamentos.sem_cache(arquivo, carga=copy)
+        total = copy.total
+        return resultado
+
+    if exportar:
+        resultado = ler()
+    else:
+        resultado, _ = ler_pagamentos.ler_ou_consultar(ler, arquivo)
+    return resultado + (total,)
+
+def _ler_cronometrado(leitor, arquivo: str):
+    """Executa um leitor e devolve (resultado, segundos gastos)"""
+    inicio = time.perf_counter()
+    resultado = leitor(arquivo)
+    return resultado, time.perf_counter() - inicio
+
+def ler_fontes(arquivo_sistema: str, arquivo_planilha: str, arquivo_pagamentos: str, jobs: int = 1,
+               leitor_pagamentos=ler_pagamentos):
+    """Lê as três fontes, em paralelo num pool de processos quando jobs > 1
+
+    Retorna (usuarios_sistema, usuarios_planilha, pagamentos_historico,
+    ultimo_status, receita, total_carga, tempos), com os mesmos dicts das leituras sequenciais e o
+    tempo de cada etapa em segundos (chave 'total' = tempo de parede). total_carga é o total
+    de pagamentos gravados no COPY pelo leitor (ler_pagamentos_carregando), ou None.
+    leitor_pagamentos troca o leitor de pagamentos (por exemplo, um
+    functools.partial de ler_pagamentos_carregando).
+    """
+    tarefas = [
+        ('sistema', ler_usuarios_sistema, arquivo_sistema),
+        ('planilha', ler_usuarios_planilha, arquivo_planilha),
+        ('pagamentos', leitor_pagamentos, arquivo_pagamentos),
+    ]
+    inicio = time.perf_counter()
+    resultados = {}
+    tempos = {}
+
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tarefas)),
+                                 initializer=cache_fontes.configurar,
+                                 initargs=(cache_fontes.esta_habilitado(),)) as pool:
+            futuros = {nome: pool.submit(_ler_cronometrado, leitor, arquivo)
+                       for nome, leitor, arquivo in tarefas}
+            for nome, futuro in futuros.items():
+                resultados[nome], tempos[nome] = futuro.result()
+    else:
+        for nome, leitor, arquivo in tarefas:
+            resultados[nome], tempos[nome] = _ler_cronometrado(leitor, arquivo)
+
+    tempos['total'] = time.perf_counter() - inicio
+    pagamentos_historico, ultimo_status, receita, *carga = resultados['pagamentos']
+    total_carga = carga[0] if carga else None
+    return (resultados['sistema'], resultados['planilha'], pagamentos_historico, ultimo_status, receita,
+            total_carga, tempos)
+
+def reconciliar_fontes(usuarios_sistema, usuarios_planilha, ultimo_status) -> Reconciliacao:
+    """Máscara de fontes de cada email (bits na ordem de FONTES) e o histograma das combinações"""
+    return Reconciliacao(FONTES, (usuarios_sistema, usuarios_planilha, ultimo_status))
+
+def consolidar_usuario(email: str, sys_data, plan_data, pag_data, motor=None) -> UsuarioConsolidado:
+    """Consolida um email a partir do registro de cada fonte (None se ausente)
+
+    Os alertas vêm do motor de regras compilado (padrão: o registro de
+    regras_alerta). Retorna um UsuarioConsolidado, acessível como o dict de antes.
+    """
+    usuario = UsuarioConsolidado(email)
+
+    # Dados do sistema (base)
+    if sys_data is not None:
+        usuario.fontes_bits |= FONTE_SISTEMA
+        usuario.nome = sys_data['nome'] or usuario.nome
+        usuario.telefone = sys_data['telefone'] or usuario.telefone
+        usuario.plano = sys_data['plano']
+        usuario.status_sistema = sys_data['status']
+        usuario.empresa = sys_data['empresa']
+        usuario.funcao = sys_data['funcao']
+        usuario.data_criacao = sys_data['data_criacao']
+        usuario.ultima_atividade = sys_data['ultima_atividade']
+        usuario.data_criacao_ord = sys_data['data_criacao_ord']
+        usuario.ultima_atividade_ord = sys_data['ultima_atividade_ord']
+        usuario.verificado = sys_data['verificado']
+
+    # Dados da planilha manual (prioridade alta para indicador e obs)
+    if plan_data is not None:
+        usuario.fontes_bits |= FONTE_PLANILHA
+        # Nome da planilha tem prioridade (mais detalhado)
+        if plan_data['nome']:
+            usuario.nome = plan_data['nome']
+        # Telefone da planilha tem prioridade (mais formatado)
+        if plan_data['telefone']:
+            usuario.telefone = plan_data['telefone']
+        # Indicador só vem da planilha
+        usuario.indicador = plan_data['indicador']
+        if plan_data['obs']:
+            usuario.obs = plan_data['obs']
+
+    # Dados de pagamentos (prioridade máxima para status financeiro)
+    if pag_data is not None:
+        usuario.fontes_bits |= FONTE_PAGAMENTOS
+        usuario.total_pagamentos = pag_data['total_pagamentos']
+        usuario.total_ciclos = pag_data['total_ciclos']
+        usuario.ultimo_pagamento = pag_data['data_ultimo_pagto']
+        usuario.data_vencimento = pag_data['data_venc']
+        usuario.ultimo_pagamento_ord = pag_data['data_ultimo_pagto_ord']
+        usuario.data_vencimento_ord = pag_data['data_venc_ord']
+        usuario.status_pagamento = pag_data['status_final']
+
+        # Indicador dos pagamentos como fallback
+        if not usuario.indicador and pag_data['indicador']:
+            usuario.indicador = pag_data['indicador']
+
+        # Nome e telefone dos pagamentos como fallback
+        if not usuario.nome and pag_data['nome']:
+            usuario.nome = pag_data['nome']
+        if not usuario.telefone and pag_data['telefone']:
+            usuario.telefone = pag_data['telefone']
+
+    # Gerar alertas automáticos (tags como bits; textos renderizados só na leitura)
+    motor = motor or regras_alerta.motor_padrao()
+    usuario.tags_bits = motor.codigo(usuario)
+    usuario.rotulos = motor.rotulos
+
+    return usuario
+
+def consolidar_dados(usuarios_sistema, usuarios_planilha, pagamentos_historico, ultimo_status, motor=None,
+                     agregador=None):
+    """Consolida todas as fontes de dados com regras de prioridade
+
+    Se um agregador (agregadores.AgregadorRelatorio) for passado, cada usuário
+    é contabilizado assim que é consolidado.
+    """
+    motor = motor or regras_alerta.motor_padrao()
+
+    # Emails únicos com a máscara das fontes em que aparecem (bits de FONTES)
+    mascaras = reconciliar_fontes(usuarios_sistema, usuarios_planilha, ultimo_status).mascaras
 
     usuarios_consolidados = []
-    alertas = []
 
-    for email in sorted(todos_emails):
-        usuario = {
+    for email in sorted(mascaras):
+        fontes = mascaras[email]
+        usuario = consolidar_usuario(
+            email,
+            usuarios_sistema[email] if fontes & FONTE_SISTEMA else None,
+            usuarios_planilha[email] if fontes & FONTE_PLANILHA else None,
+            ultimo_status[email] if fontes & FONTE_PAGAMENTOS else None,
+            motor
+        )
+        usuarios_consolidados.append(usuario)
+        if agregador is not None:
+            agregador.adicionar(usuario)
+
+    return usuarios_consolidados
+
+def _digest(registro: Optional[Dict]) -> Optional[bytes]:
+    """Resumo do registro de um email numa fonte (None se o email não está nela)"""
+    if registro is None:
+        return None
+    return hashlib.blake2b(repr(tuple(registro.values())).encode('utf-8'), digest_size=16).digest()
+
+def versao_incremental(motor) -> str:
+    """Código da consolidação e das regras: mudou, o estado do --incremental é refeito"""
+    return repr((cache_fontes.versao_codigo(consolidar_usuario), cache_fontes.versao_codigo(regras_alerta.compilar),
+                 tuple(r.tag for r in motor.regras)))
+
+def consolidar_dados_incremental(usuarios_sistema, usuarios_planilha, pagamentos_historico, ultimo_status,
+                                 arquivos: Dict[str, str], arquivo_estado: str = ARQUIVO_ESTADO, motor=None,
+                                 agregador=None) -> tuple[List[UsuarioConsolidado], Dict[str, int]]:
+    """Consolida reaproveitando o estado da execução anterior (estado_incremental)
+
+    arquivos dá o caminho de cada fonte ('sistema', 'planilha', 'pagamentos').
+    Só as fontes cujo arquivo mudou têm os digests por email recalculados e
+    comparados com os gravados; só os emails afetados passam de novo pelas
+    regras de mesclagem e alertas, e só as linhas deles são regravadas no
+    estado. Retorna (todos os usuários do estado, em ordem de email; resumo
+    das mudanças).
+    """
+    motor = motor or regras_alerta.motor_padrao()
+    versao = versao_incremental(motor)
+    registros = {'sistema': usuarios_sistema, 'planilha': usuarios_planilha, 'pagamentos': ultimo_status}
+    conexao = estado_incremental.conectar(arquivo_estado)
+    try:
+        reconstruir = estado_incremental.versao_gravada(conexao) != versao
+        alteradas, digitais = estado_incremental.fontes_alteradas(conexao, arquivos, versao)
+
+        afetados = set()
+        for fonte in alteradas:
+            anteriores = {} if reconstruir else estado_incremental.digests(conexao, fonte)
+            for email, registro in registros[fonte].items():
+                if anteriores.pop(email, None) != _digest(registro):
+                    afetados.add(email)
+            # Emails que saíram da fonte
+            afetados.update(anteriores)
+
+        conhecidos = set() if reconstruir else estado_incremental.existentes(conexao, afetados)
+        linhas = []
+        removidos = []
+        resumo = {'novos': 0, 'alterados': 0, 'reaproveitados': 0, 'removidos': 0}
+        for email in sorted(afetados):
+            dados = [registros[fonte].get(email) for fonte in estado_incremental.FONTES]
+            if not any(d is not None for d in dados):
+                removidos.append(email)
+                continue
+            usuario = consolidar_usuario(email, *dados, motor)
+            linhas.append(estado_incremental.linha(usuario, [_digest(d) for d in dados]))
+            resumo['alterados' if email in conhecidos else 'novos'] += 1
+        resumo['removidos'] = len(removidos)
+
+        if alteradas or reconstruir:
+            estado_incremental.aplicar(conexao, linhas, removidos, digitais, versao, reconstruir)
+        usuarios_consolidados = estado_incremental.usuarios(conexao, motor)
+    finally:
+        conexao.close()
+
+    resumo['reaproveitados'] = len(usuarios_consolidados) - resumo['novos'] - resumo['alterados']
+    if agregador is not None:
+        agregador.adicionar_todos(usuarios_consolidados)
+    return usuarios_consolidados, resumo
+
+def _resumos_para_despejo(arquivo_pagamentos: str, receita: Optional[AgregadorReceita]):
+    """(email, colunas lidas por acumular_pagamento) de cada pagamento, contabilizando a receita"""
+    for email, row, lancamento in linhas_pagamentos(arquivo_pagamentos):
+        if receita is not None:
+            receita.adicionar(*lancamento)
+        yield email, {c: row.get(c, '') for c in CAMPOS_RESUMO_PAGAMENTO}
+
+def _sem_chave_interna(pares):
+    for email, resumo in pares:
+        del resumo['_chave_pagto']
+        yield email, resumo
+
+def consolidar_fora_da_memoria(arquivo_sistema: str, arquivo_planilha: str, arquivo_pagamentos: str,
+                               limite_bytes: int, motor=None, receita: Optional[AgregadorReceita] = None,
+                               diretorio: Optional[str] = None) -> Iterator[UsuarioConsolidado]:
+    """Gera os mesmos usuários de consolidar_dados, em ordem de email, sem carregar as fontes em dicts
+
+    Cada fonte é despejada em runs ordenadas por email (juncao_externa), com
+    o limite de memória dividido entre as três; as runs são intercaladas e
+    as fontes percorridas juntas num merge join. Registros repetidos do
+    sistema e da planilha ficam com o último (como nos dicts), e as linhas
+    de pagamento de cada email são dobradas por acumular_pagamento. A
+    receita, se pedida, é contabilizada durante o despejo dos pagamentos.
+    """
+    motor = motor or regras_alerta.motor_padrao()
+    limite = max(1, limite_bytes // 3)
+    ordenacoes = []
+    try:
+        for pares in (registros_sistema(arquivo_sistema),
+                      registros_planilha(arquivo_planilha),
+                      _resumos_para_despejo(arquivo_pagamentos, receita)):
+            ordenacoes.append(OrdenacaoExterna(limite, diretorio).adicionar_todos(pares))
+
+        sistema, planilha, pagamentos = (o.ordenados() for o in ordenacoes)
+        fontes = (ultimo_por_chave(sistema), ultimo_por_chave(planilha),
+                  _sem_chave_interna(acumular_por_chave(pagamentos, acumular_pagamento)))
+        for email, (sys_data, plan_data, pag_data) in juntar(fontes):
+            yield consolidar_usuario(email, sys_data, plan_data, pag_data, motor)
+    finally:
+        for ordenacao in ordenacoes:
+            ordenacao.fechar()
+
+def processar_fora_da_memoria(arquivo_sistema: str, arquivo_planilha: str, arquivo_pagamentos: str,
+                              limite_bytes: int, motor=None, formato_copy: str = 'texto',
+                              arquivo_colunar: Optional[str] = None):
+    """Consolida e grava as saídas em fluxo, com memória limitada (opção --max-memory)
+
+    Relatório, receita, sobreposição das fontes, base_consolidada.csv,
+    usuarios_para_revisar.csv e a carga do PostgreSQL são alimentados
+    usuário a usuário. Saídas que precisam da base inteira em memória
+    (telefones compartilhados, emails suspeitos, --vencendo) ficam de fora.
+    """
+    relatorio = AgregadorRelatorio()
+    receita = AgregadorReceita()
+    histograma = defaultdict(int)
+    inicio = time.perf_counter()
+
+    def acompanhar(usuarios):
+        for u in usuarios:
+            relatorio.adicionar(u)
+            histograma[u.fontes_bits] += 1
+            yield u
+
+    print(f"\n🔄 Consolidando fora da memória (limite de {limite_bytes:,} bytes para os registros)...")
+    print(f"\n💾 Salvando arquivos de saída...")
+    salvar_saidas(acompanhar(consolidar_fora_da_memoria(
+        arquivo_sistema, arquivo_planilha, arquivo_pagamentos, limite_bytes, motor, receita)),
+        arquivo_pagamentos, formato_copy, arquivo_colunar=arquivo_colunar)
+    print(f"  ⏱️  Consolidação em fluxo: {time.perf_counter() - inicio:.2f}s")
+
+    Reconciliacao.de_histograma(FONTES, histograma).imprimir()
+    relatorio.imprimir()
+    receita.imprimir()
+    print(f"\nℹ️  Com --max-memory, telefones compartilhados, emails suspeitos e --vencendo não são gerados")
+
+def _pagamentos_para_staging(arquivo_pagamentos: str, ultimo_status: Dict[str, Dict]) -> Iterator[Dict]:
+    """Linhas de pagamento nas colunas do staging, acumulando o último status de cada email"""
+    for email, row, (mes, metodo, conta, indicador, valor, comissao) in linhas_pagamentos(arquivo_pagamentos):
+        ultimo_status[email] = acumular_pagamento(ultimo_status.get(email), row)
+        data_pagto = row.get('DATA_PAGTO', '').strip()
+        data_venc = row.get('DATA_VENC', '').strip()
+        yield {
             'email': email,
-            'nome': '',
-            'telefone': '',
-            'indicador': '',
-            'plano': '',
-            'status_sistema': '',
-            'empresa': '',
-            'funcao': '',
-            'data_criacao': '',
-            'ultima_atividade': '',
-            'verificado': '',
-            'tem_pagamentos': 'NÃO',
-            'total_pagamentos': 0,
-            'total_ciclos': 0,
-            'ultimo_pagamento': '',
-            'data_vencimento': '',
-            'status_pagamento': '',
-            'obs': '',
-            'alertas': [],
-            'tags': [],
-            'fontes': []
+            'nome': row.get('NOME_COMPLETO', '').strip(),
+            'indicador': indicador,
+            'status_final': row.get('STATUS_FINAL', '').strip(),
+            'data_pagto': data_pagto,
+            'data_pagto_ord': data_ordinal(data_pagto),
+            'data_venc': data_venc,
+            'data_venc_ord': data_ordinal(data_venc),
+            'mes': mes,
+            'metodo': metodo,
+            'conta': conta,
+            'valor_centavos': valor,
+            'comissao_centavos': comissao,
         }
 
-        # Dados do sistema (base)
-        if email in usuarios_sistema:
-            sys_data = usuarios_sistema[email]
-            usuario['fontes'].append('SISTEMA')
-            usuario['nome'] = sys_data['nome'] or usuario['nome']
-            usuario['telefone'] = sys_data['telefone'] or usuario['telefone']
-            usuario['plano'] = sys_data['plano']
-            usuario['status_sistema'] = sys_data['status']
-            usuario['empresa'] = sys_data['empresa']
-            usuario['funcao'] = sys_data['funcao']
-            usuario['data_criacao'] = sys_data['data_criacao']
-            usuario['ultima_atividade'] = sys_data['ultima_atividade']
-            usuario['verificado'] = sys_data['verificado']
-
-        # Dados da planilha manual (prioridade alta para indicador e obs)
-        if email in usuarios_planilha:
-            plan_data = usuarios_planilha[email]
-            usuario['fontes'].append('PLANILHA')
-            # Nome da planilha tem prioridade (mais detalhado)
-            if plan_data['nome']:
-                usuario['nome'] = plan_data['nome']
-            # Telefone da planilha tem prioridade (mais formatado)
-            if plan_data['telefone']:
-                usuario['telefone'] = plan_data['telefone']
-            # Indicador só vem da planilha
-            usuario['indicador'] = plan_data['indicador']
-            if plan_data['obs']:
-                usuario['obs'] = plan_data['obs']
-
-        # Dados de pagamentos (prioridade máxima para status financeiro)
-        if email in ultimo_status:
-            pag_data = ultimo_status[email]
-            usuario['fontes'].append('PAGAMENTOS')
-            usuario['tem_pagamentos'] = 'SIM'
-            usuario['total_pagamentos'] = pag_data['total_pagamentos']
-            usuario['total_ciclos'] = pag_data['total_ciclos']
-            usuario['ultimo_pagamento'] = pag_data['data_ultimo_pagto']
-            usuario['data_vencimento'] = pag_data['data_venc']
-            usuario['status_pagamento'] = pag_data['status_final']
-
-            # Indicador dos pagamentos como fallback
-            if not usuario['indicador'] and pag_data['indicador']:
-                usuario['indicador'] = pag_data['indicador']
-
-            # Nome e telefone dos pagamentos como fallback
-            if not usuario['nome'] and pag_data['nome']:
-                usuario['nome'] = pag_data['nome']
-            if not usuario['telefone'] and pag_data['telefone']:
-                usuario['telefone'] = pag_data['telefone']
-
-        # Gerar alertas automáticos
-        if email in usuarios_sistema and email not in usuarios_planilha:
-            usuario['alertas'].append('⚠️ Não está na planilha manual')
-            usuario['tags'].append('REVISAR_MANUALMENTE')
-
-        if email in usuarios_sistema and email not in ultimo_status:
-            usuario['alertas'].append('🔴 SEM PAGAMENTOS REGISTRADOS')
-            usuario['tags'].append('SEM_PAGAMENTO')
-
-        if email not in usuarios_sistema and email in usuarios_planilha:
-            usuario['alertas'].append('❌ Na planilha mas não no sistema')
-            usuario['tags'].append('FORA_DO_SISTEMA')
-
-        if email in usuarios_sistema and not usuario['indicador']:
-            usuario['alertas'].append('ℹ️ Sem indicador definido')
-            usuario['tags'].append('SEM_INDICADOR')
-
-        if email in ultimo_status and usuario['status_pagamento'] in ['Inativo', 'Histórico']:
-            usuario['alertas'].append('⏸️ Pagamentos inativos')
-            usuario['tags'].append('INATIVO')
-
-        if email in ultimo_status and usuario['status_sistema'] == 'Ativo' and usuario['status_pagamento'] in ['Inativo', 'Histórico']:
-            usuario['alertas'].append('⚠️ DIVERGÊNCIA: Ativo no sistema mas inativo nos pagamentos')
-            usuario['tags'].append('DIVERGENCIA_STATUS')
-
-        # Converter listas para strings
-        usuario['alertas_str'] = ' | '.join(usuario['alertas'])
-        usuario['tags_str'] = ', '.join(usuario['tags'])
-        usuario['fontes_str'] = ', '.join(usuario['fontes'])
+def _resumos_para_staging(ultimo_status: Dict[str, Dict]) -> Iterator[Dict]:
+    # Gerador: só começa depois que as linhas de pagamento preencheram ultimo_status
+    for email, resumo in ultimo_status.items():
+        yield dict(resumo, email=email)
 
-        usuarios_consolidados.append(usuario)
+def carregar_staging(conexao, arquivo_sistema: str, arquivo_planilha: str, arquivo_pagamentos: str,
+                     digitais: Dict) -> Dict[str, int]:
+    """Grava as três fontes no staging SQLite numa leitura de cada arquivo"""
+    ultimo_status = {}
+    return staging_sqlite.carregar(
+        conexao,
+        (registro for _, registro in registros_sistema(arquivo_sistema)),
+        (registro for _, registro in registros_planilha(arquivo_planilha)),
+        _pagamentos_para_staging(arquivo_pagamentos, ultimo_status),
+        _resumos_para_staging(ultimo_status),
+        digitais
+    )
 
-    return usuarios_consolidados
+def consolidar_em_sqlite(caminho: str, arquivo_sistema: str, arquivo_planilha: str, arquivo_pagamentos: str,
+                         motor=None):
+    """Leitura e consolidação pelo staging SQLite (opção --sqlite)
+
+    As fontes só são regravadas no staging se algum arquivo mudou (ou com
+    --no-cache); a consolidação, as regras de alerta, a sobreposição das
+    fontes, os telefones compartilhados e a receita saem de consultas
+    indexadas. Retorna (usuários, relatório, receita, telefones compartilhados).
+    """
+    motor = motor or regras_alerta.motor_padrao()
+    conexao = staging_sqlite.conectar(caminho)
+    try:
+        inicio = time.perf_counter()
+        digitais = {nome: (arquivo, cache_fontes.hash_conteudo(arquivo)) for nome, arquivo in
+                    (('sistema', arquivo_sistema), ('planilha', arquivo_planilha), ('pagamentos', arquivo_pagamentos))}
+        # O código que normaliza as linhas também faz parte da carga: mudou, recarrega
+        digitais['codigo'] = (os.path.basename(__file__), cache_fontes.versao_codigo(carregar_staging))
+        reaproveitado = cache_fontes.esta_habilitado() and staging_sqlite.fontes_atualizadas(conexao, digitais)
+        if not reaproveitado:
+            carregar_staging(conexao, arquivo_sistema, arquivo_planilha, arquivo_pagamentos, digitais)
+
+        contagens = conexao.execute(
+            'SELECT (SELECT COUNT(*) FROM sistema), (SELECT COUNT(*) FROM planilha), '
+            '(SELECT COUNT(*) FROM resumo_pagamentos), (SELECT COUNT(*) FROM pagamentos)').fetchone()
+        print(f"  - Sistema: {arquivo_sistema}")
+        print(f"    ✅ {contagens[0]} usuários")
+        print(f"  - Planilha: {arquivo_planilha}")
+        print(f"    ✅ {contagens[1]} usuários")
+        print(f"  - Pagamentos: {arquivo_pagamentos}")
+        print(f"    ✅ {contagens[2]} usuários com pagamentos")
+        print(f"    ✅ {contagens[3]} registros de pagamento")
+        print(f"  ⏱️  Leitura: {'staging reaproveitado' if reaproveitado else 'carga no staging'} "
+              f"{time.perf_counter() - inicio:.2f}s ({caminho})")
+        Reconciliacao.de_histograma(FONTES, staging_sqlite.combinacoes_fontes(conexao)).imprimir()
+
+        print(f"\n🔄 Consolidando dados...")
+        staging_sqlite.consolidar(conexao, motor)
+        usuarios_consolidados = staging_sqlite.usuarios(conexao, motor)
+        relatorio = AgregadorRelatorio().adicionar_todos(usuarios_consolidados)
+        receita = AgregadorReceita()
+        for lancamento in staging_sqlite.lancamentos(conexao):
+            receita.adicionar(*lancamento)
+        return usuarios_consolidados, relatorio, receita, staging_sqlite.telefones_compartilhados(conexao)
+    finally:
+        conexao.close()
 
 def gerar_relatorio_analise(usuarios_consolidados):
     """Gera relatório de análise dos dados"""
+    AgregadorRelatorio().adicionar_todos(usuarios_consolidados).imprimir()
 
-    print("\n" + "="*100)
-    print("📊 RELATÓRIO DE ANÁLISE - REORGANIZAÇÃO DO BANCO DE DADOS")
-    print("="*100)
-
-    # Estatísticas gerais
-    total = len(usuarios_consolidados)
-    com_pagamento = sum(1 for u in usuarios_consolidados if u['tem_pagamentos'] == 'SIM')
-    sem_pagamento = total - com_pagamento
-    com_indicador = sum(1 for u in usuarios_consolidados if u['indicador'])
-    sem_indicador = total - com_indicador
-    com_alertas = sum(1 for u in usuarios_consolidados if u['alertas'])
-
-    print(f"\n📈 ESTATÍSTICAS GERAIS")
-    print(f"  Total de usuários únicos: {total}")
-    print(f"  Com pagamentos: {com_pagamento} ({com_pagamento/total*100:.1f}%)")
-    print(f"  Sem pagamentos: {sem_pagamento} ({sem_pagamento/total*100:.1f}%)")
-    print(f"  Com indicador: {com_indicador} ({com_indicador/total*100:.1f}%)")
-    print(f"  Sem indicador: {sem_indicador} ({sem_indicador/total*100:.1f}%)")
-    print(f"  Com alertas: {com_alertas} ({com_alertas/total*100:.1f}%)")
-
-    # Contar por fonte
-    por_fonte = defaultdict(int)
-    for u in usuarios_consolidados:
-        for fonte in u['fontes']:
-            por_fonte[fonte] += 1
-
-    print(f"\n📁 USUÁRIOS POR FONTE")
-    for fonte, count in sorted(por_fonte.items(), key=lambda x: x[1], reverse=True):
-        print(f"  {fonte}: {count} usuários")
-
-    # Distribuição de planos
-    planos = defaultdict(int)
-    for u in usuarios_consolidados:
-        if u['plano']:
-            planos[u['plano']] += 1
-
-    if planos:
-        print(f"\n📋 DISTRIBUIÇÃO POR PLANO")
-        for plano, count in sorted(planos.items(), key=lambda x: x[1], reverse=True):
-            print(f"  {plano}: {count} usuários ({count/total*100:.1f}%)")
-
-    # Top indicadores
-    indicadores = defaultdict(int)
-    for u in usuarios_consolidados:
-        if u['indicador']:
-            indicadores[u['indicador']] += 1
-
-    if indicadores:
-        print(f"\n👥 TOP 10 INDICADORES")
-        for indicador, count in sorted(indicadores.items(), key=lambda x: x[1], reverse=True)[:10]:
-            print(f"  {indicador}: {count} usuários")
-
-    # Tipos de alertas
-    tipos_alertas = defaultdict(int)
-    for u in usuarios_consolidados:
-        for alerta in u['alertas']:
-            tipos_alertas[alerta] += 1
-
-    if tipos_alertas:
-        print(f"\n⚠️  ALERTAS GERADOS")
-        for alerta, count in sorted(tipos_alertas.items(), key=lambda x: x[1], reverse=True):
-            print(f"  {alerta}: {count} usuários")
-
-    # Tags
-    tags = defaultdict(int)
-    for u in usuarios_consolidados:
-        for tag in u['tags']:
-            tags[tag] += 1
-
-    if tags:
-        print(f"\n🏷️  TAGS ATRIBUÍDAS")
-        for tag, count in sorted(tags.items(), key=lambda x: x[1], reverse=True):
-            print(f"  {tag}: {count} usuários")
-
-    # Usuários críticos (sem pagamento no sistema)
-    usuarios_criticos = [u for u in usuarios_consolidados if u['tem_pagamentos'] == 'NÃO' and 'SISTEMA' in u['fontes']]
-
-    if usuarios_criticos:
-        print(f"\n🔴 USUÁRIOS CRÍTICOS (NO SISTEMA SEM PAGAMENTOS) - {len(usuarios_criticos)} usuários")
-        print("  Primeiros 20:")
-        for i, u in enumerate(usuarios_criticos[:20], 1):
-            print(f"  {i}. {u['email']} - {u['nome']} - Plano: {u['plano']}")
-        if len(usuarios_criticos) > 20:
-            print(f"  ... e mais {len(usuarios_criticos) - 20} usuários")
-
-    # Divergências de status
-    divergencias = [u for u in usuarios_consolidados if 'DIVERGENCIA_STATUS' in u['tags']]
-
-    if divergencias:
-        print(f"\n⚠️  DIVERGÊNCIAS DE STATUS - {len(divergencias)} usuários")
-        print("  Primeiros 20:")
-        for i, u in enumerate(divergencias[:20], 1):
-            print(f"  {i}. {u['email']} - Sistema: {u['status_sistema']} | Pagamento: {u['status_pagamento']}")
-        if len(divergencias) > 20:
-            print(f"  ... e mais {len(divergencias) - 20} usuários")
-
-    print("\n" + "="*100)
-
-def salvar_base_consolidada(usuarios_consolidados, arquivo='base_consolidada.csv'):
-    """Salva base de dados consolidada"""
-
-    campos = [
-        'email', 'nome', 'telefone', 'indicador', 'plano',
-        'status_sistema', 'empresa', 'funcao', 'verificado',
-        'tem_pagamentos', 'total_pagamentos', 'total_ciclos',
-        'ultimo_pagamento', 'data_vencimento', 'status_pagamento',
-        'data_criacao', 'ultima_atividade',
-        'obs', 'alertas_str', 'tags_str', 'fontes_str'
-    ]
+def listar_vencimentos(usuarios_consolidados, inicio: str, fim: str, limite: int = 20):
+    """Lista usuários com data de vencimento no intervalo (datas já tipadas na leitura)"""
+    if data_ordinal(inicio) is None or data_ordinal(fim) is None:
+        print(f"\n❌ Datas inválidas para --vencendo: {inicio} {fim} (use dd/mm/aaaa)")
+        return
 
-    with open(arquivo, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=campos, extrasaction='ignore')
-        writer.writeheader()
-        writer.writerows(usuarios_consolidados)
-
-    print(f"\n💾 Base consolidada salva em: {arquivo}")
-
-def gerar_script_importacao(usuarios_consolidados):
-    """Gera script para importação no banco"""
-
-    script_lines = []
-    script_lines.append("-- Script de importação para banco de dados")
-    script_lines.append(f"-- Gerado em: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    script_lines.append(f"-- Total de usuários: {len(usuarios_consolidados)}")
-    script_lines.append("")
-    script_lines.append("-- PASSO 1: BACKUP DO BANCO ATUAL")
-    script_lines.append("-- Faça um backup completo antes de executar este script!")
-    script_lines.append("")
-    script_lines.append("-- PASSO 2: LIMPEZA (OPCIONAL - USE COM CUIDADO)")
-    script_lines.append("-- DELETE FROM usuarios WHERE TRUE;")
-    script_lines.append("-- DELETE FROM pagamentos WHERE TRUE;")
-    script_lines.append("")
-    script_lines.append("-- PASSO 3: IMPORTAR USUÁRIOS CONSOLIDADOS")
-    script_lines.append("-- Use o arquivo base_consolidada.csv para importar via:")
-    script_lines.append("-- 1. Interface web de importação do sistema")
-    script_lines.append("-- 2. Comando SQL COPY (PostgreSQL)")
-    script_lines.append("-- 3. Script de importação TypeScript/Prisma")
-    script_lines.append("")
-    script_lines.append("-- Exemplo PostgreSQL:")
-    script_lines.append("-- \\COPY usuarios FROM 'base_consolidada.csv' WITH CSV HEADER DELIMITER ',';")
-    script_lines.append("")
-
-    # Estatísticas para o script
+    por_email = {u['email']: u for u in usuarios_consolidados}
+    indice = IndiceDatas.de_registros(usuarios_consolidados, 'data_vencimento_ord')
+    emails = indice.entre(inicio, fim)
+
+    print(f"\n📅 VENCIMENTOS ENTRE {inicio} E {fim} - {len(emails)} usuários")
+    for i, email in enumerate(emails[:limite], 1):
+        u = por_email[email]
+        print(f"  {i}. {u['data_vencimento']} - {email} - {u['nome']} - Status: {u['status_pagamento']}")
+    if len(emails) > limite:
+        print(f"  ... e mais {len(emails) - limite} usuários")
+
+CAMPOS_BASE = [
+    'email', 'nome', 'telefone', 'indicador', 'plano',
+    'status_sistema', 'empresa', 'funcao', 'verificado',
+    'tem_pagamentos', 'total_pagamentos', 'total_ciclos',
+    'ultimo_pagamento', 'data_vencimento', 'status_pagamento',
+    'data_criacao', 'ultima_atividade',
+    'obs', 'alertas_str', 'tags_str', 'fontes_str'
+]
+
+CAMPOS_REVISAR = ['email', 'nome', 'plano', 'tem_pagamentos', 'indicador', 'alertas_str', 'tags_str', 'obs']
+
+def arquivos_de_saida(formato_copy: str = 'texto', arquivo_colunar: Optional[str] = None) -> List[str]:
+    """Arquivos gravados a partir da base consolidada (conferidos pelo --incremental antes de pular tudo)"""
+    saidas = ['base_consolidada.csv', 'usuarios_para_revisar.csv', *carga_postgres.ARQUIVOS_COPY[formato_copy],
+              carga_postgres.ARQUIVO_SCRIPT, ARQUIVO_EMAILS_SUSPEITOS]
+    if arquivo_colunar:
+        saidas.append(arquivo_colunar)
+    return saidas
+
+def salvar_saidas(usuarios_consolidados, arquivo_pagamentos: str, formato_copy: str = 'texto',
+                  arquivo='base_consolidada.csv', arquivo_colunar: Optional[str] = None,
+                  total_carga: Optional[int] = None):
+    """Salva a base consolidada, a carga do PostgreSQL e a lista de usuários para revisar
+
+    Os usuários (já em ordem de email) passam uma única vez e cada um vai
+    para todos os arquivos a que pertence; aceita um gerador, então a
+    consolidação em fluxo usa a mesma função. Com arquivo_colunar a base
+    também é gravada no formato colunar (formato_colunar). total_carga indica
+    que o COPY de pagamentos já foi gravado na leitura (ler_pagamentos_carregando).
+    """
     por_plano = defaultdict(int)
-    por_status = defaultdict(int)
-    for u in usuarios_consolidados:
-        por_plano[u['plano'] or 'SEM_PLANO'] += 1
-        por_status[u['status_sistema'] or 'SEM_STATUS'] += 1
 
-    script_lines.append("-- ESTATÍSTICAS DA IMPORTAÇÃO:")
-    script_lines.append(f"-- Total de usuários: {len(usuarios_consolidados)}")
-    for plano, count in sorted(por_plano.items(), key=lambda x: x[1], reverse=True):
-        script_lines.append(f"--   {plano}: {count}")
-    script_lines.append("")
-
-    with open('script_importacao.sql', 'w', encoding='utf-8') as f:
-        f.write('\n'.join(script_lines))
-
-    print(f"💾 Script de importação salvo em: script_importacao.sql")
-
-def gerar_usuarios_para_revisar(usuarios_consolidados):
-    """Gera lista de usuários que precisam de revisão manual"""
-
-    para_revisar = [u for u in usuarios_consolidados if u['alertas']]
-
-    if not para_revisar:
+    def contar_planos(usuarios):
+        for u in usuarios:
+            por_plano[u.plano or 'SEM_PLANO'] += 1
+            yield u
+
+    destinos = [
+        DestinoCsv(arquivo, CAMPOS_BASE, atributos(CAMPOS_BASE)),
+        carga_postgres.DestinoCopy(carga_postgres.ARQUIVOS_COPY[formato_copy][0], carga_postgres.COLUNAS_USUARIOS,
+                                   formato_copy, carga_postgres.linha_usuario),
+        DestinoCsv('usuarios_para_revisar.csv', CAMPOS_REVISAR, atributos(CAMPOS_REVISAR),
+                   filtro=operator.attrgetter('tags_bits'), sempre=False),
+    ]
+    if arquivo_colunar:
+        destinos.append(formato_colunar.DestinoColunar(arquivo_colunar))
+    base, copy, revisar, *colunar = multiplexar(contar_planos(usuarios_consolidados), destinos)
+
+    print(f"\n💾 Base consolidada salva em: {base.caminho}")
+    for destino in colunar:
+        print(f"💾 Base colunar salva em: {destino.caminho} ({destino.total} linhas)")
+    salvar_script_importacao(copy.total, por_plano, arquivo_pagamentos, formato_copy, total_carga)
+    if not revisar.total:
         print("\n✅ Nenhum usuário necessita revisão manual!")
+    else:
+        print(f"\n📝 Lista de usuários para revisar salva em: {revisar.caminho}")
+        print(f"   Total: {revisar.total} usuários")
+
+def pagamentos_para_carga(arquivo: str) -> Iterator[Tuple]:
+    """Pagamentos nas colunas de carga_postgres.COLUNAS_PAGAMENTOS (ver _linha_carga)
+
+    Releitura usada quando a carga não foi gravada na leitura dos pagamentos
+    (acerto do cache, --max-memory e --sqlite).
+    """
+    colunas = None
+    for email, row, lancamento in linhas_pagamentos(arquivo):
+        if colunas is None:
+            colunas = _colunas_tolerantes(row)
+        linha = _linha_carga(email, row, lancamento, colunas)
+        if linha is not None:
+            yield linha
+
+def salvar_script_importacao(total: int, por_plano: Dict[str, int], arquivo_pagamentos: str,
+                             formato: str = 'texto', total_carga: Optional[int] = None):
+    """Grava o arquivo COPY de pagamentos e script_importacao.sql (staging + merge no PostgreSQL)
+
+    O arquivo COPY de usuários já deve ter sido gravado (total linhas). Com
+    total_carga, o de pagamentos também já foi, na leitura dos pagamentos.
+    """
+    arquivo_usuarios, arquivo_copy_pagamentos = carga_postgres.ARQUIVOS_COPY[formato]
+    if total_carga is None:
+        with carga_postgres.ArquivoCopy(arquivo_copy_pagamentos, carga_postgres.COLUNAS_PAGAMENTOS,
+                                        formato) as copy:
+            copy.escrever_todas(pagamentos_para_carga(arquivo_pagamentos))
+        total_carga = copy.total
+
+    script = carga_postgres.script_carga(formato, total, total_carga, por_plano,
+                                         datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    with abrir_atomico(carga_postgres.ARQUIVO_SCRIPT, newline=None) as f:
+        f.write(script)
+
+    print(f"💾 Arquivos COPY ({formato}): {arquivo_usuarios} ({total} usuários), "
+          f"{arquivo_copy_pagamentos} ({total_carga} pagamentos)")
+    print(f"💾 Script de importação salvo em: {carga_postgres.ARQUIVO_SCRIPT}")
+
+def telefones_compartilhados(usuarios_sistema, usuarios_planilha, ultimo_status):
+    """(telefone E.164, emails) dos telefones usados por mais de um email em qualquer uma das fontes"""
+    indice = IndiceTelefones()
+    for fonte in (usuarios_sistema, usuarios_planilha, ultimo_status):
+        for email, registro in fonte.items():
+            indice.adicionar(registro['telefone_e164'], email)
+    return indice.compartilhados()
+
+def imprimir_telefones_compartilhados(compartilhados, limite: int = 20):
+    """Lista emails diferentes que usam o mesmo telefone"""
+    if not compartilhados:
         return
 
-    with open('usuarios_para_revisar.csv', 'w', encoding='utf-8', newline='') as f:
-        campos = ['email', 'nome', 'plano', 'tem_pagamentos', 'indicador', 'alertas_str', 'tags_str', 'obs']
-        writer = csv.DictWriter(f, fieldnames=campos, extrasaction='ignore')
-        writer.writeheader()
-        writer.writerows(para_revisar)
-
-    print(f"\n📝 Lista de usuários para revisar salva em: usuarios_para_revisar.csv")
-    print(f"   Total: {len(para_revisar)} usuários")
+    print(f"\n📞 MESMO TELEFONE EM EMAILS DIFERENTES - {len(compartilhados)} telefones")
+    for i, (telefone, emails) in enumerate(compartilhados[:limite], 1):
+        print(f"  {i}. {telefone}: {', '.join(sorted(emails))}")
+    if len(compartilhados) > limite:
+        print(f"  ... e mais {len(compartilhados) - limite} telefones")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reorganiza a base de usuários a partir das três fontes')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='ignora o cache de arquivos já lidos (.cache_fontes)')
+    parser.add_argument('--jobs', type=int, default=min(3, os.cpu_count() or 1),
+                        help='processos usados para ler as três fontes em paralelo (padrão: até 3)')
+    parser.add_argument('--motor', choices=['laco', 'colunar'], default='laco',
+                        help='motor de consolidação: laço por email ou colunar com máscaras vetorizadas')
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'reconsolida só os emails cujas fontes mudaram desde a última execução, e nada se nenhuma '
+                             f'fonte mudou e as saídas estão intactas ({ARQUIVO_ESTADO})')
+    parser.add_argument('--estatisticas-regras', action='store_true',
+                        help='mostra acertos e tempo de cada regra de alerta (regras_alerta)')
+    parser.add_argument('--vencendo', nargs=2, metavar=('INICIO', 'FIM'),
+                        help='lista usuários com vencimento entre duas datas dd/mm/aaaa (inclusive)')
+    parser.add_argument('--max-memory', metavar='TAMANHO',
+                        help='consolida fora da memória com ordenação externa e merge join, '
+                             'usando no máximo TAMANHO para os registros (ex.: 256M, 1G)')
+    parser.add_argument('--sqlite', nargs='?', const=staging_sqlite.ARQUIVO_PADRAO, metavar='ARQUIVO',
+                        help='lê as fontes para um staging SQLite indexado e consolida com consultas '
+                             f'(padrão: {staging_sqlite.ARQUIVO_PADRAO}; consultas avulsas: staging_sqlite.py)')
+    parser.add_argument('--exportar-pagamentos', metavar='DIRETORIO',
+                        help='grava o histórico normalizado de pagamentos em partes durante a leitura')
+    parser.add_argument('--formato-exportacao', choices=['ndjson', 'copy'], default='ndjson',
+                        help='formato das partes de --exportar-pagamentos (padrão: ndjson)')
+    parser.add_argument('--linhas-por-parte', type=int, default=50000,
+                        help='linhas por parte de --exportar-pagamentos (padrão: 50000)')
+    parser.add_argument('--formato-copy', choices=carga_postgres.FORMATOS, default='texto',
+                        help='formato dos arquivos COPY do PostgreSQL usados por script_importacao.sql')
+    parser.add_argument('--colunar', nargs='?', const=formato_colunar.ARQUIVO_PADRAO, metavar='ARQUIVO',
+                        help='grava também a base no formato colunar binário '
+                             f'(padrão: {formato_colunar.ARQUIVO_PADRAO}; leitura: formato_colunar.py)')
+    metricas.adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    if args.sqlite and (args.incremental or args.max_memory):
+        parser.error('--sqlite não combina com --incremental nem com --max-memory')
+    if args.exportar_pagamentos and (args.sqlite or args.max_memory):
+        parser.error('--exportar-pagamentos não combina com --sqlite nem com --max-memory')
+    if args.linhas_por_parte < 1:
+        parser.error('--linhas-por-parte deve ser positivo')
+    if args.max_memory:
+        try:
+            limite_memoria = interpretar_memoria(args.max_memory)
+        except ValueError as e:
+            parser.error(str(e))
+    cache_fontes.configurar(habilitado=not args.no_cache)
+    metricas.configurar_por_args(args, 'reorganizar_banco')
 
-def main():
     print("="*100)
     print("🔄 REORGANIZAÇÃO DO BANCO DE DADOS - SISTEMA DE USUÁRIOS")
     print("="*100)
@@ -436,49 +929,153 @@ def main():
             print(f"❌ Arquivo não encontrado: {arquivo}")
             return
 
+    if args.max_memory:
+        with metricas.etapa('consolidacao_em_fluxo'):
+            processar_fora_da_memoria(arquivo_sistema, arquivo_planilha, arquivo_pagamentos, limite_memoria,
+                                      regras_alerta.compilar(), args.formato_copy, args.colunar)
+        print(f"\n{'='*100}")
+        print(f"✅ PROCESSO CONCLUÍDO!")
+        print(f"{'='*100}\n")
+        return
+
+    regras = regras_alerta.compilar(medir=args.estatisticas_regras)
+    fontes = {'sistema': arquivo_sistema, 'planilha': arquivo_planilha, 'pagamentos': arquivo_pagamentos}
+    saidas = arquivos_de_saida(args.formato_copy, args.colunar)
+    # Opções que imprimem ou exportam algo a partir das fontes sempre pedem a leitura
+    if (args.incremental and not (args.vencendo or args.estatisticas_regras or args.exportar_pagamentos) and
+            estado_incremental.sem_mudancas(ARQUIVO_ESTADO, fontes, versao_incremental(regras), saidas)):
+        print(f"\n✅ Nenhuma fonte mudou desde a última execução e as saídas estão intactas ({ARQUIVO_ESTADO})")
+        print(f"\n{'='*100}")
+        print(f"✅ PROCESSO CONCLUÍDO!")
+        print(f"{'='*100}\n")
+        return
+
     print(f"\n📖 Lendo arquivos...")
-    print(f"  - Sistema: {arquivo_sistema}")
-    usuarios_sistema = ler_usuarios_sistema(arquivo_sistema)
-    print(f"    ✅ {len(usuarios_sistema)} usuários")
-
-    print(f"  - Planilha: {arquivo_planilha}")
-    usuarios_planilha = ler_usuarios_planilha(arquivo_planilha)
-    print(f"    ✅ {len(usuarios_planilha)} usuários")
-
-    print(f"  - Pagamentos: {arquivo_pagamentos}")
-    pagamentos_historico, ultimo_status = ler_pagamentos(arquivo_pagamentos)
-    print(f"    ✅ {len(ultimo_status)} usuários com pagamentos")
-    print(f"    ✅ {sum(len(p) for p in pagamentos_historico.values())} registros de pagamento")
-
-    print(f"\n🔄 Consolidando dados...")
-    usuarios_consolidados = consolidar_dados(
-        usuarios_sistema,
-        usuarios_planilha,
-        pagamentos_historico,
-        ultimo_status
-    )
+    if args.sqlite:
+        total_carga = None
+        with metricas.etapa('staging_sqlite') as etapa:
+            usuarios_consolidados, relatorio, receita, compartilhados = consolidar_em_sqlite(
+                args.sqlite, arquivo_sistema, arquivo_planilha, arquivo_pagamentos, motor=regras)
+            etapa.linhas(saida=len(usuarios_consolidados))
+    else:
+        leitor_pagamentos = functools.partial(ler_pagamentos_carregando, formato_copy=args.formato_copy,
+                                              exportar=args.exportar_pagamentos,
+                                              formato_exportacao=args.formato_exportacao,
+                                              linhas_por_parte=args.linhas_por_parte)
+        with metricas.etapa('leitura') as etapa:
+            (usuarios_sistema, usuarios_planilha, pagamentos_historico, ultimo_status, receita, total_carga,
+             tempos) = ler_fontes(
+                arquivo_sistema,
+                arquivo_planilha,
+                arquivo_pagamentos,
+                jobs=args.jobs,
+                leitor_pagamentos=leitor_pagamentos
+            )
+            if etapa.ativa:
+                etapa.linhas(saida=len(usuarios_sistema) + len(usuarios_planilha) +
+                             sum(u['total_pagamentos'] for u in ultimo_status.values()))
+                etapa.anotar(jobs=args.jobs, segundos_por_fonte={fonte: round(segundos, 4)
+                                                                 for fonte, segundos in tempos.items()})
+
+        print(f"  - Sistema: {arquivo_sistema}")
+        print(f"    ✅ {len(usuarios_sistema)} usuários")
+
+        print(f"  - Planilha: {arquivo_planilha}")
+        print(f"    ✅ {len(usuarios_planilha)} usuários")
+
+        print(f"  - Pagamentos: {arquivo_pagamentos}")
+        print(f"    ✅ {len(ultimo_status)} usuários com pagamentos")
+        print(f"    ✅ {sum(u['total_pagamentos'] for u in ultimo_status.values())} registros de pagamento")
+        print(f"  ⏱️  Leitura: sistema {tempos['sistema']:.2f}s | planilha {tempos['planilha']:.2f}s | "
+              f"pagamentos {tempos['pagamentos']:.2f}s | total {tempos['total']:.2f}s ({args.jobs} processo(s))")
+        if args.exportar_pagamentos:
+            manifesto = ler_manifesto(args.exportar_pagamentos)
+            print(f"    📦 Histórico exportado em {args.exportar_pagamentos}: {manifesto['total']} pagamentos em "
+                  f"{len(manifesto['partes'])} parte(s) {args.formato_exportacao}")
+        with metricas.etapa('reconciliacao'):
+            reconciliar_fontes(usuarios_sistema, usuarios_planilha, ultimo_status).imprimir()
+
+        print(f"\n🔄 Consolidando dados...")
+        # O relatório é contabilizado durante a consolidação, sem um segundo passo
+        relatorio = AgregadorRelatorio()
+        with metricas.etapa('consolidacao') as etapa:
+            if args.incremental:
+                usuarios_consolidados, mudancas = consolidar_dados_incremental(
+                    usuarios_sistema,
+                    usuarios_planilha,
+                    pagamentos_historico,
+                    ultimo_status,
+                    fontes,
+                    motor=regras,
+                    agregador=relatorio
+                )
+                print(f"  ✅ {mudancas['reaproveitados']} reaproveitados, {mudancas['novos']} novos, "
+                      f"{mudancas['alterados']} alterados, {mudancas['removidos']} removidos")
+                etapa.anotar(mudancas=mudancas)
+            else:
+                motor = consolidar_dados_colunar if args.motor == 'colunar' else consolidar_dados
+                usuarios_consolidados = motor(
+                    usuarios_sistema,
+                    usuarios_planilha,
+                    pagamentos_historico,
+                    ultimo_status,
+                    motor=regras,
+                    agregador=relatorio
+                )
+            etapa.linhas(entrada=len(usuarios_sistema) + len(usuarios_planilha) + len(ultimo_status),
+                         saida=len(usuarios_consolidados))
+            etapa.anotar(motor='incremental' if args.incremental else args.motor)
+        with metricas.etapa('telefones') as etapa:
+            compartilhados = telefones_compartilhados(usuarios_sistema, usuarios_planilha, ultimo_status)
+            etapa.linhas(saida=len(compartilhados))
     print(f"  ✅ {len(usuarios_consolidados)} usuários únicos consolidados")
 
-    # Gerar relatórios e arquivos
-    gerar_relatorio_analise(usuarios_consolidados)
+    if args.estatisticas_regras:
+        print(f"\n📐 Regras de alerta ({len(regras.regras)}):")
+        for linha in regras.estatisticas():
+            print(f"  - {linha['tag']:<22} {linha['acertos']:>6} acertos  {linha['tempo_ms']:>8.2f} ms  "
+                  f"(fontes: {', '.join(linha['fontes']) or '-'}; campos: {', '.join(linha['campos']) or '-'})")
 
+    # Gerar relatórios e arquivos
+    with metricas.etapa('relatorio'):
+        relatorio.imprimir()
+        receita.imprimir()
+        imprimir_telefones_compartilhados(compartilhados)
+
+    if args.vencendo:
+        with metricas.etapa('vencimentos') as etapa:
+            listar_vencimentos(usuarios_consolidados, *args.vencendo)
+            etapa.linhas(entrada=len(usuarios_consolidados))
+
+    # Chegando aqui, o --incremental também regrava todas as saídas: saídas apagadas, alteradas ou
+    # pedidas agora (--colunar, --formato-copy) fazem sem_mudancas falhar lá em cima
     print(f"\n💾 Salvando arquivos de saída...")
-    salvar_base_consolidada(usuarios_consolidados)
-    gerar_script_importacao(usuarios_consolidados)
-    gerar_usuarios_para_revisar(usuarios_consolidados)
+    with metricas.etapa('saidas') as etapa:
+        salvar_saidas(usuarios_consolidados, arquivo_pagamentos, args.formato_copy, arquivo_colunar=args.colunar,
+                      total_carga=total_carga)
+        etapa.linhas(entrada=len(usuarios_consolidados))
+    with metricas.etapa('emails_suspeitos') as etapa:
+        gerar_emails_suspeitos(usuarios_consolidados)
+        etapa.linhas(entrada=len(usuarios_consolidados))
+    if args.incremental:
+        estado_incremental.registrar_saidas(ARQUIVO_ESTADO, saidas)
 
     print(f"\n{'='*100}")
     print(f"✅ PROCESSO CONCLUÍDO!")
     print(f"{'='*100}")
     print(f"\nArquivos gerados:")
     print(f"  1. base_consolidada.csv - Base completa para importação")
-    print(f"  2. script_importacao.sql - Script com instruções")
+    print(f"  2. script_importacao.sql + {' e '.join(carga_postgres.ARQUIVOS_COPY[args.formato_copy])} - "
+          f"Carga no PostgreSQL (COPY + merge)")
     print(f"  3. usuarios_para_revisar.csv - Usuários que precisam revisão")
+    print(f"  4. emails_suspeitos.csv - Pares de emails que parecem a mesma pessoa")
+    if args.colunar:
+        print(f"  5. {args.colunar} - Base em formato colunar (tipada, por blocos)")
     print(f"\nPróximos passos:")
     print(f"  1. Revise o relatório acima")
     print(f"  2. Abra usuarios_para_revisar.csv e edite tags/observações")
     print(f"  3. Faça BACKUP do banco de dados atual")
-    print(f"  4. Use base_consolidada.csv para importar no sistema")
+    print(f"  4. Importe com psql -f script_importacao.sql (ou use base_consolidada.csv)")
     print(f"{'='*100}\n")
 
 if __name__ == '__main__':
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Gravação das saídas: arquivos atômicos e um multiplexador de passada única
+
+Cada arquivo de saída é gravado com buffer num temporário do mesmo
+diretório e só substitui o arquivo final (os.replace) quando está
+completo: uma execução interrompida nunca deixa um CSV pela metade para o
+importador. O multiplexador percorre os registros uma vez, já na ordem
+final, e entrega cada um a todos os destinos que o aceitam, em vez de
+ordenar e filtrar a lista de novo para cada arquivo.
+"""
+import csv
+import operator
+import os
+from contextlib import contextmanager
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+TAMANHO_BUFFER = 1024 * 1024
+
+class ArquivoAtomico:
+    """Arquivo gravado num temporário oculto e publicado com os.replace em concluir()"""
+
+    def __init__(self, caminho: str, binario: bool = False, encoding: str = 'utf-8', newline: Optional[str] = ''):
+        self.caminho = caminho
+        diretorio, nome = os.path.split(os.path.abspath(caminho))
+        self.temporario = os.path.join(diretorio, f".{nome}.{os.getpid()}.tmp")
+        if binario:
+            self.arquivo = open(self.temporario, 'wb', buffering=TAMANHO_BUFFER)
+        else:
+            self.arquivo = open(self.temporario, 'w', buffering=TAMANHO_BUFFER, encoding=encoding, newline=newline)
+        self.write = self.arquivo.write
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *exc):
+        if tipo is None:
+            self.concluir()
+        else:
+            self.descartar()
+
+    def concluir(self):
+        """Grava tudo em disco e substitui o arquivo final"""
+        if self.arquivo.closed:
+            return
+        self.arquivo.flush()
+        os.fsync(self.arquivo.fileno())
+        self.arquivo.close()
+        os.replace(self.temporario, self.caminho)
+
+    def descartar(self):
+        """Apaga o temporário; o arquivo final (se existir) fica como estava"""
+        if self.arquivo.closed:
+            return
+        self.arquivo.close()
+        os.unlink(self.temporario)
+
+@contextmanager
+def abrir_atomico(caminho: str, binario: bool = False, encoding: str = 'utf-8', newline: Optional[str] = ''):
+    """Como open(caminho, 'w'), mas o arquivo só aparece completo (ou não muda, se houver erro)"""
+    with ArquivoAtomico(caminho, binario, encoding, newline) as arquivo:
+        yield arquivo
+
+class Destino:
+    """Saída do multiplexador: recebe os registros aceitos por filtro
+
+    O arquivo é aberto no primeiro registro aceito; com sempre=True é aberto
+    (e publicado) mesmo sem registros. Subclasses implementam _abrir e _gravar;
+    o objeto devolvido por _abrir é publicado com concluir() (ou _publicar)
+    e abandonado com descartar().
+    """
+
+    def __init__(self, caminho: str, filtro: Optional[Callable] = None, sempre: bool = True):
+        self.caminho = caminho
+        self.filtro = filtro
+        self.sempre = sempre
+        self.total = 0
+        self._arquivo = None
+
+    def _abrir(self):
+        raise NotImplementedError
+
+    def _gravar(self, registro):
+        raise NotImplementedError
+
+    def _publicar(self):
+        self._arquivo.concluir()
+
+    def aceita(self, registro) -> bool:
+        return self.filtro is None or bool(self.filtro(registro))
+
+    def escrever(self, registro):
+        if self._arquivo is None:
+            self._arquivo = self._abrir()
+        self._gravar(registro)
+        self.total += 1
+
+    def concluir(self):
+        if self._arquivo is None and self.sempre:
+            self._arquivo = self._abrir()
+        if self._arquivo is not None:
+            self._publicar()
+
+    def descartar(self):
+        if self._arquivo is not None:
+            self._arquivo.descartar()
+
+class DestinoCsv(Destino):
+    """CSV com cabeçalho; linha converte o registro na lista de valores"""
+
+    def __init__(self, caminho: str, cabecalho: Sequence[str], linha: Callable[[object], List],
+                 filtro: Optional[Callable] = None, sempre: bool = True, delimitador: str = ','):
+        super().__init__(caminho, filtro, sempre)
+        self.cabecalho = cabecalho
+        self.linha = linha
+        self.delimitador = delimitador
+        self._writer = None
+
+    def _abrir(self):
+        arquivo = ArquivoAtomico(self.caminho)
+        self._writer = csv.writer(arquivo, delimiter=self.delimitador)
+        self._writer.writerow(self.cabecalho)
+        return arquivo
+
+    def _gravar(self, registro):
+        self._writer.writerow(self.linha(registro))
+
+def atributos(campos: Sequence[str]) -> Callable[[object], Tuple]:
+    """Linha com os atributos de um registro-objeto (ex.: UsuarioConsolidado), numa só chamada"""
+    if len(campos) == 1:
+        campo = operator.attrgetter(campos[0])
+        return lambda registro: (campo(registro),)
+    return operator.attrgetter(*campos)
+
+def multiplexar(registros: Iterable, destinos: Sequence[Destino]) -> Sequence[Destino]:
+    """Uma passada pelos registros (já na ordem final), entregando cada um a todos os destinos que o aceitam
+
+    Os arquivos só são publicados no fim; se algo falhar no meio, nenhum
+    destino substitui o arquivo anterior.
+    """
+    try:
+        for registro in registros:
+            for destino in destinos:
+                if destino.aceita(registro):
+                    destino.escrever(registro)
+    except BaseException:
+        for destino in destinos:
+            destino.descartar()
+        raise
+    for destino in destinos:
+        destino.concluir()
+    return destinos
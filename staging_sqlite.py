@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Staging das três exportações num arquivo SQLite local
+
+As fontes (sistema, planilha manual e pagamentos) são gravadas em tabelas
+indexadas por email, indicador, vencimento e status, com executemany em
+lotes dentro de uma única transação. A consolidação (mesmas regras de
+prioridade de reorganizar_banco.consolidar_usuario) e as regras de alerta
+(predicados de regras_alerta com sql) viram uma consulta que materializa a
+tabela usuarios, também indexada. Enquanto os arquivos de origem não mudam
+a carga é pulada, e perguntas avulsas são respondidas sem reler os CSVs:
+
+    python3 staging_sqlite.py --indicador "FULANO" --vencendo 20/10/2025 26/10/2025
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import regras_alerta
+from datas import data_ordinal
+from usuario_consolidado import (CAMPOS_DATAS, CAMPOS_ESCALARES, FONTE_PAGAMENTOS, FONTE_PLANILHA,
+                                 FONTE_SISTEMA, UsuarioConsolidado)
+
+ARQUIVO_PADRAO = 'staging_usuarios.sqlite'
+TAMANHO_LOTE = 5000
+
+COLUNAS_SISTEMA = ('email', 'id', 'nome', 'empresa', 'funcao', 'status', 'aprovado', 'data_criacao',
+                   'ultima_atividade', 'data_criacao_ord', 'ultima_atividade_ord', 'telefone', 'telefone_e164',
+                   'plano', 'verificado')
+COLUNAS_PLANILHA = ('email', 'nome', 'telefone', 'telefone_e164', 'indicador', 'obs')
+COLUNAS_RESUMO = ('email', 'nome', 'telefone', 'telefone_e164', 'indicador', 'status_final', 'data_ultimo_pagto',
+                  'data_venc', 'data_ultimo_pagto_ord', 'data_venc_ord', 'total_ciclos', 'total_pagamentos')
+# Uma linha por pagamento: lançamento da receita e campos para consultas avulsas
+COLUNAS_PAGAMENTOS = ('email', 'nome', 'indicador', 'status_final', 'data_pagto', 'data_pagto_ord',
+                      'data_venc', 'data_venc_ord', 'mes', 'metodo', 'conta', 'valor_centavos',
+                      'comissao_centavos')
+
+ESQUEMA = f"""
+CREATE TABLE IF NOT EXISTS arquivos (fonte TEXT PRIMARY KEY, caminho TEXT, hash TEXT);
+CREATE TABLE IF NOT EXISTS sistema ({', '.join(COLUNAS_SISTEMA)}, PRIMARY KEY (email));
+CREATE TABLE IF NOT EXISTS planilha ({', '.join(COLUNAS_PLANILHA)}, PRIMARY KEY (email));
+CREATE TABLE IF NOT EXISTS resumo_pagamentos ({', '.join(COLUNAS_RESUMO)}, PRIMARY KEY (email));
+CREATE TABLE IF NOT EXISTS pagamentos ({', '.join(COLUNAS_PAGAMENTOS)});
+CREATE INDEX IF NOT EXISTS sistema_status ON sistema (status);
+CREATE INDEX IF NOT EXISTS sistema_telefone ON sistema (telefone_e164);
+CREATE INDEX IF NOT EXISTS planilha_indicador ON planilha (indicador);
+CREATE INDEX IF NOT EXISTS planilha_telefone ON planilha (telefone_e164);
+CREATE INDEX IF NOT EXISTS resumo_indicador ON resumo_pagamentos (indicador);
+CREATE INDEX IF NOT EXISTS resumo_venc ON resumo_pagamentos (data_venc_ord);
+CREATE INDEX IF NOT EXISTS resumo_status ON resumo_pagamentos (status_final);
+CREATE INDEX IF NOT EXISTS resumo_telefone ON resumo_pagamentos (telefone_e164);
+CREATE INDEX IF NOT EXISTS pagamentos_email ON pagamentos (email);
+CREATE INDEX IF NOT EXISTS pagamentos_venc ON pagamentos (data_venc_ord);
+"""
+
+INDICES_USUARIOS = (
+    'CREATE UNIQUE INDEX usuarios_email ON usuarios (email)',
+    'CREATE INDEX usuarios_indicador ON usuarios (indicador)',
+    'CREATE INDEX usuarios_venc ON usuarios (data_vencimento_ord)',
+    'CREATE INDEX usuarios_status_pagamento ON usuarios (status_pagamento)',
+    'CREATE INDEX usuarios_status_sistema ON usuarios (status_sistema)',
+)
+
+# Pertinência de cada fonte nas colunas consolidadas (bits de usuario_consolidado.FONTES)
+_SQL_FONTES = {
+    'SISTEMA': f'fontes_bits & {FONTE_SISTEMA} != 0',
+    'PLANILHA': f'fontes_bits & {FONTE_PLANILHA} != 0',
+    'PAGAMENTOS': f'fontes_bits & {FONTE_PAGAMENTOS} != 0',
+}
+
+def conectar(caminho: str = ARQUIVO_PADRAO) -> sqlite3.Connection:
+    """Abre (ou cria) o arquivo de staging com o esquema e os índices"""
+    conexao = sqlite3.connect(caminho)
+    conexao.execute('PRAGMA journal_mode=WAL')
+    conexao.execute('PRAGMA synchronous=NORMAL')
+    conexao.executescript(ESQUEMA)
+    return conexao
+
+def _inserir(conexao: sqlite3.Connection, tabela: str, colunas: Sequence[str], linhas: Iterable[Tuple]) -> int:
+    """executemany em lotes de TAMANHO_LOTE; retorna o total de linhas"""
+    comando = f"INSERT OR REPLACE INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})"
+    linhas = iter(linhas)
+    total = 0
+    while True:
+        lote = list(islice(linhas, TAMANHO_LOTE))
+        if not lote:
+            return total
+        conexao.executemany(comando, lote)
+        total += len(lote)
+
+def _tuplas(registros: Iterable[Dict], colunas: Sequence[str]) -> Iterable[Tuple]:
+    return (tuple(r[c] for c in colunas) for r in registros)
+
+def fontes_atualizadas(conexao: sqlite3.Connection, digitais: Dict[str, Tuple[str, str]]) -> bool:
+    """Indica se o staging já tem exatamente estes arquivos (fonte -> (caminho, hash))"""
+    gravadas = {fonte: (caminho, h) for fonte, caminho, h in conexao.execute('SELECT fonte, caminho, hash FROM arquivos')}
+    return gravadas == digitais
+
+def carregar(conexao: sqlite3.Connection, sistema: Iterable[Dict], planilha: Iterable[Dict],
+             pagamentos: Iterable[Dict], resumos: Iterable[Dict],
+             digitais: Dict[str, Tuple[str, str]]) -> Dict[str, int]:
+    """Substitui o conteúdo das tabelas de fontes numa única transação
+
+    pagamentos são as linhas de pagamento (colunas de COLUNAS_PAGAMENTOS) e
+    resumos o último status de cada email (COLUNAS_RESUMO). Os iteráveis são
+    consumidos na ordem dos argumentos, então os resumos podem ser calculados
+    enquanto as linhas de pagamento passam. Retorna o total de linhas por tabela.
+    """
+    totais = {}
+    with conexao:
+        for tabela in ('sistema', 'planilha', 'resumo_pagamentos', 'pagamentos', 'arquivos'):
+            conexao.execute(f'DELETE FROM {tabela}')
+        totais['sistema'] = _inserir(conexao, 'sistema', COLUNAS_SISTEMA, _tuplas(sistema, COLUNAS_SISTEMA))
+        totais['planilha'] = _inserir(conexao, 'planilha', COLUNAS_PLANILHA, _tuplas(planilha, COLUNAS_PLANILHA))
+        totais['pagamentos'] = _inserir(conexao, 'pagamentos', COLUNAS_PAGAMENTOS,
+                                        _tuplas(pagamentos, COLUNAS_PAGAMENTOS))
+        totais['resumo_pagamentos'] = _inserir(conexao, 'resumo_pagamentos', COLUNAS_RESUMO,
+                                               _tuplas(resumos, COLUNAS_RESUMO))
+        _inserir(conexao, 'arquivos', ('fonte', 'caminho', 'hash'),
+                 ((fonte, caminho, h) for fonte, (caminho, h) in sorted(digitais.items())))
+    return totais
+
+def sql_alertas(motor: regras_alerta.MotorRegras) -> Optional[str]:
+    """Código das regras disparadas (bit k = regra k) como expressão SQL sobre as colunas consolidadas
+
+    Retorna None se algum predicado não tiver sql (Predicado.sql).
+    """
+    condicoes = {}
+    for predicado in motor.predicados:
+        if predicado.fonte is not None:
+            condicoes[predicado.nome] = _SQL_FONTES[predicado.fonte]
+        elif predicado.sql is not None:
+            condicoes[predicado.nome] = predicado.sql
+        else:
+            return None
+
+    termos = []
+    for k, regra in enumerate(motor.regras):
+        teste = ' AND '.join(f"({condicoes[nome]})" if esperado else f"NOT ({condicoes[nome]})"
+                             for nome, esperado in regra.condicoes)
+        termos.append(f"(CASE WHEN {teste or '1'} THEN {1 << k} ELSE 0 END)")
+    return ' + '.join(termos) or '0'
+
+# Mesmas prioridades de consolidar_usuario: planilha > sistema > pagamentos
+# para nome e telefone; indicador da planilha com os pagamentos de fallback
+SQL_CONSOLIDACAO = f"""
+WITH emails AS (
+    SELECT email FROM sistema UNION SELECT email FROM planilha UNION SELECT email FROM resumo_pagamentos
+)
+SELECT e.email AS email,
+       COALESCE(NULLIF(p.nome, ''), NULLIF(s.nome, ''), NULLIF(g.nome, ''), '') AS nome,
+       COALESCE(NULLIF(p.telefone, ''), NULLIF(s.telefone, ''), NULLIF(g.telefone, ''), '') AS telefone,
+       COALESCE(NULLIF(p.indicador, ''), NULLIF(g.indicador, ''), '') AS indicador,
+       COALESCE(s.plano, '') AS plano,
+       COALESCE(s.status, '') AS status_sistema,
+       COALESCE(s.empresa, '') AS empresa,
+       COALESCE(s.funcao, '') AS funcao,
+       COALESCE(s.data_criacao, '') AS data_criacao,
+       COALESCE(s.ultima_atividade, '') AS ultima_atividade,
+       COALESCE(s.verificado, '') AS verificado,
+       COALESCE(g.total_pagamentos, 0) AS total_pagamentos,
+       COALESCE(g.total_ciclos, 0) AS total_ciclos,
+       COALESCE(g.data_ultimo_pagto, '') AS ultimo_pagamento,
+       COALESCE(g.data_venc, '') AS data_vencimento,
+       COALESCE(g.status_final, '') AS status_pagamento,
+       COALESCE(p.obs, '') AS obs,
+       (s.email IS NOT NULL) * {FONTE_SISTEMA} + (p.email IS NOT NULL) * {FONTE_PLANILHA} +
+       (g.email IS NOT NULL) * {FONTE_PAGAMENTOS} AS fontes_bits,
+       s.data_criacao_ord AS data_criacao_ord,
+       s.ultima_atividade_ord AS ultima_atividade_ord,
+       g.data_ultimo_pagto_ord AS ultimo_pagamento_ord,
+       g.data_venc_ord AS data_vencimento_ord
+FROM emails e
+LEFT JOIN sistema s ON s.email = e.email
+LEFT JOIN planilha p ON p.email = e.email
+LEFT JOIN resumo_pagamentos g ON g.email = e.email
+"""
+
+COLUNAS_USUARIOS = CAMPOS_ESCALARES + ('fontes_bits', 'tags_bits') + CAMPOS_DATAS
+
+def consolidar(conexao: sqlite3.Connection, motor: Optional[regras_alerta.MotorRegras] = None) -> int:
+    """Materializa a tabela usuarios (consolidação + códigos de alerta) com índices; retorna o total
+
+    As regras viram uma expressão SQL sobre as colunas consolidadas; se algum
+    predicado não tiver sql, ou o motor estiver medindo (medir=True), os
+    códigos são calculados pelo motor em Python e gravados em seguida.
+    """
+    motor = motor or regras_alerta.motor_padrao()
+    alertas = None if motor.medir else sql_alertas(motor)
+    colunas = ', '.join(c for c in COLUNAS_USUARIOS if c != 'tags_bits')
+    with conexao:
+        conexao.execute('DROP TABLE IF EXISTS usuarios')
+        conexao.execute(f"CREATE TABLE usuarios AS SELECT {colunas}, {alertas or '0'} AS tags_bits "
+                        f"FROM ({SQL_CONSOLIDACAO})")
+        for indice in INDICES_USUARIOS:
+            conexao.execute(indice)
+        if alertas is None:
+            codigos = [(motor.codigo(u), u.email) for u in usuarios(conexao, motor)]
+            conexao.executemany('UPDATE usuarios SET tags_bits = ? WHERE email = ?', codigos)
+    return conexao.execute('SELECT COUNT(*) FROM usuarios').fetchone()[0]
+
+def usuarios(conexao: sqlite3.Connection, motor: Optional[regras_alerta.MotorRegras] = None,
+             onde: str = '', parametros: Sequence = ()) -> List[UsuarioConsolidado]:
+    """Usuários da tabela usuarios (filtro SQL opcional), em ordem de email, como UsuarioConsolidado"""
+    motor = motor or regras_alerta.motor_padrao()
+    rotulos = motor.rotulos
+    consulta = f"SELECT {', '.join(COLUNAS_USUARIOS)} FROM usuarios {('WHERE ' + onde) if onde else ''} ORDER BY email"
+    n = len(CAMPOS_ESCALARES)
+    return [UsuarioConsolidado(*linha[:n + 2], rotulos, *linha[n + 2:])
+            for linha in conexao.execute(consulta, parametros)]
+
+def combinacoes_fontes(conexao: sqlite3.Connection) -> Dict[int, int]:
+    """Histograma das máscaras de fontes, direto das tabelas de origem (para Reconciliacao.de_histograma)"""
+    consulta = f"""
+        SELECT fontes_bits, COUNT(*) FROM (
+            SELECT SUM(bit) AS fontes_bits FROM (
+                SELECT email, {FONTE_SISTEMA} AS bit FROM sistema
+                UNION ALL SELECT email, {FONTE_PLANILHA} FROM planilha
+                UNION ALL SELECT email, {FONTE_PAGAMENTOS} FROM resumo_pagamentos
+            ) GROUP BY email
+        ) GROUP BY fontes_bits
+    """
+    return dict(conexao.execute(consulta))
+
+def telefones_compartilhados(conexao: sqlite3.Connection) -> List[Tuple[str, List[str]]]:
+    """(telefone E.164, emails) dos telefones usados por mais de um email em qualquer fonte"""
+    consulta = """
+        WITH pares AS (
+            SELECT telefone_e164, email FROM sistema WHERE telefone_e164 != ''
+            UNION SELECT telefone_e164, email FROM planilha WHERE telefone_e164 != ''
+            UNION SELECT telefone_e164, email FROM resumo_pagamentos WHERE telefone_e164 != ''
+        )
+        SELECT telefone_e164, email FROM pares
+        WHERE telefone_e164 IN (SELECT telefone_e164 FROM pares GROUP BY telefone_e164 HAVING COUNT(*) > 1)
+        ORDER BY telefone_e164, email
+    """
+    compartilhados: Dict[str, List[str]] = {}
+    for telefone, email in conexao.execute(consulta):
+        compartilhados.setdefault(telefone, []).append(email)
+    return list(compartilhados.items())
+
+def lancamentos(conexao: sqlite3.Connection):
+    """Argumentos de AgregadorReceita.adicionar para cada pagamento, na ordem de carga"""
+    return conexao.execute('SELECT mes, metodo, conta, indicador, valor_centavos, comissao_centavos '
+                           'FROM pagamentos ORDER BY rowid')
+
+def consultar(conexao: sqlite3.Connection, indicador: Optional[str] = None, inicio: Optional[str] = None,
+              fim: Optional[str] = None, status: Optional[str] = None,
+              motor: Optional[regras_alerta.MotorRegras] = None) -> List[UsuarioConsolidado]:
+    """Usuários consolidados filtrados por indicador, vencimento (dd/mm/aaaa, inclusivo) e status de pagamento"""
+    condicoes, parametros = [], []
+    if indicador is not None:
+        condicoes.append('indicador = ?')
+        parametros.append(indicador)
+    if inicio is not None:
+        condicoes.append('data_vencimento_ord >= ?')
+        parametros.append(data_ordinal(inicio))
+    if fim is not None:
+        condicoes.append('data_vencimento_ord <= ?')
+        parametros.append(data_ordinal(fim))
+    if status is not None:
+        condicoes.append('status_pagamento = ?')
+        parametros.append(status)
+    return usuarios(conexao, motor, ' AND '.join(condicoes), parametros)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Consultas avulsas no staging SQLite (gerado por '
+                                                 'reorganizar_banco.py --sqlite)')
+    parser.add_argument('--banco', default=ARQUIVO_PADRAO, help=f'arquivo SQLite (padrão: {ARQUIVO_PADRAO})')
+    parser.add_argument('--indicador', help='somente usuários deste indicador')
+    parser.add_argument('--vencendo', nargs=2, metavar=('INICIO', 'FIM'),
+                        help='somente vencimentos entre duas datas dd/mm/aaaa (inclusive)')
+    parser.add_argument('--status', help='somente este status de pagamento')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.banco):
+        print(f"❌ Staging não encontrado: {args.banco} (execute reorganizar_banco.py --sqlite)")
+        return 1
+    if args.vencendo and (data_ordinal(args.vencendo[0]) is None or data_ordinal(args.vencendo[1]) is None):
+        print(f"❌ Datas inválidas para --vencendo: {' '.join(args.vencendo)} (use dd/mm/aaaa)")
+        return 1
+
+    conexao = sqlite3.connect(args.banco)
+    inicio, fim = args.vencendo or (None, None)
+    encontrados = consultar(conexao, args.indicador, inicio, fim, args.status)
+    print(f"🔎 {len(encontrados)} usuários")
+    for u in encontrados:
+        print(f"  - {u['email']} - {u['nome']} - Indicador: {u['indicador'] or '-'} - "
+              f"Vencimento: {u['data_vencimento'] or '-'} - Status: {u['status_pagamento'] or '-'}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Telefones normalizados (E.164) e índice telefone -> emails
+
+As planilhas trazem o mesmo número como '54 9127-6423', '5491276423',
+'(54) 99127-6423' ou '+96176730458'. normalizar_telefone converte para E.164
+('+5554991276423', já com o nono dígito dos celulares) com uma expressão
+compilada uma única vez e memoriza cada texto distinto; IndiceTelefones
+liga emails diferentes que usam o mesmo número, com consulta O(1).
+"""
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DDI_PADRAO = '55'
+DDI_BRASIL = '55'
+# Celulares antigos (8 dígitos) começam com 6 a 9 e ganharam o nono dígito
+_INICIO_CELULAR = frozenset('6789')
+
+_NAO_DIGITOS = re.compile(r'\D+')
+
+def _norte_americano(digitos: str) -> bool:
+    """'1' + código de área + 7 dígitos; um celular brasileiro de DDD 1x teria o 9 depois do DDD"""
+    return len(digitos) == 11 and digitos[0] == '1' and digitos[2] != '9'
+
+@lru_cache(maxsize=65536)
+def normalizar_telefone(texto: str, ddi_padrao: str = DDI_PADRAO) -> str:
+    """Telefone em E.164 ('+5511987654321'), ou '' se não der para normalizar
+
+    Números com '+' ou '00' já trazem o código do país; números nacionais
+    com DDD (10 ou 11 dígitos, com ou sem o 0 de longa distância) recebem o
+    DDI padrão; com 12 dígitos ou mais já incluem o código do país (como
+    '595 993 272728'). Com 11 dígitos começando por 1 e sem o 9 de celular
+    depois do DDD, o número é norte-americano ('1 (645) 223-9971'). Números
+    sem DDD são ambíguos e ficam vazios.
+
+    Celulares brasileiros no formato antigo (DDD + 8 dígitos começando com
+    6 a 9) recebem o nono dígito: '54 9127-6423' e '(54) 99127-6423' são o
+    mesmo número.
+    """
+    texto = texto.strip()
+    if not texto or texto.lower() == 'n/a':
+        return ''
+
+    internacional = texto.startswith('+')
+    digitos = _NAO_DIGITOS.sub('', texto)
+    if not internacional and digitos.startswith('00'):
+        internacional, digitos = True, digitos[2:]
+
+    if not internacional:
+        digitos = digitos.lstrip('0')
+        if len(digitos) in (10, 11) and not _norte_americano(digitos):
+            digitos = ddi_padrao + digitos
+        elif len(digitos) < 11:
+            return ''
+
+    if len(digitos) == 12 and digitos.startswith(DDI_BRASIL) and digitos[4] in _INICIO_CELULAR:
+        digitos = digitos[:4] + '9' + digitos[4:]
+
+    if not 8 <= len(digitos) <= 15:
+        return ''
+    return '+' + digitos
+
+def normalizar_em_lote(telefones: Iterable[str], ddi_padrao: str = DDI_PADRAO) -> List[str]:
+    """Normaliza uma coluna inteira; cada texto distinto é convertido uma vez"""
+    memo: Dict[str, str] = {}
+    resultado = []
+    for texto in telefones:
+        e164 = memo.get(texto)
+        if e164 is None:
+            e164 = memo[texto] = normalizar_telefone(texto, ddi_padrao)
+        resultado.append(e164)
+    return resultado
+
+class IndiceTelefones:
+    """Índice secundário telefone E.164 -> emails (na ordem de inclusão, sem repetição)"""
+
+    def __init__(self):
+        self._emails: Dict[str, List[str]] = defaultdict(list)
+
+    def adicionar(self, telefone_e164: str, email: str):
+        if not telefone_e164 or not email:
+            return
+        emails = self._emails[telefone_e164]
+        if email not in emails:
+            emails.append(email)
+
+    def adicionar_registros(self, registros: Iterable[Dict], campo: str = 'telefone_e164'):
+        for r in registros:
+            self.adicionar(r[campo], r['email'])
+        return self
+
+    def emails(self, telefone_e164: str) -> List[str]:
+        """Emails que usam o telefone (lista vazia se nenhum)"""
+        return self._emails.get(telefone_e164, [])
+
+    def compartilhados(self) -> List[Tuple[str, List[str]]]:
+        """(telefone, emails) dos telefones usados por mais de um email, ordenados por telefone"""
+        return sorted((t, emails) for t, emails in self._emails.items() if len(emails) > 1)
+
+    def __len__(self):
+        return len(self._emails)
+
+    def __contains__(self, telefone_e164: Optional[str]) -> bool:
+        return telefone_e164 in self._emails
@@ -0,0 +1,110 @@
+"""Arquivos COPY e regras do importador (carga_postgres)
+
+    python3 -m unittest discover -s tests -p 'test_*.py'
+"""
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from carga_postgres import (COLUNAS_PAGAMENTOS, COLUNAS_USUARIOS, FORMATOS, ArquivoCopy, ler_copy,
+                            metodo_pagamento, regra_tipo, status_final)
+from usuario_consolidado import FONTE_PAGAMENTOS, FONTE_SISTEMA, UsuarioConsolidado
+
+USUARIOS = [
+    ('a@x.com', 'Fulano de Tal', '+5554991276423', 'IND', 'ATIVO', 3,
+     date(2025, 1, 10).toordinal(), date(2025, 2, 10).toordinal(), 'linha 1\nlinha 2'),
+    ('b@x.com', 'Sem nome', None, None, 'INATIVO', 0, None, None, 'tab\taqui, barra \\ e \\N literal\r'),
+    ('c@x.com', 'Ção Ünicode', None, 'X', 'HISTORICO', -1, date(1999, 12, 31).toordinal(), None, ''),
+]
+
+PAGAMENTOS = [
+    ('a@x.com', date(2025, 1, 10).toordinal(), 'JAN/25', 28990, 'PIX', 'C1', 'PRIMEIRO', 0, True, None, None),
+    ('a@x.com', date(2000, 1, 1).toordinal(), '', 9_000_000_000, 'CREDITO', 'C2', 'RECORRENTE', 1250, False,
+     -1250, 'obs\tcom\ttabs'),
+]
+
+class TestIdaEVolta(unittest.TestCase):
+
+    def assertIdaEVolta(self, colunas, linhas):
+        for formato in FORMATOS:
+            with self.subTest(formato=formato), tempfile.TemporaryDirectory() as diretorio:
+                caminho = os.path.join(diretorio, 'carga.copy')
+                with ArquivoCopy(caminho, colunas, formato) as copy:
+                    copy.escrever_todas(linhas)
+                self.assertEqual(copy.total, len(linhas))
+                self.assertEqual(list(ler_copy(caminho, colunas, formato)), linhas)
+
+    def test_usuarios(self):
+        self.assertIdaEVolta(COLUNAS_USUARIOS, USUARIOS)
+
+    def test_pagamentos(self):
+        self.assertIdaEVolta(COLUNAS_PAGAMENTOS, PAGAMENTOS)
+
+    def test_arquivo_vazio(self):
+        self.assertIdaEVolta(COLUNAS_PAGAMENTOS, [])
+
+    def test_escapes_do_formato_texto(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'carga.copy')
+            with ArquivoCopy(caminho, (('obs', 'text'), ('n', 'integer')), 'texto') as copy:
+                copy.escrever(('a\tb\nc\\d\re', None))
+            with open(caminho, encoding='utf-8', newline='') as f:
+                self.assertEqual(f.read(), 'a\\tb\\nc\\\\d\\re\t\\N\n')
+
+    def test_erro_descarta_o_arquivo(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'carga.copy')
+            with self.assertRaises(RuntimeError), ArquivoCopy(caminho, COLUNAS_PAGAMENTOS, 'binario') as copy:
+                copy.escrever(PAGAMENTOS[0])
+                raise RuntimeError
+            self.assertEqual(os.listdir(diretorio), [])
+
+def usuario(status_sistema='', status_pagamento='', pagamentos=True) -> UsuarioConsolidado:
+    return UsuarioConsolidado('a@x.com', status_sistema=status_sistema, status_pagamento=status_pagamento,
+                              fontes_bits=FONTE_SISTEMA | (FONTE_PAGAMENTOS if pagamentos else 0))
+
+class TestStatusFinal(unittest.TestCase):
+
+    def test_pagamento_ativo(self):
+        self.assertEqual(status_final(usuario('Inativo', 'Ativo')), 'ATIVO')
+
+    def test_sistema_ativo_vence_pagamento_inativo(self):
+        self.assertEqual(status_final(usuario('Ativo', 'Inativo')), 'ATIVO')
+
+    def test_pagamento_inativo(self):
+        self.assertEqual(status_final(usuario('', 'Inativo')), 'INATIVO')
+
+    def test_historico(self):
+        self.assertEqual(status_final(usuario('', 'Histórico')), 'HISTORICO')
+        self.assertEqual(status_final(usuario('', 'Histórico', pagamentos=False)), 'HISTORICO')
+
+    def test_status_de_pagamento_sem_pagamentos_e_ignorado(self):
+        self.assertEqual(status_final(usuario('', 'Ativo', pagamentos=False)), 'INATIVO')
+        self.assertEqual(status_final(usuario()), 'INATIVO')
+
+class TestEnums(unittest.TestCase):
+
+    def test_metodo_pagamento(self):
+        self.assertEqual(metodo_pagamento(' pix '), 'PIX')
+        self.assertEqual(metodo_pagamento('Crédito'), 'CREDITO')
+        self.assertEqual(metodo_pagamento('CRDITO'), 'CREDITO')
+        self.assertEqual(metodo_pagamento('din'), 'DINHEIRO')
+        self.assertIsNone(metodo_pagamento('boleto'))
+        self.assertIsNone(metodo_pagamento(''))
+
+    def test_regra_tipo_explicita(self):
+        self.assertEqual(regra_tipo(' recorrente ', '1'), 'RECORRENTE')
+        self.assertEqual(regra_tipo('PRIMEIRO', ''), 'PRIMEIRO')
+
+    def test_regra_tipo_pelo_ciclo(self):
+        self.assertEqual(regra_tipo('', '1'), 'PRIMEIRO')
+        self.assertEqual(regra_tipo('OUTRA', ' 4 '), 'RECORRENTE')
+        self.assertIsNone(regra_tipo('', '0'))
+        self.assertIsNone(regra_tipo('', 'abc'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""Consolidação incremental (reorganizar_banco.consolidar_dados_incremental + estado_incremental)
+
+    python3 -m unittest discover -s tests -p 'test_*.py'
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import estado_incremental
+import regras_alerta
+from reorganizar_banco import consolidar_dados, consolidar_dados_incremental
+
+def sistema(email, plano='free', status='Ativo'):
+    return {'fonte': 'SISTEMA', 'id': '1', 'nome': email.split('@')[0], 'empresa': 'N/A', 'funcao': 'N/A',
+            'status': status, 'aprovado': 'Sim', 'data_criacao': '01/10/2025', 'ultima_atividade': 'Nunca',
+            'data_criacao_ord': 739525, 'ultima_atividade_ord': None, 'telefone': '', 'telefone_e164': '',
+            'plano': plano, 'verificado': 'Não', 'email': email}
+
+def pagamento(status='Ativo', ciclos='1'):
+    return {'nome': 'FULANO', 'telefone': '', 'telefone_e164': '', 'indicador': 'IND', 'status_final': status,
+            'data_ultimo_pagto': '10/10/2025', 'data_venc': '10/11/2025', 'data_ultimo_pagto_ord': 739534,
+            'data_venc_ord': 739565, 'total_ciclos': ciclos, 'total_pagamentos': 1}
+
+class TestConsolidacaoIncremental(unittest.TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        self.estado = os.path.join(self.diretorio.name, 'estado.sqlite')
+        self.arquivos = {}
+        for fonte in estado_incremental.FONTES:
+            self.arquivos[fonte] = os.path.join(self.diretorio.name, f'{fonte}.csv')
+            self.gravar(fonte, 'v1')
+        self.motor = regras_alerta.compilar()
+        self.sistema = {e: sistema(e) for e in ('a@x.com', 'b@x.com', 'c@x.com')}
+        self.planilha = {}
+        self.pagamentos = {'a@x.com': pagamento(), 'd@x.com': pagamento('Inativo')}
+
+    def gravar(self, fonte, conteudo):
+        # Conteúdos de tamanhos diferentes: o mtime pode não mudar entre gravações seguidas
+        with open(self.arquivos[fonte], 'w') as f:
+            f.write(conteudo)
+
+    def consolidar(self):
+        return consolidar_dados_incremental(self.sistema, self.planilha, {}, self.pagamentos, self.arquivos,
+                                            self.estado, motor=self.motor)
+
+    def assertIgualAoCompleto(self, usuarios):
+        completo = consolidar_dados(self.sistema, self.planilha, {}, self.pagamentos, motor=self.motor)
+        self.assertEqual(usuarios, completo)
+
+    def test_primeira_execucao_consolida_todos(self):
+        usuarios, mudancas = self.consolidar()
+        self.assertEqual(mudancas, {'novos': 4, 'alterados': 0, 'reaproveitados': 0, 'removidos': 0})
+        self.assertIgualAoCompleto(usuarios)
+
+    def test_so_a_fonte_alterada_e_comparada(self):
+        self.consolidar()
+        self.pagamentos['a@x.com'] = pagamento('Inativo', '2')
+        self.pagamentos['e@x.com'] = pagamento()
+        del self.pagamentos['d@x.com']
+        self.gravar('pagamentos', 'versao 2')
+        usuarios, mudancas = self.consolidar()
+        self.assertEqual(mudancas, {'novos': 1, 'alterados': 1, 'reaproveitados': 2, 'removidos': 1})
+        self.assertIgualAoCompleto(usuarios)
+
+    def test_arquivo_inalterado_nao_e_reconsolidado(self):
+        self.consolidar()
+        # Mesmo arquivo: mudanças nos registros não são procuradas
+        self.sistema['b@x.com'] = sistema('b@x.com', plano='pro')
+        _, mudancas = self.consolidar()
+        self.assertEqual(mudancas, {'novos': 0, 'alterados': 0, 'reaproveitados': 4, 'removidos': 0})
+
+    def test_mesmo_conteudo_com_outro_mtime(self):
+        self.consolidar()
+        os.utime(self.arquivos['sistema'], ns=(1, 1))
+        _, mudancas = self.consolidar()
+        self.assertEqual(mudancas['reaproveitados'], 4)
+
+    def test_sem_mudancas_confere_as_saidas(self):
+        saida = os.path.join(self.diretorio.name, 'base.csv')
+        self.assertFalse(estado_incremental.sem_mudancas(self.estado, self.arquivos, 'v', [saida]))
+        self.consolidar()
+        with open(saida, 'w') as f:
+            f.write('email\n')
+        estado_incremental.registrar_saidas(self.estado, [saida])
+        conexao = estado_incremental.conectar(self.estado)
+        gravada = estado_incremental.versao_gravada(conexao)
+        conexao.close()
+        self.assertTrue(estado_incremental.sem_mudancas(self.estado, self.arquivos, gravada, [saida]))
+        self.assertFalse(estado_incremental.sem_mudancas(self.estado, self.arquivos, 'outra', [saida]))
+        os.remove(saida)
+        self.assertFalse(estado_incremental.sem_mudancas(self.estado, self.arquivos, gravada, [saida]))
+        self.gravar('planilha', 'versao 2')
+        self.assertFalse(estado_incremental.sem_mudancas(self.estado, self.arquivos, gravada, []))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+"""Conversão de valores em reais (moeda.centavos)
+
+    python3 -m unittest discover -s tests -p 'test_*.py'
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from moeda import centavos, formatar_reais
+
+class TestCentavos(unittest.TestCase):
+
+    def test_formato_brasileiro(self):
+        self.assertEqual(centavos(' R$ 289,90 '), 28990)
+        self.assertEqual(centavos(' R$ 1.234,56 '), 123456)
+        self.assertEqual(centavos('R$ 1.234.567,00'), 123456700)
+
+    def test_ponto_decimal(self):
+        self.assertEqual(centavos('289.90'), 28990)
+        self.assertEqual(centavos('-289.90'), -28990)
+
+    def test_ponto_de_milhar(self):
+        self.assertEqual(centavos('1.234'), 123400)
+
+    def test_zero_negativo_e_invalido(self):
+        self.assertEqual(centavos(' R$ -   '), 0)
+        self.assertEqual(centavos('(12,50)'), -1250)
+        self.assertIsNone(centavos(''))
+        self.assertIsNone(centavos('R$ abc'))
+
+    def test_formatar_reais(self):
+        self.assertEqual(formatar_reais(123456), 'R$ 1.234,56')
+        self.assertEqual(formatar_reais(-5), '-R$ 0,05')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""Último pagamento de cada usuário (reorganizar_banco.acumular_pagamento)
+
+    python3 -m unittest discover -s tests -p 'test_*.py'
+"""
+import itertools
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from reorganizar_banco import acumular_pagamento
+
+def linha(**campos):
+    base = {'NOME_COMPLETO': 'FULANO', 'TELEFONE': '54 9127-6423', 'INDICADOR': 'X', 'STATUS_FINAL': 'ATIVO',
+            'DATA_PAGTO': '10/01/2025', 'DATA_VENC': '10/02/2025', 'TOTAL_CICLOS_USUARIO': '1'}
+    base.update(campos)
+    return base
+
+def ultimo(linhas):
+    resumo = None
+    for row in linhas:
+        resumo = acumular_pagamento(resumo, row)
+    return resumo
+
+class TestAcumularPagamento(unittest.TestCase):
+
+    def assertIndependeDaOrdem(self, linhas, status_esperado):
+        for ordem in itertools.permutations(linhas):
+            resumo = ultimo(ordem)
+            self.assertEqual(resumo['status_final'], status_esperado)
+            self.assertEqual(resumo['total_pagamentos'], len(linhas))
+
+    def test_maior_data_de_pagamento(self):
+        self.assertIndependeDaOrdem([linha(STATUS_FINAL='ANTIGO', DATA_PAGTO='10/12/2024'),
+                                     linha(STATUS_FINAL='ATUAL', DATA_PAGTO='10/01/2025')], 'ATUAL')
+
+    def test_empate_decidido_pelo_vencimento(self):
+        self.assertIndependeDaOrdem([linha(STATUS_FINAL='ANTES', DATA_VENC='01/02/2025'),
+                                     linha(STATUS_FINAL='DEPOIS', DATA_VENC='05/02/2025')], 'DEPOIS')
+
+    def test_datas_invalidas_nao_dependem_da_ordem(self):
+        self.assertIndependeDaOrdem([linha(STATUS_FINAL='A', DATA_PAGTO='31/02/2025', DATA_VENC='01/03/2025'),
+                                     linha(STATUS_FINAL='B', DATA_PAGTO='31/02/2025', DATA_VENC='05/03/2025')], 'B')
+
+    def test_empate_completo_decidido_pelo_conteudo(self):
+        self.assertIndependeDaOrdem([linha(STATUS_FINAL='CANCELADO'), linha(STATUS_FINAL='ATIVO'),
+                                     linha(STATUS_FINAL='EM_ATRASO')], 'EM_ATRASO')
+
+    def test_data_valida_vence_invalida_e_vazia(self):
+        self.assertIndependeDaOrdem([linha(STATUS_FINAL='VAZIA', DATA_PAGTO=''),
+                                     linha(STATUS_FINAL='INVALIDA', DATA_PAGTO='31/02/2025'),
+                                     linha(STATUS_FINAL='VALIDA', DATA_PAGTO='01/01/2020')], 'VALIDA')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""Normalização de telefones (telefones.normalizar_telefone)
+
+    python3 -m unittest discover -s tests -p 'test_*.py'
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from telefones import IndiceTelefones, normalizar_em_lote, normalizar_telefone
+
+class TestNormalizarTelefone(unittest.TestCase):
+
+    def test_celular_antigo_recebe_nono_digito(self):
+        self.assertEqual(normalizar_telefone('54 9127-6423'), '+5554991276423')
+        self.assertEqual(normalizar_telefone('5491276423'), '+5554991276423')
+        self.assertEqual(normalizar_telefone('91 8749-9644'), '+5591987499644')
+
+    def test_formatos_antigo_e_atual_sao_o_mesmo_numero(self):
+        self.assertEqual(normalizar_telefone('91 8749-9644'), normalizar_telefone('91987499644'))
+        self.assertEqual(normalizar_telefone('54 9127-6423'), normalizar_telefone('(54) 99127-6423'))
+        self.assertEqual(normalizar_telefone('+555491276423'), normalizar_telefone('+55 54 99127-6423'))
+
+    def test_fixo_nao_recebe_nono_digito(self):
+        self.assertEqual(normalizar_telefone('(11) 3456-7890'), '+551134567890')
+        self.assertEqual(normalizar_telefone('51 2345-6789'), '+555123456789')
+
+    def test_celular_com_ddd_iniciado_em_1(self):
+        self.assertEqual(normalizar_telefone('(11) 98765-4321'), '+5511987654321')
+        self.assertEqual(normalizar_telefone('011 98765-4321'), '+5511987654321')
+
+    def test_numero_norte_americano_nao_e_brasileiro(self):
+        self.assertEqual(normalizar_telefone('1 (645) 223-9971'), '+16452239971')
+        self.assertEqual(normalizar_telefone('+1 645 223 9971'), '+16452239971')
+
+    def test_internacional(self):
+        self.assertEqual(normalizar_telefone('+96176730458'), '+96176730458')
+        self.assertEqual(normalizar_telefone('00 961 76730458'), '+96176730458')
+        self.assertEqual(normalizar_telefone('595 993 272728'), '+595993272728')
+
+    def test_sem_ddd_ou_vazio(self):
+        self.assertEqual(normalizar_telefone('3456-7890'), '')
+        self.assertEqual(normalizar_telefone('N/A'), '')
+        self.assertEqual(normalizar_telefone('  '), '')
+
+    def test_em_lote_igual_ao_individual(self):
+        textos = ['54 9127-6423', '(54) 99127-6423', '', '1 (645) 223-9971', '54 9127-6423']
+        self.assertEqual(normalizar_em_lote(textos), [normalizar_telefone(t) for t in textos])
+
+class TestIndiceTelefones(unittest.TestCase):
+
+    def test_liga_formato_antigo_e_atual(self):
+        indice = IndiceTelefones()
+        indice.adicionar(normalizar_telefone('91 8749-9644'), 'a@x.com')
+        indice.adicionar(normalizar_telefone('91987499644'), 'b@x.com')
+        self.assertEqual(indice.compartilhados(), [('+5591987499644', ['a@x.com', 'b@x.com'])])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Registro compacto de um usuário consolidado (reorganizar_banco)
+
+Os campos escalares ficam em __slots__; fontes e regras de alerta disparadas
+são bitflags (ints). As listas alertas/tags/fontes e os textos *_str são
+derivados sob demanda, com renderização memorizada por código, em vez de
+serem guardados em cada usuário.
+
+O registro se comporta como um mapeamento somente leitura com as mesmas
+chaves do dict antigo (mais as datas em ordinais de CAMPOS_DATAS), então
+csv.DictWriter, os agregadores de relatório e o motor de regras o usam sem
+mudanças. Os escritores de linhas (CSV, COPY, colunar) leem os atributos
+direto, com operator.attrgetter, sem passar pelo mapeamento.
+"""
+from typing import Iterator, Tuple
+
+FONTES = ('SISTEMA', 'PLANILHA', 'PAGAMENTOS')
+FONTE_SISTEMA = 1
+FONTE_PLANILHA = 2
+FONTE_PAGAMENTOS = 4
+
+# Campos guardados em cada registro, na ordem do construtor
+CAMPOS_ESCALARES = (
+    'email', 'nome', 'telefone', 'indicador', 'plano', 'status_sistema',
+    'empresa', 'funcao', 'data_criacao', 'ultima_atividade', 'verificado',
+    'total_pagamentos', 'total_ciclos', 'ultimo_pagamento', 'data_vencimento',
+    'status_pagamento', 'obs',
+)
+
+# Datas já convertidas em ordinais (datas.data_ordinal) na leitura das fontes
+CAMPOS_DATAS = ('data_criacao_ord', 'ultima_atividade_ord', 'ultimo_pagamento_ord', 'data_vencimento_ord')
+
+# Chaves do usuário consolidado, na mesma ordem do dict de consolidar_usuario
+CAMPOS = (
+    'email', 'nome', 'telefone', 'indicador', 'plano', 'status_sistema',
+    'empresa', 'funcao', 'data_criacao', 'ultima_atividade', 'verificado',
+    'tem_pagamentos', 'total_pagamentos', 'total_ciclos', 'ultimo_pagamento',
+    'data_vencimento', 'status_pagamento', 'obs', 'alertas', 'tags', 'fontes',
+    'alertas_str', 'tags_str', 'fontes_str',
+)
+_CHAVES = frozenset(CAMPOS + CAMPOS_DATAS)
+
+def _renderizar_fontes():
+    """(fontes, fontes_str) para cada combinação de bits de fonte"""
+    tabela = []
+    for bits in range(1 << len(FONTES)):
+        fontes = tuple(f for k, f in enumerate(FONTES) if bits >> k & 1)
+        tabela.append((fontes, ', '.join(fontes)))
+    return tuple(tabela)
+
+_FONTES_RENDERIZADAS = _renderizar_fontes()
+_SEM_ALERTAS = ((), (), '', '')
+
+class UsuarioConsolidado:
+    """Usuário consolidado com campos em slots e fontes/tags como bitflags"""
+    __slots__ = CAMPOS_ESCALARES + ('fontes_bits', 'tags_bits', 'rotulos') + CAMPOS_DATAS
+
+    def __init__(self, email='', nome='', telefone='', indicador='', plano='', status_sistema='',
+                 empresa='', funcao='', data_criacao='', ultima_atividade='', verificado='',
+                 total_pagamentos=0, total_ciclos=0, ultimo_pagamento='', data_vencimento='',
+                 status_pagamento='', obs='', fontes_bits=0, tags_bits=0, rotulos=None,
+                 data_criacao_ord=None, ultima_atividade_ord=None, ultimo_pagamento_ord=None,
+                 data_vencimento_ord=None):
+        self.email = email
+        self.nome = nome
+        self.telefone = telefone
+        self.indicador = indicador
+        self.plano = plano
+        self.status_sistema = status_sistema
+        self.empresa = empresa
+        self.funcao = funcao
+        self.data_criacao = data_criacao
+        self.ultima_atividade = ultima_atividade
+        self.verificado = verificado
+        self.total_pagamentos = total_pagamentos
+        self.total_ciclos = total_ciclos
+        self.ultimo_pagamento = ultimo_pagamento
+        self.data_vencimento = data_vencimento
+        self.status_pagamento = status_pagamento
+        self.obs = obs
+        self.fontes_bits = fontes_bits
+        # Bit k = regra k de rotulos (regras_alerta.Rotulos, compartilhado por todos)
+        self.tags_bits = tags_bits
+        self.rotulos = rotulos
+        self.data_criacao_ord = data_criacao_ord
+        self.ultima_atividade_ord = ultima_atividade_ord
+        self.ultimo_pagamento_ord = ultimo_pagamento_ord
+        self.data_vencimento_ord = data_vencimento_ord
+
+    # Campos derivados dos bitflags
+
+    @property
+    def tem_pagamentos(self) -> str:
+        return 'SIM' if self.fontes_bits & FONTE_PAGAMENTOS else 'NÃO'
+
+    @property
+    def fontes(self) -> Tuple[str, ...]:
+        return _FONTES_RENDERIZADAS[self.fontes_bits][0]
+
+    @property
+    def fontes_str(self) -> str:
+        return _FONTES_RENDERIZADAS[self.fontes_bits][1]
+
+    def _alertas(self):
+        if self.rotulos is None:
+            return _SEM_ALERTAS
+        return self.rotulos.renderizar(self.tags_bits)
+
+    @property
+    def alertas(self) -> Tuple[str, ...]:
+        return self._alertas()[0]
+
+    @property
+    def tags(self) -> Tuple[str, ...]:
+        return self._alertas()[1]
+
+    @property
+    def alertas_str(self) -> str:
+        return self._alertas()[2]
+
+    @property
+    def tags_str(self) -> str:
+        return self._alertas()[3]
+
+    # Acesso como mapeamento (compatível com o dict de antes)
+
+    def __getitem__(self, campo: str):
+        if campo not in _CHAVES:
+            raise KeyError(campo)
+        return getattr(self, campo)
+
+    def get(self, campo: str, padrao=None):
+        return getattr(self, campo) if campo in _CHAVES else padrao
+
+    def __contains__(self, campo) -> bool:
+        return campo in _CHAVES
+
+    def keys(self) -> Tuple[str, ...]:
+        return CAMPOS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(CAMPOS)
+
+    def __len__(self) -> int:
+        return len(CAMPOS)
+
+    def __eq__(self, outro):
+        if not isinstance(outro, UsuarioConsolidado):
+            return NotImplemented
+        return all(self[c] == outro[c] for c in CAMPOS + CAMPOS_DATAS)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"UsuarioConsolidado({self.email!r}, fontes={self.fontes_str!r}, tags={self.tags_str!r})"